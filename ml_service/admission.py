@@ -0,0 +1,148 @@
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Admission configuration
+MAX_CONCURRENT_INFERENCES = 1  # TensorFlow calls allowed at the same time
+MAX_ADMISSION_QUEUE = 8  # Requests allowed to wait for an inference slot
+BACKGROUND_QUEUE_SHARE = 0.5  # Fraction of the queue background work may occupy
+DEFAULT_DEADLINE = 30.0  # Seconds an interactive request may wait in total
+MONITORING_DEADLINE = 5.0  # Seconds a monitoring poll may wait (matches the polling interval)
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: 'interactive', PRIORITY_BACKGROUND: 'background'}
+
+class AdmissionError(Exception):
+    """Base class for requests refused by admission control"""
+    status_code = 503
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class QueueFullError(AdmissionError):
+    """The admission queue has no room for this request"""
+    status_code = 429
+
+class DeadlineExceeded(AdmissionError):
+    """The request deadline passed before it reached the model"""
+    status_code = 503
+
+class AdmissionController:
+    """Bounded priority queue in front of the inference path"""
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT_INFERENCES, max_queue=MAX_ADMISSION_QUEUE,
+                 background_share=BACKGROUND_QUEUE_SHARE):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.background_limit = max(1, int(max_queue * background_share))
+        self.cond = threading.Condition()
+        self.waiting = []  # heap of (priority, sequence)
+        self.sequence = itertools.count()
+        self.local = threading.local()  # Priority of the slot held by the current thread, for check_deadline
+        self.running = 0
+        self.avg_service_time = 1.0  # Exponential moving average in seconds
+        self.counters = {
+            name: {'admitted': 0, 'completed': 0, 'shed_queue_full': 0, 'shed_deadline': 0}
+            for name in PRIORITY_NAMES.values()
+        }
+
+    def retry_after(self):
+        """Estimate how many seconds until a slot frees up"""
+        backlog = len(self.waiting) + self.running
+        return max(1, int(math.ceil(backlog * self.avg_service_time / self.max_concurrent)))
+
+    def queue_limit(self, priority):
+        """Maximum queue length at which a request of this priority is still accepted"""
+        return self.max_queue if priority == PRIORITY_INTERACTIVE else self.background_limit
+
+    def check(self, priority):
+        """Fail fast if a request of this priority would be shed right now"""
+        with self.cond:
+            if len(self.waiting) >= self.queue_limit(priority):
+                self.counters[PRIORITY_NAMES[priority]]['shed_queue_full'] += 1
+                raise QueueFullError("Inference queue is full, try again later", self.retry_after())
+
+    @contextmanager
+    def admit(self, priority=PRIORITY_INTERACTIVE, deadline=None):
+        """Wait for an inference slot; raises instead of queueing past the limits"""
+        name = PRIORITY_NAMES[priority]
+        with self.cond:
+            if deadline is not None and time.time() >= deadline:
+                self.counters[name]['shed_deadline'] += 1
+                raise DeadlineExceeded("Request deadline expired before inference", self.retry_after())
+            if len(self.waiting) >= self.queue_limit(priority):
+                self.counters[name]['shed_queue_full'] += 1
+                raise QueueFullError("Inference queue is full, try again later", self.retry_after())
+
+            entry = (priority, next(self.sequence))
+            heapq.heappush(self.waiting, entry)
+            try:
+                while self.running >= self.max_concurrent or self.waiting[0] != entry:
+                    timeout = None if deadline is None else deadline - time.time()
+                    if timeout is not None and timeout <= 0:
+                        self.counters[name]['shed_deadline'] += 1
+                        raise DeadlineExceeded("Request deadline expired while queued", self.retry_after())
+                    self.cond.wait(timeout)
+            except BaseException:
+                self.waiting.remove(entry)
+                heapq.heapify(self.waiting)
+                self.cond.notify_all()
+                raise
+            heapq.heappop(self.waiting)
+            self.running += 1
+            self.counters[name]['admitted'] += 1
+
+        started = time.time()
+        outer_priority = getattr(self.local, 'priority', None)
+        self.local.priority = priority
+        try:
+            yield
+        finally:
+            self.local.priority = outer_priority
+            elapsed = time.time() - started
+            with self.cond:
+                self.running -= 1
+                self.counters[name]['completed'] += 1
+                self.avg_service_time = 0.8 * self.avg_service_time + 0.2 * elapsed
+                self.cond.notify_all()
+
+    def check_deadline(self, deadline, priority=None):
+        """Raise DeadlineExceeded if the deadline has already passed, counting it as shed.
+        The priority defaults to that of the slot the calling thread holds (interactive outside admit())"""
+        if deadline is None or time.time() < deadline:
+            return
+        if priority is None:
+            priority = getattr(self.local, 'priority', None)
+        name = PRIORITY_NAMES[priority if priority is not None else PRIORITY_INTERACTIVE]
+        with self.cond:
+            self.counters[name]['shed_deadline'] += 1
+            retry_after = self.retry_after()
+        raise DeadlineExceeded("Request deadline expired before inference", retry_after)
+
+    def stats(self):
+        """Return queue state and shed counters"""
+        with self.cond:
+            shed_total = sum(c['shed_queue_full'] + c['shed_deadline'] for c in self.counters.values())
+            return {
+                'running': self.running,
+                'queued': len(self.waiting),
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'background_queue_limit': self.background_limit,
+                'avg_service_time': self.avg_service_time,
+                'shed_total': shed_total,
+                'by_priority': {name: dict(c) for name, c in self.counters.items()}
+            }
+
+# Shared controller used by every inference entry point
+admission = AdmissionController()
+
+def check_deadline(deadline, priority=None):
+    """Raise DeadlineExceeded if the deadline has already passed (counted in the shared controller's shed stats)"""
+    admission.check_deadline(deadline, priority)
@@ -1,8 +1,39 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import os
+import io
+import re
 import scipy.io as sio
-from predictClass import predict_from_file
+from predictClass import predict_from_file, predict_from_signals, load_signals, registry
+from model_registry import MODELS_DIR, check_admin_token, model_admin_enabled, resolve_model_path
+from change_detector import ChangeDetector, fingerprint
+from machine import read_latest_capture
+from memory_budget import (CAPTURE_BYTES, RequestMemory, current_rss_bytes, estimate_parse_bytes,
+                           estimate_predict_bytes, estimate_request_bytes, estimate_serialize_bytes, memory_budget,
+                           memory_stats)
+from profiler import ProfilerBusyError, capture_profile, check_token, profiling_enabled
+from compression import (DECODE_ERRORS, UnsupportedEncodingError, decode_stream, read_capture,
+                         split_encoding_suffix, supported_encodings, write_capture)
+from cascade import cascade_stats
+from jobs import JobManager, job_to_dict
+from history_store import HistoryStore
+from evaluation import evaluator
+from similarity import similarity_index
+from pyramid import pyramid_store
+from coordinator import ShardMember
+from rpc import (OP_GENERATE, OP_PREDICT, OP_STATUS, RPC_SOCKET_PATH, RPCServer, payload_to_signals,
+                 signals_to_payload)
+from machine import SignalGenerator
+from shm_ring import ShmRingReader, transport_latency
+from scheduler import scheduler
+from loadtest import TRAFFIC_RECORD_DIR, TrafficRecorder
+from utils import REQUIRED_SIGNALS
+from admission import (admission, AdmissionError, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND,
+                       DEFAULT_DEADLINE, MONITORING_DEADLINE)
+import atexit
+import signal
+from contextlib import ExitStack, nullcontext
+import sys
 import time
 import numpy as np
 
@@ -12,11 +43,40 @@ CORS(app)  # Enable CORS for all routes
 # Configure upload folder
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['GENERATED_SIGNALS_DIR'] = 'generated_signals'
+app.config['HISTORY_DB'] = 'history.db'
+app.config['UPLOAD_STORAGE_ENCODING'] = os.environ.get('UPLOAD_STORAGE_ENCODING')  # None, 'gzip' or 'zstd'
+app.config['MONITORING_MOTOR_ID'] = 'generator'  # Motor id recorded for the signal generator captures
+app.config['UPLOAD_MOTOR_ID'] = 'upload'  # Motor id for uploads that don't name one
 
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['GENERATED_SIGNALS_DIR'], exist_ok=True)
 
+# Prediction history (per motor, with rollups)
+history = HistoryStore(app.config['HISTORY_DB'])
+
+# Streaming evaluation metrics, rebuilt once from stored feedback
+evaluator.attach(history)
+
+# Nearest-neighbour index of past captures, rebuilt once and then fed by record_history
+similarity_index.attach(history)
+
+# Motor ownership when several instances share the fleet (COORDINATOR_URL / INSTANCE_URL)
+shard = ShardMember(info_callback=lambda: {"model_version": registry.active_version()})
+
+# Newest capture straight from the generator's shared-memory ring, when it publishes there
+capture_ring = ShmRingReader()
+
+# Optional traffic capture for load-test replay (see loadtest.py)
+traffic_recorder = TrafficRecorder(TRAFFIC_RECORD_DIR) if TRAFFIC_RECORD_DIR else None
+
+# Reuses the last monitoring prediction for near-identical captures
+change_detector = ChangeDetector()
+
+MOTOR_ID_PATTERN = re.compile(r'^[A-Za-z0-9_.-]+$')  # Motor ids double as capture directory names
+
+CAPTURE_VALUES = CAPTURE_BYTES // 8  # Floats per capture in the JSON response
+
 # Global variables to track state
 is_monitoring = False
 last_processed_file = None
@@ -37,87 +97,506 @@ def convert_numpy_types(obj):
         return [convert_numpy_types(item) for item in obj]
     return obj
 
+def log_mat_contents(file_data):
+    """Print the structure of an uploaded .mat file for debugging"""
+    try:
+        mat_data = sio.loadmat(io.BytesIO(file_data), struct_as_record=False, squeeze_me=True)
+        print("\nMAT file contents:")
+        keys = [k for k in mat_data.keys() if not k.startswith('__')]
+        print("Available keys:", keys)
+
+        # Find essaisX key
+        essais_key = None
+        for key in keys:
+            if key.startswith('essais'):
+                essais_key = key
+                print(f"Found essais key: {essais_key}")
+                break
+
+        # Check structure
+        if essais_key:
+            print(f"\nExamining {essais_key} structure")
+            essais = mat_data[essais_key]
+            if hasattr(essais, 'Y'):
+                print("Found Y attribute")
+                Y = essais.Y
+                if isinstance(Y, (list, np.ndarray)):
+                    print(f"Y contains {len(Y)} entries")
+                    if isinstance(Y, np.ndarray) and Y.dtype.names is not None:
+                        print("Y is a structured array with fields:", Y.dtype.names)
+                    else:
+                        for i, entry in enumerate(Y):
+                            print(f"Entry {i} attributes:", [attr for attr in dir(entry) if not attr.startswith('__')])
+
+            # Check for direct attributes
+            attrs = [attr for attr in dir(essais) if not attr.startswith('__')]
+            print(f"\nDirect attributes in {essais_key}:", attrs)
+
+    except Exception as e:
+        print(f"Error examining .mat file: {str(e)}")
+
+def request_deadline(default):
+    """Absolute deadline for this request, from the X-Request-Timeout header (seconds) or the default"""
+    try:
+        timeout = float(request.headers.get('X-Request-Timeout', default))
+    except ValueError:
+        timeout = default
+    return time.time() + timeout
+
+def admission_error_response(e, extra=None):
+    """Fast 429/503 answer with Retry-After for shed requests"""
+    body = {"status": "error", "error": str(e), "retry_after": e.retry_after}
+    if extra:
+        body.update(extra)
+    response = jsonify(body)
+    response.status_code = e.status_code
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+def record_history(motor_id, result, timestamp=None, raw_signals=None):
+    """Store a prediction in the history store without failing the request; returns its id
+
+    When the raw capture is given its signal pyramid is queued for storage too, for /captures and
+    /history/<motor>/signals (written in the background, so it shows up shortly after the response).
+    """
+    try:
+        timestamp = timestamp or time.time()
+        prediction_id = history.record(motor_id, result, timestamp)
+        if prediction_id is not None:
+            similarity_index.add_result(prediction_id, motor_id, timestamp, result)
+            if raw_signals is not None:
+                pyramid_store.submit(prediction_id, motor_id, timestamp, raw_signals)
+        return prediction_id
+    except Exception as e:
+        print(f"Warning: Failed to record prediction history: {str(e)}")
+        return None
+
+def frame_overwritten_response(timestamp):
+    """The generator lapped the ring while we read a frame; the next poll picks up a newer one"""
+    return jsonify({
+        "status": "waiting",
+        "prediction": None,
+        "timestamp": timestamp,
+        "message": "Capture overwritten while reading it, retrying"
+    })
+
+def run_prediction_job(file_data, deadline=None, motor_id=None, memory_reserved=False):
+    """Worker body for prediction jobs: parse, validate and run the model.
+    memory_reserved: the caller already holds this request's memory budget (sync /predict)"""
+    log_mat_contents(file_data)
+    memory = RequestMemory()
+    parsed = []
+    # Hold new work back until the global memory budget has room for this request
+    reservation = nullcontext() if memory_reserved else memory_budget.reserve(estimate_request_bytes(len(file_data)),
+                                                                               deadline)
+    with reservation:
+        # The inference slot is taken after parsing: loadmat doesn't need TensorFlow
+        result = predict_from_file(file_data, deadline=deadline, memory=memory, on_signals=parsed.append,
+                                   priority=PRIORITY_INTERACTIVE)
+        # Convert numpy types to Python types
+        with memory.stage('convert', lambda: estimate_serialize_bytes(CAPTURE_VALUES)):
+            result = convert_numpy_types(result)
+    result["memory_usage"] = memory.to_dict()
+    result["prediction_id"] = record_history(motor_id or app.config['UPLOAD_MOTOR_ID'], result,
+                                             raw_signals=parsed[0] if parsed else None)
+    result.pop("embedding", None)  # Indexed above; not part of the client response
+    return result
+
+job_manager = JobManager(run_prediction_job)
+
+def rpc_predict(meta, payload):
+    """RPC predict: raw float32 (9, T) signals in, compact result out (signals only on request)"""
+    raw_signals = payload_to_signals(meta, payload)
+    deadline = time.time() + float(meta.get("timeout", DEFAULT_DEADLINE))
+    with memory_budget.reserve(estimate_request_bytes(len(payload)), deadline):
+        with admission.admit(PRIORITY_INTERACTIVE, deadline):
+            result = predict_from_signals(raw_signals, deadline=deadline)
+        if not meta.get("include_signals"):
+            # Drop the sample lists before conversion, the caller already has the signals
+            result.pop("signals", None)
+            result.pop("formatted_signals", None)
+        result = convert_numpy_types(result)
+    if result.get("status") != "success":
+        raise RuntimeError(result.get("error", "Prediction failed"))
+    result["prediction_id"] = record_history(meta.get("motor_id") or app.config['UPLOAD_MOTOR_ID'], result,
+                                             raw_signals=raw_signals)
+    result.pop("embedding", None)  # Indexed above; not part of the client response
+    return result, b""
+
+rpc_generator = None
+
+def rpc_generate(meta, payload):
+    """RPC generate: synthetic capture returned as a float32 buffer instead of a .mat file"""
+    global rpc_generator
+    if rpc_generator is None:
+        rpc_generator = SignalGenerator(shm=False)  # Never take over the generator's ring
+    signals = rpc_generator.generate_signals(fault_type=meta.get("fault_type"))
+    signal_meta, signal_payload = signals_to_payload(np.stack([signals[name] for name in REQUIRED_SIGNALS]))
+    signal_meta["signals"] = REQUIRED_SIGNALS
+    return signal_meta, signal_payload
+
+def rpc_status(meta, payload):
+    return {
+        "monitoring": is_monitoring,
+        "model_version": registry.active_version(),
+        "admission": admission.stats(),
+        "memory": memory_budget.stats(),
+        "rpc": rpc_server.stats() if rpc_server else None
+    }, b""
+
+# Unix socket RPC for co-located callers, started with the app (RPC_SOCKET_PATH, empty to disable)
+rpc_server = RPCServer(RPC_SOCKET_PATH, {OP_PREDICT: rpc_predict, OP_GENERATE: rpc_generate,
+                                         OP_STATUS: rpc_status}) if RPC_SOCKET_PATH else None
+
+def submit_uploaded_file(memory_hold=None):
+    """Validate the uploaded file, store it and queue a prediction job.
+    Accepts a multipart 'file' part (optionally .mat.gz/.mat.zst or with its own
+    Content-Encoding) or a raw application/octet-stream body with Content-Encoding
+    and an X-Filename header. Compressed payloads are decoded as they stream in.
+    With an ExitStack as memory_hold, the request's memory reservation is taken here
+    and stays held until the caller closes the stack (e.g. after serializing the result).
+    Returns (job_id, None) or (None, error_response)"""
+    if 'file' in request.files:
+        file = request.files['file']
+        filename, encoding = split_encoding_suffix(file.filename or '')
+        encoding = file.headers.get('Content-Encoding') or encoding
+        stream = file.stream
+    elif request.mimetype == 'application/octet-stream':
+        filename = request.headers.get('X-Filename', 'upload.mat')
+        encoding = request.headers.get('Content-Encoding')
+        stream = request.stream
+    else:
+        return None, (jsonify({"error": "No file provided"}), 400)
+
+    if filename == '':
+        return None, (jsonify({"error": "No file selected"}), 400)
+
+    if not filename.endswith('.mat'):
+        return None, (jsonify({"error": "Only .mat files are supported"}), 400)
+
+    # Refuse straight away when the inference queue is saturated
+    try:
+        admission.check(PRIORITY_INTERACTIVE)
+    except AdmissionError as e:
+        return None, admission_error_response(e)
+
+    try:
+        file_data = decode_stream(stream, encoding)
+    except UnsupportedEncodingError as e:
+        return None, (jsonify({"error": str(e), "supported": supported_encodings()}), 415)
+    except DECODE_ERRORS as e:
+        return None, (jsonify({"error": f"Could not decode upload: {str(e)}"}), 400)
+
+    if traffic_recorder:
+        traffic_recorder.record_predict(file_data, request.form.get('motor_id'))
+
+    # Save the uploaded file (optionally compressed for storage)
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], os.path.basename(filename))
+    file_path = write_capture(file_path, file_data, app.config['UPLOAD_STORAGE_ENCODING'])
+    print(f"\nReceived and saved file: {file_path}")
+
+    deadline = request_deadline(DEFAULT_DEADLINE)
+    try:
+        if memory_hold is not None:
+            memory_hold.enter_context(memory_budget.reserve(estimate_request_bytes(len(file_data)), deadline))
+        job_id = job_manager.submit(file_data, deadline=deadline, motor_id=request.form.get('motor_id'),
+                                    memory_reserved=memory_hold is not None)
+    except AdmissionError as e:
+        return None, admission_error_response(e)
+    return job_id, None
+
 @app.route("/predict", methods=["POST"])
 def predict():
-    """Handle file upload and prediction"""
+    """Handle file upload and prediction (synchronous wrapper around the job API)"""
     try:
-        if 'file' not in request.files:
-            return jsonify({"error": "No file provided"}), 400
-        
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({"error": "No file selected"}), 400
-        
-        if not file.filename.endswith('.mat'):
-            return jsonify({"error": "Only .mat files are supported"}), 400
+        # The memory reservation covers the serialized response too, so it is released only after jsonify
+        with ExitStack() as memory_hold:
+            job_id, error_response = submit_uploaded_file(memory_hold)
+            if error_response:
+                return error_response
+
+            job = job_manager.wait(job_id)
+            job_manager.discard(job_id)
+            if isinstance(job["exception"], AdmissionError):
+                return admission_error_response(job["exception"])
+            if job["status"] == "error":
+                return jsonify({
+                    "status": "error",
+                    "error": f"Prediction failed: {job['error']}"
+                }), 500
+
+            with RequestMemory().stage('serialize', lambda: estimate_serialize_bytes(CAPTURE_VALUES)):
+                response = jsonify(job["result"])
+        return response
 
-        # Save the uploaded file
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
-        file.save(file_path)
-        print(f"\nReceived and saved file: {file.filename}")
-        
-        try:
-            # First, let's examine the contents of the .mat file
-            try:
-                mat_data = sio.loadmat(file_path, struct_as_record=False, squeeze_me=True)
-                print("\nMAT file contents:")
-                keys = [k for k in mat_data.keys() if not k.startswith('__')]
-                print("Available keys:", keys)
-                
-                # Find essaisX key
-                essais_key = None
-                for key in keys:
-                    if key.startswith('essais'):
-                        essais_key = key
-                        print(f"Found essais key: {essais_key}")
-                        break
-
-                # Check structure
-                if essais_key:
-                    print(f"\nExamining {essais_key} structure")
-                    essais = mat_data[essais_key]
-                    if hasattr(essais, 'Y'):
-                        print("Found Y attribute")
-                        Y = essais.Y
-                        if isinstance(Y, (list, np.ndarray)):
-                            print(f"Y contains {len(Y)} entries")
-                            if isinstance(Y, np.ndarray) and Y.dtype.names is not None:
-                                print("Y is a structured array with fields:", Y.dtype.names)
-                            else:
-                                for i, entry in enumerate(Y):
-                                    print(f"Entry {i} attributes:", [attr for attr in dir(entry) if not attr.startswith('__')])
-                    
-                    # Check for direct attributes
-                    attrs = [attr for attr in dir(essais) if not attr.startswith('__')]
-                    print(f"\nDirect attributes in {essais_key}:", attrs)
-                
-            except Exception as e:
-                print(f"Error examining .mat file: {str(e)}")
-
-            # Read the file data for prediction
-            with open(file_path, 'rb') as f:
-                file_data = f.read()
-            
-            # Make prediction
-            result = predict_from_file(file_data)
-            
-            # Convert numpy types to Python types
-            result = convert_numpy_types(result)
-            
-            return jsonify(result)
-            
-        except Exception as e:
-            return jsonify({
-                "status": "error",
-                "error": f"Prediction failed: {str(e)}"
-            }), 500
-            
     except Exception as e:
         return jsonify({
             "status": "error",
             "error": str(e)
         }), 500
 
+@app.route("/jobs", methods=["POST"])
+def create_job():
+    """Store an uploaded file and return a job id straight away"""
+    try:
+        job_id, error_response = submit_uploaded_file()
+        if error_response:
+            return error_response
+
+        return jsonify({
+            "status": "queued",
+            "job_id": job_id,
+            "status_url": f"/jobs/{job_id}"
+        }), 202
+
+    except Exception as e:
+        return jsonify({
+            "status": "error",
+            "error": str(e)
+        }), 500
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """Return the status of a prediction job and its result once finished"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "error": "Unknown or expired job id"}), 404
+    return jsonify(job_to_dict(job))
+
+@app.route("/schedule", methods=["GET"])
+def get_schedule():
+    """Per-motor scoring intervals, recent scheduling decisions and the resulting inference rate"""
+    return jsonify(scheduler.report())
+
+@app.route("/transport-stats", methods=["GET"])
+def get_transport_stats():
+    """Capture-to-prediction latency of monitoring, per capture transport (shm ring / .mat file)"""
+    return jsonify(transport_latency.to_dict())
+
+@app.route("/memory-stats", methods=["GET"])
+def get_memory_stats():
+    """Global memory budget state and per-stage peak bytes"""
+    return jsonify({"budget": memory_budget.stats(), "stages": memory_stats.to_dict(),
+                    "rss_bytes": current_rss_bytes()})
+
+@app.route("/admission-stats", methods=["GET"])
+def admission_stats():
+    """Expose admission queue state and how much work was shed"""
+    return jsonify({"admission": admission.stats(), "jobs": job_manager.stats()})
+
+@app.route("/change-detection-stats", methods=["GET"])
+def get_change_detection_stats():
+    """Per-motor skip ratio of the change detector and its estimated accuracy impact"""
+    return jsonify(change_detector.report())
+
+@app.route("/cascade-stats", methods=["GET"])
+def get_cascade_stats():
+    """How often the spectral pre-screen let a capture skip the model"""
+    return jsonify(cascade_stats.to_dict())
+
+@app.route("/inference-stats", methods=["GET"])
+def get_inference_stats():
+    """Batch bucket hit counts and padding waste of the active model"""
+    try:
+        version, predictor = registry.current()
+        return jsonify({"model_version": version, **predictor.stats()})
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 503
+
+@app.route("/models", methods=["GET"])
+def list_models():
+    """List loaded model versions and the active one"""
+    return jsonify(registry.describe())
+
+def model_admin_error():
+    """404 when model administration is disabled, 403 for a wrong X-Admin-Token, else None"""
+    if not model_admin_enabled():
+        return jsonify({"error": "Not found"}), 404
+    if not check_admin_token(request.headers.get('X-Admin-Token')):
+        return jsonify({"error": "Invalid admin token"}), 403
+    return None
+
+@app.route("/models", methods=["POST"])
+def load_model_version():
+    """Load and warm a model version in the background, then swap it in.
+    Disabled unless MODEL_ADMIN_TOKEN is set; 'path' is a file name under MODELS_DIR."""
+    error_response = model_admin_error()
+    if error_response:
+        return error_response
+    try:
+        data = request.get_json(force=True) or {}
+        version = data.get("version")
+        path = data.get("path")
+        if not version or not path:
+            return jsonify({"error": "Both 'version' and 'path' are required"}), 400
+        if not isinstance(version, str) or not isinstance(path, str):
+            return jsonify({"error": "'version' and 'path' must be strings"}), 400
+        try:
+            model_path = resolve_model_path(path)
+        except ValueError as e:
+            return jsonify({"error": str(e), "models_dir": MODELS_DIR}), 400
+        registry.load(version, model_path, activate=data.get("activate", True), background=True)
+        return jsonify({"status": "loading", "version": version}), 202
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/models/<version>/activate", methods=["POST"])
+def activate_model_version(version):
+    """Switch traffic to an already loaded version (e.g. roll back)"""
+    error_response = model_admin_error()
+    if error_response:
+        return error_response
+    try:
+        registry.activate(version)
+        return jsonify({"status": "activated", "version": version})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 404
+
+@app.route("/shard", methods=["GET"])
+def get_shard():
+    """This instance's view of the shard ring"""
+    return jsonify(shard.to_dict())
+
+@app.route("/history", methods=["GET"])
+def list_history_motors():
+    """List motors with recorded prediction history"""
+    return jsonify({"motors": history.motors()})
+
+@app.route("/history/<motor_id>", methods=["GET"])
+def get_history(motor_id):
+    """Prediction history for a motor: raw rows or minute/hour rollups over a time range"""
+    try:
+        start = request.args.get('start', type=float)
+        end = request.args.get('end', type=float)
+        resolution = request.args.get('resolution', 'raw')
+        if resolution == 'raw':
+            limit = request.args.get('limit', 1000, type=int)
+            data = history.predictions(motor_id, start, end, limit)
+        else:
+            data = history.rollups(motor_id, resolution, start, end)
+        return jsonify({"motor_id": motor_id, "resolution": resolution, "data": data})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/similar/<int:prediction_id>", methods=["GET"])
+def get_similar(prediction_id):
+    """Past captures that looked most like a stored prediction: ?k=10&method=auto|exact|approx&motor_id="""
+    k = min(max(request.args.get('k', 10, type=int), 1), 100)
+    method = request.args.get('method', 'auto')
+    if method not in ('auto', 'exact', 'approx'):
+        return jsonify({"error": "method must be auto, exact or approx"}), 400
+    try:
+        started = time.time()
+        neighbours = similarity_index.similar(prediction_id, k, method, request.args.get('motor_id'))
+    except KeyError as e:
+        return jsonify({"error": str(e)}), 404
+    return jsonify({
+        "prediction_id": prediction_id,
+        "neighbours": neighbours,
+        "search_ms": 1000 * (time.time() - started)
+    })
+
+@app.route("/similarity-stats", methods=["GET"])
+def get_similarity_stats():
+    return jsonify(similarity_index.stats())
+
+def pyramid_query_args():
+    channels = request.args.get('channels')
+    return {
+        "start": request.args.get('start', type=float),
+        "end": request.args.get('end', type=float),
+        "width": request.args.get('width', 1000, type=int),
+        "channels": channels.split(',') if channels else None
+    }
+
+@app.route("/captures/<int:prediction_id>/signals", methods=["GET"])
+def get_capture_signals(prediction_id):
+    """Min/max/mean of a stored capture at screen resolution: ?start=&end= (s)&width=&channels=i1,vibrad"""
+    try:
+        return jsonify(pyramid_store.capture_range(prediction_id, **pyramid_query_args()))
+    except KeyError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/history/<motor_id>/signals", methods=["GET"])
+def get_history_signals(motor_id):
+    """Min/max/mean over a motor's captures at screen resolution: ?start=&end= (epoch s)&width=&channels="""
+    try:
+        return jsonify(pyramid_store.motor_range(motor_id, **pyramid_query_args()))
+    except KeyError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/feedback", methods=["POST"])
+def submit_feedback():
+    """Operator-confirmed label for a stored prediction: {"prediction_id": 12, "label": "sain"}"""
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"error": "Expected a JSON object with prediction_id and label"}), 400
+    label = body.get('label')
+    if body.get('prediction_id') is None or label is None:
+        return jsonify({"error": "prediction_id and label are required"}), 400
+    try:
+        if isinstance(body['prediction_id'], (bool, float)):
+            raise ValueError("not an integer")
+        prediction_id = int(body['prediction_id'])
+    except (TypeError, ValueError):
+        return jsonify({"error": "prediction_id must be an integer"}), 400
+    if not isinstance(label, str):
+        return jsonify({"error": "label must be a string"}), 400
+    try:
+        prediction = evaluator.add_feedback(prediction_id, label)
+    except KeyError as e:
+        return jsonify({"error": str(e)}), 404
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "status": "recorded",
+        "prediction_id": prediction_id,
+        "label": label,
+        "predicted": prediction["state"],
+        "model_version": prediction["model_version"]
+    })
+
+@app.route("/evaluation", methods=["GET"])
+def list_evaluation():
+    """Streaming evaluation metrics for every model version with feedback"""
+    return jsonify({version: evaluator.metrics(version) for version in evaluator.versions()})
+
+@app.route("/evaluation/<version>", methods=["GET"])
+def get_evaluation(version):
+    """Streaming evaluation metrics for one model version"""
+    known = version in evaluator.versions() or version in registry.versions or history.has_model_version(version)
+    if not known:
+        return jsonify({"error": f"Unknown model version {version}"}), 404
+    return jsonify(evaluator.metrics(version))
+
+@app.route("/debug/profile", methods=["POST"])
+def debug_profile():
+    """Capture a sampling profile of live requests as a collapsed-stack (flamegraph) file.
+    Disabled unless PROFILING_TOKEN is set; the token goes in the X-Profile-Token header."""
+    if not profiling_enabled():
+        return jsonify({"error": "Not found"}), 404
+    if not check_token(request.headers.get('X-Profile-Token')):
+        return jsonify({"error": "Invalid profiling token"}), 403
+    try:
+        seconds = request.args.get('seconds', 10, type=float)
+        interval = request.args.get('interval_ms', 10, type=float) / 1000
+        tensorflow_trace = request.args.get('tensorflow', '0') == '1'
+        collapsed, logdir = capture_profile(seconds, interval, tensorflow_trace)
+    except ProfilerBusyError as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    response = Response(collapsed, mimetype='text/plain')
+    response.headers['Content-Disposition'] = 'attachment; filename=profile.collapsed'
+    if logdir:
+        response.headers['X-TensorFlow-Trace-Dir'] = logdir
+    return response
+
 @app.route("/start-monitoring", methods=["POST"])
 def start_monitoring():
     global is_monitoring
@@ -146,7 +625,17 @@ def stop_monitoring():
 
 @app.route("/get-monitoring-status", methods=["GET"])
 def get_monitoring_status():
+    """Latest verdict for a monitored motor: ?motor_id= (default: the signal generator's captures).
+    Other motors are read from their own GENERATED_SIGNALS_DIR/<motor_id> directory, as the fleet simulator writes them."""
     global is_monitoring, last_processed_file
+    if traffic_recorder:
+        traffic_recorder.record_monitoring()
+    motor_id = request.args.get('motor_id') or app.config['MONITORING_MOTOR_ID']
+    if not MOTOR_ID_PATTERN.match(motor_id) or motor_id in ('.', '..'):
+        return jsonify({"status": "error", "error": "Invalid motor_id", "prediction": None, "timestamp": None}), 400
+    generator_motor = motor_id == app.config['MONITORING_MOTOR_ID']
+    decision = None
+    inferred = False
     try:
         if not is_monitoring:
             return jsonify({
@@ -155,50 +644,144 @@ def get_monitoring_status():
                 "timestamp": None
             })
 
-        # Get the latest file from the generated_signals directory
-        files = [f for f in os.listdir(app.config['GENERATED_SIGNALS_DIR']) if f.endswith('.mat')]
-        print(f"Found {len(files)} .mat files in directory")
-        
-        if not files:
-            return jsonify({
-                "status": "waiting",
-                "prediction": None,
-                "timestamp": None,
-                "message": "Waiting for signal files..."
-            })
+        # Newest capture: in place from the shared-memory ring if the generator writes one, else the .mat manifest
+        frame = capture_ring.latest() if generator_motor else None
+        if frame is not None:
+            transport = 'shm'
+            file_path = f"shm:{frame.sequence}"
+            current_timestamp = frame.timestamp
+            print(f"Processing shared-memory frame {frame.sequence}")
+        else:
+            # The generator publishes a pointer to its newest complete capture
+            capture_dir = app.config['GENERATED_SIGNALS_DIR']
+            latest = read_latest_capture(capture_dir if generator_motor else os.path.join(capture_dir, motor_id))
+            
+            if latest is None:
+                return jsonify({
+                    "status": "waiting",
+                    "prediction": None,
+                    "timestamp": None,
+                    "message": "Waiting for signal files..."
+                })
 
-        # Get latest file
-        latest_file = max(files, key=lambda x: os.path.getctime(os.path.join(app.config['GENERATED_SIGNALS_DIR'], x)))
-        file_path = os.path.join(app.config['GENERATED_SIGNALS_DIR'], latest_file)
-        current_timestamp = os.path.getctime(file_path)
+            transport = 'file'
+            file_path = latest["path"]
+            current_timestamp = latest["timestamp"]
 
-        # Always process the latest file
-        print(f"Processing file: {latest_file}")
+            # Always process the latest file
+            print(f"Processing file: {latest['file']}")
         
-        # Read the file and make prediction
-        with open(file_path, 'rb') as f:
-            file_data = f.read()
+        # Skip re-inference when the capture hasn't changed (same file, or a near-identical fingerprint)
+        if not shard.owns(motor_id):
+            # Another instance owns this motor since the last rebalance; send the poller there
+            owner_id, owner_url = shard.owner(motor_id)
+            response = jsonify({"status": "moved", "motor_id": motor_id, "instance_id": owner_id, "url": owner_url})
+            response.status_code = 307
+            if owner_url:
+                response.headers['Location'] = owner_url.rstrip('/') + request.full_path.rstrip('?')
+            return response
+        cache_key = registry.cache_key(motor_id)
+        source = (file_path, current_timestamp)
+
+        # Adaptive cadence: between scheduled scores (or when over capacity) serve the last verdict.
+        # A positive decision takes a token, given back in `finally` unless the model actually ran
+        decision = scheduler.decide(motor_id)
+        previous = change_detector.previous(cache_key)
+        if not decision["score"] and previous is None:
+            # Nothing to serve (e.g. the model changed) and no token taken: the model only runs on a positive decision
+            message = "Inference capacity exhausted" if decision["reason"] == "over_capacity" else "Motor not due yet"
+            response = jsonify({"status": "waiting", "prediction": None, "timestamp": current_timestamp,
+                                "message": message, "retry_after": decision["next_due_in"]})
+            response.headers['Retry-After'] = str(max(1, int(decision["next_due_in"] + 0.999)))
+            return response
+        if not decision["score"]:
+            result = previous
+        else:
+            result = change_detector.lookup_source(cache_key, motor_id, source)
+        reused = result is not None
+        prediction_id = None
         
-        result = predict_from_file(file_data)
+        if not reused:
+            # Read the capture (a view into the ring, or the parsed file) and fingerprint it
+            if frame is not None:
+                payload_bytes = frame.signals.nbytes
+                read_signals = lambda: frame.signals
+                parse_bytes = lambda: 0
+            else:
+                file_data = read_capture(file_path)
+                payload_bytes = len(file_data)
+                read_signals = lambda: load_signals(file_data)
+                parse_bytes = lambda: estimate_parse_bytes(payload_bytes, raw_signals)
+            deadline = request_deadline(MONITORING_DEADLINE)
+            memory = RequestMemory()
+            try:
+                with memory_budget.reserve(estimate_request_bytes(payload_bytes), deadline):
+                    with memory.stage('parse', parse_bytes):
+                        raw_signals = read_signals()
+                    capture_fingerprint = fingerprint(raw_signals)
+                    if frame is not None and not frame.still_valid():
+                        # Lapped while fingerprinting: the fingerprint may mix two captures
+                        return frame_overwritten_response(current_timestamp)
+                    result, forced_refresh = change_detector.lookup(cache_key, motor_id, capture_fingerprint, source)
+                    reused = result is not None
+                    
+                    if not reused:
+                        # Background priority: interactive /predict requests are served first
+                        with admission.admit(PRIORITY_BACKGROUND, deadline):
+                            with memory.stage('predict', lambda: estimate_predict_bytes(raw_signals)):
+                                result = predict_from_signals(raw_signals, deadline=deadline)
+                        inferred = True
+            except AdmissionError as e:
+                return admission_error_response(e, {"prediction": None, "timestamp": current_timestamp})
+            
+            if not reused and frame is not None:
+                # Copy for the history before the final check, so the check covers what gets stored too
+                raw_signals = frame.signals.astype(np.float32)
+                if not frame.still_valid():
+                    # Lapped while predicting
+                    return frame_overwritten_response(current_timestamp)
+            
+            if not reused:
+                transport_latency.record(transport, time.time() - current_timestamp)
+                # Convert numpy types to Python types
+                result = convert_numpy_types(result)
+                change_detector.record(cache_key, motor_id, source, capture_fingerprint, result, forced_refresh)
+            else:
+                print("Capture unchanged, reusing previous prediction")
+            if result.get("status") == "success":
+                scheduler.observe(motor_id, result["prediction"], result["confidence"], inferred=not reused)
+            if not reused:
+                # A reused verdict is already in the history (and its pyramid stored)
+                prediction_id = record_history(motor_id, result, current_timestamp, raw_signals)
+        elif decision["score"]:
+            # Same capture as last time: nothing to run, but the motor was due
+            scheduler.observe(motor_id, result["prediction"], result["confidence"], inferred=False)
         last_processed_file = file_path
         
-        # Convert numpy types to Python types
-        result = convert_numpy_types(result)
-        
         # Create monitoring response with all necessary information
         monitoring_response = {
             "status": "running",
             "timestamp": current_timestamp,
+            "reused_previous": reused,
+            "transport": transport,
+            "schedule": {
+                "scored": decision["score"],
+                "reason": decision["reason"],
+                "next_poll_in": scheduler.report_motor(motor_id)["next_due_in"]
+            },
+            "prediction_id": prediction_id,
             "prediction": {
                 "state": result["prediction"],
                 "confidence": result["confidence"],
+                "model_version": result.get("model_version"),
                 "details": {
                     "class_probabilities": result["class_probabilities"],
                     "validation_patterns": result["validation_patterns"]
                 }
             },
             "signals": result.get("signals", {}),
-            "metrics": result.get("metrics", {})
+            # Current metrics, not the ones cached with a reused prediction
+            "metrics": evaluator.metrics(result.get("model_version"))
         }
         
         print("\nMonitoring Response:")
@@ -218,6 +801,24 @@ def get_monitoring_status():
             "prediction": None,
             "timestamp": None
         }), 500
+    finally:
+        if decision is not None and decision["score"] and not inferred:
+            # Reused, waited, shed or failed before the model ran: the capacity goes back to the fleet
+            scheduler.refund(motor_id)
+
+def shutdown():
+    """Leave the shard ring and remove the RPC socket so callers move on straight away"""
+    shard.stop()
+    if rpc_server:
+        rpc_server.close()
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5600)
+    # Only the reloader's serving child joins the ring
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        shard.start()
+        if rpc_server:
+            rpc_server.start()
+        atexit.register(shutdown)
+        # SIGTERM (process managers) exits through atexit too
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    app.run(debug=True, port=int(os.environ.get("PORT", "5600")))
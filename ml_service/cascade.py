@@ -0,0 +1,153 @@
+"""Cheap spectral pre-screen run before the CNN-LSTM.
+
+Captures the pre-screen classifies with very high confidence skip the model;
+ambiguous ones go on to the full model. Run as a script to measure the skip
+rate and agreement with the full model on a labelled corpus:
+
+    python cascade.py <corpus_dir> [--threshold 0.98] [--skip-classes sain]
+"""
+import argparse
+import os
+import threading
+import time
+import numpy as np
+
+from features import SIGNAL_NAMES, SAMPLE_RATE, FEATURE_BANDS
+from utils import CLASS_NAMES, iter_labelled_files, load_sample
+
+# Cascade configuration
+CASCADE_ENABLED = os.environ.get("CASCADE_ENABLED", "0") == "1"
+CASCADE_THRESHOLD = float(os.environ.get("CASCADE_THRESHOLD", "0.98"))  # Pre-screen confidence needed to skip the model
+CASCADE_SKIP_CLASSES = os.environ.get("CASCADE_SKIP_CLASSES", "sain").split(",")  # Classes allowed to skip the model
+PRESCREEN_TEMPERATURE = 20.0  # Sharpness of the band-energy softmax
+PRESCREEN_VERSION = "prescreen"  # Reported as model_version when the model was skipped
+
+PRESCREEN_CHANNELS = [SIGNAL_NAMES.index(name) for name in ('i1', 'i2', 'i3', 'vibrad')]
+
+def prescreen_batch(batch, sample_rate=SAMPLE_RATE):
+    """Score a batch of (N, 9, T) captures; returns (N, 3) probabilities in CLASS_NAMES order"""
+    batch = np.asarray(batch, dtype=np.float32)
+    channels = batch[:, PRESCREEN_CHANNELS, :]
+    spectrum = np.abs(np.fft.rfft(channels, axis=-1)) ** 2
+    freqs = np.fft.rfftfreq(batch.shape[-1], 1 / sample_rate)
+    total = spectrum[..., 1:].sum(axis=-1) + 1e-12
+
+    energies = {}
+    for name, (centre, width) in FEATURE_BANDS.items():
+        mask = (freqs >= centre - width) & (freqs <= centre + width)
+        energies[name] = spectrum[..., mask].sum(axis=-1) / total  # (N, channels)
+
+    # Fault evidence is the strongest band over all channels; healthy evidence is a clean 50 Hz on the currents
+    broken = energies['band_100hz'].max(axis=1)
+    unbalance = energies['band_25hz'].max(axis=1)
+    healthy = energies['band_50hz'][:, :3].mean(axis=1) - broken - unbalance
+
+    logits = PRESCREEN_TEMPERATURE * np.stack([broken, healthy, unbalance], axis=1)  # CLASS_NAMES order
+    logits -= logits.max(axis=1, keepdims=True)
+    probs = np.exp(logits)
+    return probs / probs.sum(axis=1, keepdims=True)
+
+def skip_mask(probs, threshold=None, skip_classes=None):
+    """Boolean mask of captures confident enough to skip the model"""
+    threshold = CASCADE_THRESHOLD if threshold is None else threshold
+    skip_classes = CASCADE_SKIP_CLASSES if skip_classes is None else skip_classes
+    allowed = np.array([name in skip_classes for name in CLASS_NAMES])
+    best = np.argmax(probs, axis=1)
+    return (probs.max(axis=1) >= threshold) & allowed[best]
+
+class CascadeStats:
+    """Counters for how often the model was skipped"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.screened = 0
+        self.skipped = 0
+        self.skipped_by_class = {name: 0 for name in CLASS_NAMES}
+
+    def record(self, skipped, predicted_class):
+        with self.lock:
+            self.screened += 1
+            if skipped:
+                self.skipped += 1
+                self.skipped_by_class[predicted_class] += 1
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "enabled": CASCADE_ENABLED,
+                "threshold": CASCADE_THRESHOLD,
+                "skip_classes": CASCADE_SKIP_CLASSES,
+                "screened": self.screened,
+                "skipped": self.skipped,
+                "skip_rate": self.skipped / self.screened if self.screened else 0.0,
+                "skipped_by_class": dict(self.skipped_by_class)
+            }
+
+cascade_stats = CascadeStats()
+
+def evaluate_corpus(base_path, threshold, skip_classes, batch_size=8):
+    """Run pre-screen and full model (with validation rules, as served) over a labelled corpus and compare them"""
+    from predictClass import predict_batch, registry
+
+    model = registry.current()
+    model_version = model[0]
+    labels, prescreen_probs, model_probs = [], [], []
+    prescreen_time = model_time = 0.0
+
+    files = list(iter_labelled_files(base_path))
+    for start in range(0, len(files), batch_size):
+        chunk = files[start:start + batch_size]
+        batch = np.stack([load_sample(path) for _, path in chunk], axis=0)  # (N, 9, T)
+        labels.extend(CLASS_NAMES.index(label) for label, _ in chunk)
+
+        started = time.time()
+        prescreen_probs.append(prescreen_batch(batch))
+        prescreen_time += time.time() - started
+
+        started = time.time()
+        # Served pipeline: model plus validation rules, in one batched call
+        results = predict_batch(batch, model=model)
+        model_probs.append(np.array([[result["class_probabilities"][name] for name in CLASS_NAMES]
+                                     for result in results]))
+        model_time += time.time() - started
+
+    if not labels:
+        raise ValueError(f"No labelled .mat/.npz files found under {base_path}")
+
+    labels = np.array(labels)
+    prescreen_probs = np.concatenate(prescreen_probs)
+    model_pred = np.argmax(np.concatenate(model_probs), axis=1)
+    prescreen_pred = np.argmax(prescreen_probs, axis=1)
+    skipped = skip_mask(prescreen_probs, threshold, skip_classes)
+    cascade_pred = np.where(skipped, prescreen_pred, model_pred)
+
+    n = len(labels)
+    return {
+        "model_version": model_version,
+        "samples": n,
+        "threshold": threshold,
+        "skip_classes": skip_classes,
+        "skip_rate": float(skipped.mean()),
+        "agreement_on_skipped": float((prescreen_pred[skipped] == model_pred[skipped]).mean()) if skipped.any() else None,
+        "prescreen_accuracy_on_skipped": float((prescreen_pred[skipped] == labels[skipped]).mean()) if skipped.any() else None,
+        "model_accuracy": float((model_pred == labels).mean()),
+        "cascade_accuracy": float((cascade_pred == labels).mean()),
+        "prescreen_ms_per_sample": 1000 * prescreen_time / n,
+        "model_ms_per_sample": 1000 * model_time / n,
+        "model_invocations_saved": int(skipped.sum())
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Report cascade skip rate and agreement with the full model")
+    parser.add_argument("corpus", help="Folder laid out as <corpus>/<class>/*.mat|*.npz")
+    parser.add_argument("--threshold", type=float, default=CASCADE_THRESHOLD)
+    parser.add_argument("--skip-classes", default=",".join(CASCADE_SKIP_CLASSES))
+    args = parser.parse_args()
+
+    report = evaluate_corpus(args.corpus, args.threshold, args.skip_classes.split(","))
+    print("\n=== Cascade report ===")
+    for key, value in report.items():
+        print(f"{key}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import threading
+import time
+import numpy as np
+
+from features import FEATURE_CHANNELS, SIGNAL_NAMES, band_energies
+
+# Change detection configuration
+SKETCH_POINTS = 50  # Envelope blocks per channel (1000 samples = one 50 Hz period each)
+RMS_TOLERANCE = 0.02  # Max relative per-channel RMS change to count as unchanged
+BAND_TOLERANCE = 0.02  # Max absolute change in band-energy share
+SKETCH_TOLERANCE = 0.05  # Max relative L2 distance between envelope sketches
+REFRESH_INTERVAL = 60.0  # Seconds after which a motor is always re-scored
+
+def fingerprint(raw_signals):
+    """Compact fingerprint of a raw (9, T) capture: per-channel RMS, band energies and an envelope sketch"""
+    raw_signals = np.asarray(raw_signals, dtype=np.float64)
+    centred = raw_signals - raw_signals.mean(axis=1, keepdims=True)
+    rms = np.sqrt(np.mean(raw_signals ** 2, axis=1))
+
+    bands = []
+    for name in FEATURE_CHANNELS:
+        bands.extend(band_energies(centred[SIGNAL_NAMES.index(name)]).values())
+
+    # Block RMS envelope is insensitive to the phase at which the capture started
+    usable = (centred.shape[1] // SKETCH_POINTS) * SKETCH_POINTS
+    blocks = centred[:, :usable].reshape(centred.shape[0], SKETCH_POINTS, -1)
+    sketch = np.sqrt(np.mean(blocks ** 2, axis=2))
+
+    return {"rms": rms, "bands": np.array(bands), "sketch": sketch}
+
+def fingerprint_distance(a, b):
+    """Per-component distances between two fingerprints"""
+    rms = np.max(np.abs(a["rms"] - b["rms"]) / (np.abs(b["rms"]) + 1e-8))
+    bands = np.max(np.abs(a["bands"] - b["bands"]))
+    sketch = np.linalg.norm(a["sketch"] - b["sketch"]) / (np.linalg.norm(b["sketch"]) + 1e-8)
+    return {"rms": float(rms), "bands": float(bands), "sketch": float(sketch)}
+
+def is_unchanged(distance):
+    return (distance["rms"] <= RMS_TOLERANCE and distance["bands"] <= BAND_TOLERANCE
+            and distance["sketch"] <= SKETCH_TOLERANCE)
+
+class ChangeDetector:
+    """Per-motor delta detector that reuses the last prediction for near-identical captures"""
+
+    def __init__(self, refresh_interval=REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.lock = threading.Lock()
+        self.last = {}  # cache key -> {"source", "fingerprint", "result", "scored_at"}
+        self.stats = {}
+
+    def _motor_stats(self, motor_id):
+        return self.stats.setdefault(motor_id, {
+            "checked": 0, "reused": 0, "reused_same_source": 0, "scored": 0,
+            "forced_refreshes": 0, "refresh_disagreements": 0
+        })
+
+    def lookup_source(self, key, motor_id, source):
+        """Reuse the previous result when the exact same capture (e.g. path and ctime) is seen again"""
+        with self.lock:
+            entry = self.last.get(key)
+            if entry is None or entry["source"] != source:
+                return None
+            if time.time() - entry["scored_at"] >= self.refresh_interval:
+                return None
+            stats = self._motor_stats(motor_id)
+            stats["checked"] += 1
+            stats["reused"] += 1
+            stats["reused_same_source"] += 1
+            return entry["result"]
+
+    def previous(self, key):
+        """Last recorded result for a cache key, regardless of age"""
+        with self.lock:
+            entry = self.last.get(key)
+            return entry["result"] if entry else None
+
+    def lookup(self, key, motor_id, fp, source=None):
+        """Return (previous_result or None, would_reuse) for a fingerprinted capture.
+
+        would_reuse is True when the capture is unchanged but the refresh
+        interval forced a re-score; record() then checks whether the fresh
+        verdict agrees with the reused one, which estimates the accuracy cost.
+        On reuse the entry takes over `source`, so polling the same capture
+        again is answered by lookup_source() without re-reading it.
+        """
+        with self.lock:
+            stats = self._motor_stats(motor_id)
+            stats["checked"] += 1
+            entry = self.last.get(key)
+            if entry is None or not is_unchanged(fingerprint_distance(fp, entry["fingerprint"])):
+                return None, False
+            if time.time() - entry["scored_at"] >= self.refresh_interval:
+                stats["forced_refreshes"] += 1
+                return None, True
+            stats["reused"] += 1
+            if source is not None:
+                entry["source"] = source
+            return entry["result"], True
+
+    def record(self, key, motor_id, source, fp, result, forced_refresh=False):
+        """Remember a freshly scored capture"""
+        if result.get("status") != "success":
+            return
+        with self.lock:
+            stats = self._motor_stats(motor_id)
+            stats["scored"] += 1
+            previous = self.last.get(key)
+            if forced_refresh and previous is not None and previous["result"]["prediction"] != result["prediction"]:
+                stats["refresh_disagreements"] += 1
+            self.last[key] = {"source": source, "fingerprint": fp, "result": result, "scored_at": time.time()}
+
+    def report(self):
+        """Skip ratio and estimated accuracy impact per motor"""
+        with self.lock:
+            motors = {}
+            for motor_id, stats in self.stats.items():
+                motors[motor_id] = dict(stats)
+                motors[motor_id]["skip_ratio"] = stats["reused"] / stats["checked"] if stats["checked"] else 0.0
+                motors[motor_id]["refresh_disagreement_rate"] = (
+                    stats["refresh_disagreements"] / stats["forced_refreshes"] if stats["forced_refreshes"] else None
+                )
+            return {
+                "tolerances": {"rms": RMS_TOLERANCE, "bands": BAND_TOLERANCE, "sketch": SKETCH_TOLERANCE},
+                "refresh_interval": self.refresh_interval,
+                "motors": motors
+            }
@@ -0,0 +1,163 @@
+"""Compressed capture payloads: streaming decode for uploads and optional compressed storage.
+
+    python compression.py bench <file.mat> [<file.mat> ...]
+
+prints size versus encode/decode time for every available codec, so the
+format can be chosen per link.
+"""
+import argparse
+import gzip
+import io
+import os
+import time
+import scipy.io as sio
+
+try:
+    import zstandard
+except ImportError:  # zstd support is optional
+    zstandard = None
+
+MAX_DECOMPRESSED_SIZE = 64 * 1024 * 1024  # Refuse payloads that inflate beyond this (one capture is ~3.6 MB)
+READ_CHUNK = 1 << 20
+
+# File suffix -> Content-Encoding name
+SUFFIX_ENCODINGS = {
+    '.gz': 'gzip',
+    '.zst': 'zstd',
+    '.zstd': 'zstd',
+}
+ENCODING_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+
+# What a corrupt or truncated payload raises while decoding (gzip: OSError/EOFError, zstd: ZstdError)
+DECODE_ERRORS = (OSError, EOFError, ValueError) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+class UnsupportedEncodingError(ValueError):
+    """Raised for a Content-Encoding this service cannot decode"""
+    pass
+
+def supported_encodings():
+    return ['identity', 'gzip'] + (['zstd'] if zstandard is not None else [])
+
+def split_encoding_suffix(filename):
+    """Return (filename without compression suffix, encoding or None)"""
+    base, ext = os.path.splitext(filename)
+    encoding = SUFFIX_ENCODINGS.get(ext.lower())
+    return (base, encoding) if encoding else (filename, None)
+
+def _read_limited(stream, limit=MAX_DECOMPRESSED_SIZE):
+    chunks = []
+    total = 0
+    while True:
+        chunk = stream.read(READ_CHUNK)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > limit:
+            raise ValueError(f"Decompressed payload exceeds {limit} bytes")
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+def decode_stream(stream, encoding=None):
+    """Read a (possibly compressed) payload from a file-like object, decoding as it streams"""
+    encoding = (encoding or 'identity').strip().lower()
+    if encoding in ('identity', ''):
+        return _read_limited(stream)
+    if encoding in ('gzip', 'x-gzip'):
+        with gzip.GzipFile(fileobj=stream, mode='rb') as decoded:
+            return _read_limited(decoded)
+    if encoding == 'zstd':
+        if zstandard is None:
+            raise UnsupportedEncodingError("zstd payloads need the 'zstandard' package")
+        with zstandard.ZstdDecompressor().stream_reader(stream) as decoded:
+            return _read_limited(decoded)
+    raise UnsupportedEncodingError(f"Unsupported Content-Encoding: {encoding}")
+
+def decompress_bytes(data, encoding=None):
+    return decode_stream(io.BytesIO(data), encoding)
+
+def compress_bytes(data, encoding, level=None):
+    """Compress bytes for storage with gzip or zstd"""
+    if encoding in (None, 'identity'):
+        return data
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=6 if level is None else level)
+    if encoding == 'zstd':
+        if zstandard is None:
+            raise UnsupportedEncodingError("zstd storage needs the 'zstandard' package")
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+    raise UnsupportedEncodingError(f"Unsupported storage encoding: {encoding}")
+
+def read_capture(path):
+    """Read a stored capture, transparently decompressing .gz/.zst files"""
+    _, encoding = split_encoding_suffix(path)
+    with open(path, 'rb') as f:
+        return decode_stream(f, encoding)
+
+def write_capture(path, data, encoding=None):
+    """Store capture bytes, appending the codec suffix; returns the path written"""
+    if encoding not in (None, 'identity'):
+        path += ENCODING_SUFFIXES[encoding]
+    with open(path, 'wb') as f:
+        f.write(compress_bytes(data, encoding))
+    return path
+
+def benchmark(paths, repeat=3):
+    """Size vs encode/decode time for each codec, including MATLAB's own zlib compression"""
+    results = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            raw = f.read()
+        mat_data = sio.loadmat(io.BytesIO(raw))
+
+        variants = [('identity', None)]
+        variants += [('gzip', level) for level in (1, 6, 9)]
+        if zstandard is not None:
+            variants += [('zstd', level) for level in (1, 3, 10, 19)]
+
+        # MATLAB-compressed .mat: zlib per variable, decoded by loadmat itself
+        started = time.time()
+        for _ in range(repeat):
+            buffer = io.BytesIO()
+            sio.savemat(buffer, mat_data, do_compression=True)
+        encode_time = (time.time() - started) / repeat
+        mat_compressed = buffer.getvalue()
+        started = time.time()
+        for _ in range(repeat):
+            sio.loadmat(io.BytesIO(mat_compressed))
+        results.append({
+            "file": os.path.basename(path), "codec": "mat-zlib", "level": None,
+            "bytes": len(mat_compressed), "ratio": len(raw) / len(mat_compressed),
+            "encode_ms": 1000 * encode_time, "decode_ms": 1000 * (time.time() - started) / repeat
+        })
+
+        for encoding, level in variants:
+            started = time.time()
+            for _ in range(repeat):
+                encoded = compress_bytes(raw, encoding, level)
+            encode_time = (time.time() - started) / repeat
+            started = time.time()
+            for _ in range(repeat):
+                sio.loadmat(io.BytesIO(decompress_bytes(encoded, encoding)))
+            results.append({
+                "file": os.path.basename(path), "codec": encoding, "level": level,
+                "bytes": len(encoded), "ratio": len(raw) / len(encoded),
+                "encode_ms": 1000 * encode_time, "decode_ms": 1000 * (time.time() - started) / repeat
+            })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare capture compression codecs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    bench_parser = subparsers.add_parser("bench", help="Benchmark size vs decode time")
+    bench_parser.add_argument("files", nargs="+")
+    bench_parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'file':30} {'codec':9} {'level':>5} {'bytes':>10} {'ratio':>6} {'encode ms':>10} {'decode ms':>10}")
+    for row in benchmark(args.files, args.repeat):
+        level = '' if row['level'] is None else row['level']
+        print(f"{row['file'][:30]:30} {row['codec']:9} {level:>5} {row['bytes']:>10} "
+              f"{row['ratio']:>6.2f} {row['encode_ms']:>10.1f} {row['decode_ms']:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Parallel, incremental .mat -> .npz dataset conversion.
+
+    python convert_dataset.py <source_dir> <output_dir> [--workers N] [--prune]
+
+Outputs mirror the source layout (<class>/<name>.npz) with one normalised
+float32 array per signal, which is what utils.load_sample and the training
+notebook read. A manifest in the output directory records source size,
+mtime and SHA-256 so unchanged files are skipped on re-runs.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+
+from utils import REQUIRED_SIGNALS, convert_mat_to_npz
+
+MANIFEST_FILE = "manifest.json"
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(output_dir, manifest):
+    """Write the manifest atomically so an interrupted run never leaves it truncated"""
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+def find_sources(source_dir):
+    """Relative paths of all .mat files under source_dir"""
+    sources = []
+    for root, dirs, files in os.walk(source_dir):
+        for file in files:
+            if file.endswith('.mat'):
+                sources.append(os.path.relpath(os.path.join(root, file), source_dir))
+    return sorted(sources)
+
+def convert_one(source_dir, output_dir, rel_path, previous_hash):
+    """Worker: hash, parse and write one file. Returns (rel_path, manifest entry, converted)"""
+    source_path = os.path.join(source_dir, rel_path)
+    stat = os.stat(source_path)
+    entry = {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "sha256": file_sha256(source_path),
+        "output": os.path.splitext(rel_path)[0] + ".npz"
+    }
+    output_path = os.path.join(output_dir, entry["output"])
+    if entry["sha256"] == previous_hash and os.path.exists(output_path):
+        # Touched but not modified
+        return rel_path, entry, False
+
+    signals = convert_mat_to_npz(source_path).astype(np.float32)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    temp_path = output_path + ".tmp.npz"
+    np.savez(temp_path, **{name: signals[i] for i, name in enumerate(REQUIRED_SIGNALS)})
+    os.replace(temp_path, output_path)
+    return rel_path, entry, True
+
+def convert_dataset(source_dir, output_dir, workers=None, prune=False):
+    """Convert new or changed .mat files in parallel and report throughput"""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    sources = find_sources(source_dir)
+
+    pending = []
+    for rel_path in sources:
+        stat = os.stat(os.path.join(source_dir, rel_path))
+        entry = manifest.get(rel_path)
+        if (entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime
+                and os.path.exists(os.path.join(output_dir, entry["output"]))):
+            continue
+        pending.append(rel_path)
+
+    print(f"{len(sources)} source files, {len(sources) - len(pending)} unchanged, {len(pending)} to check")
+
+    started = time.time()
+    converted = 0
+    converted_bytes = 0
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(convert_one, source_dir, output_dir, rel_path,
+                            manifest.get(rel_path, {}).get("sha256")): rel_path
+            for rel_path in pending
+        }
+        for future in as_completed(futures):
+            rel_path = futures[future]
+            try:
+                rel_path, entry, was_converted = future.result()
+            except Exception as e:
+                print(f"Error converting {rel_path}: {str(e)}")
+                failed.append(rel_path)
+                continue
+            manifest[rel_path] = entry
+            if was_converted:
+                converted += 1
+                converted_bytes += entry["size"]
+
+    if prune:
+        for rel_path in set(manifest) - set(sources):
+            output_path = os.path.join(output_dir, manifest.pop(rel_path)["output"])
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            print(f"Pruned {rel_path}")
+
+    save_manifest(output_dir, manifest)
+
+    elapsed = max(time.time() - started, 1e-9)
+    report = {
+        "sources": len(sources),
+        "skipped": len(sources) - converted - len(failed),
+        "converted": converted,
+        "failed": len(failed),
+        "seconds": elapsed,
+        "files_per_second": converted / elapsed,
+        "mb_per_second": converted_bytes / (1024 * 1024) / elapsed
+    }
+    print("\n=== Conversion report ===")
+    for key, value in report.items():
+        print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert .mat captures to normalised float32 .npz files")
+    parser.add_argument("source_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--prune", action="store_true", help="Remove outputs whose source was deleted")
+    args = parser.parse_args()
+    convert_dataset(args.source_dir, args.output_dir, args.workers, args.prune)
+
+if __name__ == "__main__":
+    main()
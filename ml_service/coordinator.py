@@ -0,0 +1,299 @@
+"""Shard coordinator: spreads motors over several ML service instances.
+
+Instances register and stay alive with heartbeats; motors are placed on a
+consistent-hash ring so an instance joining or leaving only moves the motors
+that hashed to it. The Node server asks /route/<motor_id> which instance owns
+a motor; instances compute the same ring locally from the membership returned
+with each heartbeat, so they need no per-request round trip.
+
+Local test with several processes on one machine:
+
+    python coordinator.py --port 5700
+    COORDINATOR_URL=http://localhost:5700 INSTANCE_URL=http://localhost:5601 PORT=5601 python app.py
+    COORDINATOR_URL=http://localhost:5700 INSTANCE_URL=http://localhost:5602 PORT=5602 python app.py
+    curl localhost:5700/route/generator
+"""
+import argparse
+import bisect
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.request
+
+# Sharding configuration
+COORDINATOR_URL = os.environ.get("COORDINATOR_URL")  # Sharding is off unless set on the instance
+INSTANCE_URL = os.environ.get("INSTANCE_URL")  # Address the coordinator hands out for this instance
+INSTANCE_ID = os.environ.get("INSTANCE_ID") or INSTANCE_URL
+HEARTBEAT_INTERVAL = float(os.environ.get("HEARTBEAT_INTERVAL", "2"))  # Seconds between heartbeats
+HEARTBEAT_TIMEOUT = float(os.environ.get("HEARTBEAT_TIMEOUT", "10"))  # Instance dropped after this much silence
+VIRTUAL_NODES = 64  # Ring points per instance, smooths the motor distribution
+MAX_MOVES_KEPT = 200  # Recent motor moves reported by /rebalances
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+class HashRing:
+    """Consistent-hash ring of instance ids"""
+
+    def __init__(self, instance_ids=(), virtual_nodes=VIRTUAL_NODES):
+        self.virtual_nodes = virtual_nodes
+        points = sorted((_hash(f"{instance_id}#{i}"), instance_id)
+                        for instance_id in instance_ids for i in range(virtual_nodes))
+        self.hashes = [h for h, _ in points]
+        self.owners = [instance_id for _, instance_id in points]
+
+    def owner(self, key):
+        """Instance id owning a key, or None on an empty ring"""
+        if not self.hashes:
+            return None
+        index = bisect.bisect(self.hashes, _hash(key)) % len(self.hashes)
+        return self.owners[index]
+
+class Coordinator:
+    """Instance membership, motor placement and rebalancing"""
+
+    def __init__(self, heartbeat_timeout=HEARTBEAT_TIMEOUT):
+        self.heartbeat_timeout = heartbeat_timeout
+        self.lock = threading.Lock()
+        self.instances = {}  # id -> {"url", "last_heartbeat", "joined", "info"}
+        self.motors = set()
+        self.ring = HashRing()
+        self.epoch = 0  # Incremented on every membership change
+        self.assignments = {}  # motor -> instance id
+        self.moves = collections.deque(maxlen=MAX_MOVES_KEPT)
+
+    def _rebuild(self, reason):
+        """Rebuild the ring and record which motors changed owner (lock held)"""
+        self.epoch += 1
+        self.ring = HashRing(sorted(self.instances))
+        now = time.time()
+        for motor_id in sorted(self.motors):
+            owner = self.ring.owner(motor_id)
+            previous = self.assignments.get(motor_id)
+            if owner != previous:
+                self.moves.append({"epoch": self.epoch, "timestamp": now, "motor_id": motor_id,
+                                   "from": previous, "to": owner, "reason": reason})
+            self.assignments[motor_id] = owner
+        print(f"Ring epoch {self.epoch} ({reason}): {sorted(self.instances)}")
+
+    def _expire(self):
+        """Drop instances whose heartbeat is overdue (lock held)"""
+        cutoff = time.time() - self.heartbeat_timeout
+        expired = [instance_id for instance_id, instance in self.instances.items()
+                   if instance["last_heartbeat"] < cutoff]
+        for instance_id in expired:
+            del self.instances[instance_id]
+        if expired:
+            self._rebuild(f"expired {', '.join(expired)}")
+
+    def heartbeat(self, instance_id, url, info=None):
+        """Register or refresh an instance; returns the membership view it should use"""
+        with self.lock:
+            self._expire()
+            now = time.time()
+            instance = self.instances.get(instance_id)
+            if instance is None or instance["url"] != url:
+                self.instances[instance_id] = {"url": url, "joined": now, "last_heartbeat": now, "info": info or {}}
+                self._rebuild(f"joined {instance_id}")
+            else:
+                instance["last_heartbeat"] = now
+                instance["info"] = info or {}
+            return self._membership()
+
+    def leave(self, instance_id):
+        with self.lock:
+            if self.instances.pop(instance_id, None) is None:
+                return False
+            self._rebuild(f"left {instance_id}")
+            return True
+
+    def _membership(self):
+        return {
+            "epoch": self.epoch,
+            "instances": {instance_id: instance["url"] for instance_id, instance in self.instances.items()},
+            "virtual_nodes": self.ring.virtual_nodes
+        }
+
+    def membership(self):
+        with self.lock:
+            self._expire()
+            return self._membership()
+
+    def route(self, motor_id):
+        """Owner of a motor; unknown motors are added to the placement"""
+        with self.lock:
+            self._expire()
+            if motor_id not in self.motors:
+                self.motors.add(motor_id)
+                self.assignments[motor_id] = self.ring.owner(motor_id)
+            owner = self.assignments[motor_id]
+            return {
+                "motor_id": motor_id,
+                "instance_id": owner,
+                "url": self.instances[owner]["url"] if owner else None,
+                "epoch": self.epoch
+            }
+
+    def report(self):
+        with self.lock:
+            self._expire()
+            now = time.time()
+            per_instance = collections.Counter(self.assignments.values())
+            return {
+                "epoch": self.epoch,
+                "instances": {
+                    instance_id: {
+                        "url": instance["url"],
+                        "motors": per_instance.get(instance_id, 0),
+                        "seconds_since_heartbeat": now - instance["last_heartbeat"],
+                        "info": instance["info"]
+                    } for instance_id, instance in self.instances.items()
+                },
+                "motors": len(self.motors),
+                "unassigned": per_instance.get(None, 0)
+            }
+
+class ShardMember:
+    """Instance side: heartbeats to the coordinator and answers 'do I own this motor?' locally"""
+
+    def __init__(self, coordinator_url=COORDINATOR_URL, instance_id=INSTANCE_ID, url=INSTANCE_URL,
+                 interval=HEARTBEAT_INTERVAL, info_callback=None):
+        self.coordinator_url = coordinator_url.rstrip("/") if coordinator_url else None
+        self.instance_id = instance_id
+        self.url = url
+        self.interval = interval
+        self.info_callback = info_callback
+        self.lock = threading.Lock()
+        self.ring = None  # None until the first successful heartbeat
+        self.instances = {}
+        self.epoch = None
+        self.last_error = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @property
+    def enabled(self):
+        return bool(self.coordinator_url and self.url)
+
+    def _post(self, path, body):
+        request = urllib.request.Request(self.coordinator_url + path, data=json.dumps(body).encode(),
+                                         headers={"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(request, timeout=self.interval) as response:
+            return json.loads(response.read())
+
+    def heartbeat(self):
+        info = self.info_callback() if self.info_callback else {}
+        membership = self._post("/instances/heartbeat", {"instance_id": self.instance_id, "url": self.url, "info": info})
+        with self.lock:
+            # Compare the ring inputs, not the epoch: a restarted coordinator counts epochs from zero again
+            changed = (self.ring is None or membership["instances"] != self.instances
+                       or membership["virtual_nodes"] != self.ring.virtual_nodes)
+            self.epoch = membership["epoch"]
+            if changed:
+                self.ring = HashRing(sorted(membership["instances"]), membership["virtual_nodes"])
+                self.instances = membership["instances"]
+                print(f"Shard membership epoch {self.epoch}: {sorted(self.instances)}")
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.heartbeat()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Warning: Heartbeat to {self.coordinator_url} failed: {str(e)}")
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        if not self.enabled or self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._run, name="shard-heartbeat", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop heartbeating and leave the ring so motors move immediately (no-op unless started)"""
+        if self.thread is None or self.stop_event.is_set():
+            return
+        self.stop_event.set()
+        if self.enabled:
+            try:
+                self._post("/instances/leave", {"instance_id": self.instance_id})
+            except Exception as e:
+                print(f"Warning: Failed to leave the ring: {str(e)}")
+
+    def owner(self, motor_id):
+        """(instance_id, url) owning a motor; this instance when sharding is off or not yet joined"""
+        with self.lock:
+            if not self.enabled or self.ring is None:
+                return self.instance_id, self.url
+            owner = self.ring.owner(motor_id)
+            return owner, self.instances.get(owner)
+
+    def owns(self, motor_id):
+        return self.owner(motor_id)[0] == self.instance_id
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "enabled": self.enabled,
+                "instance_id": self.instance_id,
+                "url": self.url,
+                "coordinator": self.coordinator_url,
+                "epoch": self.epoch,
+                "instances": dict(self.instances),
+                "last_error": self.last_error
+            }
+
+def create_app(coordinator=None):
+    from flask import Flask, request, jsonify
+    from flask_cors import CORS
+
+    coordinator = coordinator or Coordinator()
+    app = Flask(__name__)
+    CORS(app)
+
+    @app.route("/instances/heartbeat", methods=["POST"])
+    def heartbeat():
+        body = request.get_json(silent=True) or {}
+        if not body.get("instance_id") or not body.get("url"):
+            return jsonify({"error": "instance_id and url are required"}), 400
+        return jsonify(coordinator.heartbeat(body["instance_id"], body["url"], body.get("info")))
+
+    @app.route("/instances/leave", methods=["POST"])
+    def leave():
+        body = request.get_json(silent=True) or {}
+        if not coordinator.leave(body.get("instance_id")):
+            return jsonify({"error": "Unknown instance"}), 404
+        return jsonify({"status": "left", "instance_id": body["instance_id"]})
+
+    @app.route("/instances", methods=["GET"])
+    def instances():
+        return jsonify(coordinator.report())
+
+    @app.route("/route/<motor_id>", methods=["GET"])
+    def route(motor_id):
+        placement = coordinator.route(motor_id)
+        if placement["url"] is None:
+            return jsonify(dict(placement, error="No ML service instance available")), 503
+        return jsonify(placement)
+
+    @app.route("/rebalances", methods=["GET"])
+    def rebalances():
+        with coordinator.lock:
+            return jsonify({"epoch": coordinator.epoch, "moves": list(coordinator.moves)})
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Consistent-hash coordinator for ML service instances")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5700)
+    parser.add_argument("--heartbeat-timeout", type=float, default=HEARTBEAT_TIMEOUT)
+    args = parser.parse_args()
+    create_app(Coordinator(args.heartbeat_timeout)).run(host=args.host, port=args.port, threaded=True)
+
+if __name__ == "__main__":
+    main()
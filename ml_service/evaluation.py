@@ -0,0 +1,134 @@
+import threading
+import numpy as np
+
+from utils import CLASS_NAMES
+
+ROC_BINS = 20  # Score histogram bins per class for the binned ROC curve
+
+class StreamingMetrics:
+    """Confusion matrix and per-class score histograms for one model version.
+
+    Adding or retracting a labelled prediction is O(classes); a summary is
+    O(classes^2 + classes * bins), independent of how much feedback was seen.
+    """
+
+    def __init__(self, class_names=CLASS_NAMES, bins=ROC_BINS):
+        self.class_names = list(class_names)
+        self.bins = bins
+        n = len(class_names)
+        self.confusion = np.zeros((n, n), dtype=np.int64)  # rows: true label, columns: prediction
+        self.positive_hist = np.zeros((n, bins), dtype=np.int64)  # score of class c when c is the true label
+        self.negative_hist = np.zeros((n, bins), dtype=np.int64)  # score of class c when it is not
+
+    def update(self, true_index, predicted_index, probs, weight=1):
+        """Add (weight=1) or retract (weight=-1) one labelled prediction"""
+        probs = np.asarray(probs, dtype=np.float64)
+        self.confusion[true_index, predicted_index] += weight
+        score_bins = np.minimum((probs * self.bins).astype(int), self.bins - 1)
+        classes = np.arange(len(self.class_names))
+        is_true = classes == true_index
+        self.positive_hist[classes[is_true], score_bins[is_true]] += weight
+        self.negative_hist[classes[~is_true], score_bins[~is_true]] += weight
+
+    @staticmethod
+    def _roc(positive, negative):
+        """ROC points from score histograms, sweeping the threshold from high to low"""
+        total_pos, total_neg = positive.sum(), negative.sum()
+        if total_pos == 0 or total_neg == 0:
+            return []
+        tpr = np.concatenate([[0], np.cumsum(positive[::-1]) / total_pos])
+        fpr = np.concatenate([[0], np.cumsum(negative[::-1]) / total_neg])
+        return [{"x": float(x), "y": float(y)} for x, y in zip(fpr, tpr)]
+
+    def summary(self):
+        """Metrics in the shape of the prediction 'metrics' block, plus extras"""
+        samples = int(self.confusion.sum())
+        true_totals = self.confusion.sum(axis=1)
+        predicted_totals = self.confusion.sum(axis=0)
+        diagonal = np.diag(self.confusion)
+        precision = np.divide(diagonal, predicted_totals, out=np.zeros(len(diagonal)), where=predicted_totals > 0)
+        recall = np.divide(diagonal, true_totals, out=np.zeros(len(diagonal)), where=true_totals > 0)
+        f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros(len(diagonal)),
+                       where=(precision + recall) > 0)
+        normalized = np.divide(self.confusion, true_totals[:, None], out=np.zeros(self.confusion.shape),
+                               where=true_totals[:, None] > 0)
+        return {
+            "source": "feedback",
+            "samples": samples,
+            "accuracy": float(diagonal.sum() / samples) if samples else 0.0,
+            "f1Score": float(f1.mean()),
+            "confusionMatrix": normalized.tolist(),
+            "confusionCounts": self.confusion.tolist(),
+            # Micro-averaged one-vs-rest ROC over all classes
+            "rocCurve": self._roc(self.positive_hist.sum(axis=0), self.negative_hist.sum(axis=0)),
+            "rocCurveByClass": {name: self._roc(self.positive_hist[c], self.negative_hist[c])
+                                for c, name in enumerate(self.class_names)},
+            "classMetrics": [
+                {"class": name, "precision": float(precision[c]), "recall": float(recall[c]),
+                 "f1": float(f1[c]), "support": int(true_totals[c])}
+                for c, name in enumerate(self.class_names)
+            ]
+        }
+
+class Evaluator:
+    """Streaming evaluation per model version, fed by operator-confirmed labels"""
+
+    def __init__(self, class_names=CLASS_NAMES):
+        self.class_names = list(class_names)
+        self.lock = threading.Lock()
+        self.by_version = {}
+        self.summaries = {}  # Cached summary per version, invalidated on update
+        self.store = None
+
+    def attach(self, store):
+        """Use a HistoryStore for feedback persistence and rebuild counters from it once"""
+        self.store = store
+        with self.lock:
+            self.by_version.clear()
+            self.summaries.clear()
+            for row in store.labelled_predictions():
+                self._apply(row["model_version"], row["label"], row["state"], row["class_probabilities"], 1)
+
+    def _apply(self, model_version, label, state, class_probs, weight):
+        metrics = self.by_version.setdefault(model_version, StreamingMetrics(self.class_names))
+        probs = [class_probs.get(name, 0.0) for name in self.class_names]
+        metrics.update(self.class_names.index(label), self.class_names.index(state), probs, weight)
+        self.summaries.pop(model_version, None)
+
+    def add_feedback(self, prediction_id, label):
+        """Record the confirmed label for a stored prediction (re-labelling replaces the old label)"""
+        if label not in self.class_names:
+            raise ValueError(f"Unknown label {label}, expected one of {self.class_names}")
+        if self.store is None:
+            raise RuntimeError("No history store attached")
+        prediction = self.store.get_prediction(prediction_id)
+        if prediction is None:
+            raise KeyError(f"Unknown prediction id {prediction_id}")
+        with self.lock:
+            previous = self.store.save_feedback(prediction_id, label)
+            if previous is not None:
+                self._apply(prediction["model_version"], previous, prediction["state"],
+                            prediction["class_probabilities"], -1)
+            self._apply(prediction["model_version"], label, prediction["state"],
+                        prediction["class_probabilities"], 1)
+        return prediction
+
+    def metrics(self, model_version):
+        """Current metrics for a model version, in constant time"""
+        with self.lock:
+            summary = self.summaries.get(model_version)
+            if summary is None:
+                metrics = self.by_version.get(model_version)
+                summary = (metrics or StreamingMetrics(self.class_names)).summary()
+                summary["modelVersion"] = model_version
+                if metrics is not None:
+                    # Only versions with feedback are cached, so arbitrary names cannot grow the cache
+                    self.summaries[model_version] = summary
+            return summary
+
+    def versions(self):
+        with self.lock:
+            return list(self.by_version)
+
+# Shared evaluator; app.py attaches the history store at startup
+evaluator = Evaluator()
@@ -0,0 +1,31 @@
+import numpy as np
+
+SIGNAL_NAMES = ['i1', 'i2', 'i3', 'v1', 'v2', 'v3', 'vn', 'w_m', 'vibrad']
+SAMPLE_RATE = 50001  # Samples per second (one capture = 1 s)
+FEATURE_CHANNELS = ['i1', 'i2', 'i3', 'vibrad']  # Channels whose spectra carry the fault signatures
+
+# Frequency bands (centre Hz, half-width Hz) matching CHARACTERISTIC_FREQS in predictClass
+FEATURE_BANDS = {
+    'band_25hz': (25, 5),
+    'band_50hz': (50, 2),
+    'band_100hz': (100, 5),
+}
+
+def band_energies(signal, sample_rate=SAMPLE_RATE, bands=FEATURE_BANDS):
+    """Fraction of the (non-DC) spectral energy falling in each band"""
+    spectrum = np.abs(np.fft.rfft(signal)) ** 2
+    freqs = np.fft.rfftfreq(len(signal), 1 / sample_rate)
+    total = spectrum[1:].sum() + 1e-12
+    return {
+        name: float(spectrum[(freqs >= centre - width) & (freqs <= centre + width)].sum() / total)
+        for name, (centre, width) in bands.items()
+    }
+
+def spectral_features(signals, sample_rate=SAMPLE_RATE):
+    """Compact per-capture features: band energies of the phase currents and the vibration channel"""
+    signals = np.asarray(signals)
+    features = {}
+    for name in FEATURE_CHANNELS:
+        for band, energy in band_energies(signals[SIGNAL_NAMES.index(name)], sample_rate).items():
+            features[f'{name}_{band}'] = energy
+    return features
@@ -0,0 +1,427 @@
+"""Vectorised simulation of a motor fleet feeding the service's ingestion paths.
+
+All motor state and parameters are NumPy arrays indexed by motor: supply
+frequency drifting around 50 Hz, load relaxing towards targets that change
+at random times, slow sensor gain drift, and a fault (from the
+create_random_signal_pattern odds) whose severity ramps up after its onset.
+Each tick advances every motor by one capture (1 s at SAMPLE_RATE, the
+window the model expects). Motors emit a capture every --interval seconds,
+staggered across the fleet, and the captures due in a tick are synthesised
+together in batches with the SignalGenerator fault signatures. Electrical
+and rotor phases carry over between ticks, so a motor's captures are
+windows of one continuous signal (every window when --interval is 1).
+
+    python fleet_simulator.py bench --motors 1000 --interval 5
+    python fleet_simulator.py run --motors 1000 --interval 5 --sink rpc --sink ring:0 --duration 600
+
+Sinks: ring:<motor> (shared-memory ring), mat[:<motor>] (.mat captures),
+rpc (Unix socket) and http (/predict uploads). Network sinks send from a
+small worker pool and drop captures instead of slowing the clock down.
+"""
+import argparse
+import io
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import scipy.io as sio
+
+from features import SIGNAL_NAMES, SAMPLE_RATE
+from machine import SignalGenerator, dspace_mat_dict
+from multipart import encode_multipart
+from rpc import RPC_SOCKET_PATH, RPCClient
+from utils import CLASS_NAMES
+
+# Simulation configuration
+CAPTURE_SECONDS = 1.0  # One tick = one capture window
+NOMINAL_FREQ = 50.0
+FREQ_REVERSION = 0.05  # Pull of the supply frequency back to nominal, per second
+FREQ_VOLATILITY = 0.02  # Hz / sqrt(s)
+GAIN_VOLATILITY = 2e-4  # Sensor gain random walk, per sqrt(s)
+LOAD_TIME_CONSTANT = 5.0  # Seconds for the load to settle on a new target
+NOMINAL_SPEED = 1500.0  # rpm at 50 Hz, no load
+FAULT_PROBABILITIES = {'cassure': 0.2, 'desiquilibre': 0.3}  # As in create_random_signal_pattern
+FAULT_HORIZON = 3600.0  # Faults start uniformly within this many seconds
+NOISE_LEVELS = np.array([0.05, 0.05, 0.05, 0.1, 0.1, 0.1, 0.1, 0.05, 0.05], dtype=np.float32)  # SignalGenerator defaults
+NOISE_BANK_SIZE = 1 << 21  # Gaussian samples reused through random windows instead of fresh randn
+BATCH_SIZE = 16  # Captures synthesised together (bounds the working set to ~30 MB)
+SINK_WORKERS = 4
+
+FAULT_CODES = ['sain'] + [name for name in CLASS_NAMES if name != 'sain']
+
+class Fleet:
+    """Per-motor parameters and state as arrays; step() advances all motors at once"""
+
+    def __init__(self, motors, interval=5.0, sample_rate=SAMPLE_RATE, seed=0):
+        rng = self.rng = np.random.default_rng(seed)
+        n = self.size = motors
+        self.sample_rate = sample_rate
+        self.samples = int(sample_rate * CAPTURE_SECONDS)
+        self.t = (np.arange(self.samples) / sample_rate).astype(np.float32)
+        self.motor_ids = [f"sim_{i:04d}" for i in range(n)]
+        self.now = 0.0
+        self.started_at = time.time()
+
+        # Fixed parameters
+        self.rated_current = rng.uniform(0.8, 1.2, n).astype(np.float32)
+        self.supply_voltage = (220.0 * rng.uniform(0.98, 1.02, n)).astype(np.float32)
+        self.rated_slip = rng.uniform(0.02, 0.05, n)
+        self.harmonics = rng.uniform(0, 0.1, (n, 2)).astype(np.float32)  # 3rd and 5th
+        # Per-phase offset of the current from the ideal 0, -120, -240 degrees
+        angles = -2 * np.pi * np.arange(3) / 3 + rng.uniform(-0.05, 0.05, (n, 3))
+        self.phase_cos = np.cos(angles).astype(np.float32)
+        self.phase_sin = np.sin(angles).astype(np.float32)
+        self.noise_scale = (rng.uniform(0.05, 0.3, n) / 0.05).astype(np.float32)
+        self.load_change_rate = rng.uniform(1 / 600, 1 / 60, n)
+        self.interval = np.full(n, float(interval))
+
+        # Faults: code per FAULT_CODES, onset (inf = never) and ramp to full severity
+        draw = rng.uniform(0, 1, n)
+        self.fault = np.zeros(n, dtype=np.int8)
+        threshold = 0.0
+        for name, probability in FAULT_PROBABILITIES.items():
+            self.fault[(draw >= threshold) & (draw < threshold + probability)] = FAULT_CODES.index(name)
+            threshold += probability
+        self.fault_onset = np.where(self.fault > 0, rng.uniform(0, FAULT_HORIZON, n), np.inf)
+        self.fault_ramp = rng.uniform(60, 600, n)
+
+        # State
+        self.freq = NOMINAL_FREQ + rng.normal(0, 0.05, n)
+        self.load = rng.uniform(0.2, 1.0, n)
+        self.load_target = self.load.copy()
+        self.gain = np.ones(n)
+        self.electrical_phase = rng.uniform(0, 2 * np.pi, n)
+        self.rotor_phase = rng.uniform(0, 2 * np.pi, n)
+        self.next_emit = rng.uniform(0, interval, n)  # Stagger so the fleet does not emit in lockstep
+
+        self.noise_bank = rng.standard_normal(NOISE_BANK_SIZE, dtype=np.float32)
+
+    def severity(self):
+        return np.clip((self.now - self.fault_onset) / self.fault_ramp, 0.0, 1.0)
+
+    def states(self, indices):
+        """Ground-truth class of motors (the fault counts once its severity passes 0.5)"""
+        faulty = self.severity()[indices] >= 0.5
+        return [FAULT_CODES[code] if is_faulty else 'sain'
+                for code, is_faulty in zip(self.fault[indices], faulty)]
+
+    def speed(self):
+        """Rotor speed in rpm: synchronous speed less the load-dependent slip"""
+        return NOMINAL_SPEED * (self.freq / NOMINAL_FREQ) * (1 - self.rated_slip * self.load)
+
+    def step(self, dt=CAPTURE_SECONDS):
+        """Advance every motor by dt seconds; returns the indices due to emit a capture"""
+        rng, n = self.rng, self.size
+        # Phases advance at the frequencies of the tick that just ran, keeping signals continuous
+        self.electrical_phase = (self.electrical_phase + 2 * np.pi * self.freq * dt) % (2 * np.pi)
+        self.rotor_phase = (self.rotor_phase + 2 * np.pi * self.speed() / 60 * dt) % (2 * np.pi)
+        self.now += dt
+
+        self.freq += FREQ_REVERSION * (NOMINAL_FREQ - self.freq) * dt + FREQ_VOLATILITY * np.sqrt(dt) * rng.standard_normal(n)
+        self.gain += GAIN_VOLATILITY * np.sqrt(dt) * rng.standard_normal(n)
+        changes = rng.uniform(0, 1, n) < self.load_change_rate * dt
+        self.load_target[changes] = rng.uniform(0.2, 1.0, int(changes.sum()))
+        self.load += (self.load_target - self.load) * (1 - np.exp(-dt / LOAD_TIME_CONSTANT))
+
+        due = np.flatnonzero(self.next_emit <= self.now)
+        self.next_emit[due] += self.interval[due]
+        return due
+
+    def synthesise(self, indices):
+        """(B, 9, T) float32 captures of the given motors over the current tick"""
+        b, t = len(indices), self.t
+        severity = self.severity()[indices].astype(np.float32)
+        cassure = np.where(self.fault[indices] == FAULT_CODES.index('cassure'), severity, 0)[:, None]
+        desiquilibre = np.where(self.fault[indices] == FAULT_CODES.index('desiquilibre'), severity, 0)[:, None]
+        freq = self.freq[indices].astype(np.float32)[:, None]
+        speed = self.speed()[indices].astype(np.float32)[:, None]
+
+        theta = self.electrical_phase[indices].astype(np.float32)[:, None] + 2 * np.pi * freq * t
+        s, c = np.sin(theta), np.cos(theta)
+        has_cassure, has_desiquilibre = cassure.any(), desiquilibre.any()
+        if has_cassure:
+            s2 = 2 * s * c
+            s3 = s * (3 - 4 * s * s)
+        if has_desiquilibre:
+            psi = self.rotor_phase[indices].astype(np.float32)[:, None] + 2 * np.pi * (speed / 60) * t
+            s_psi, c_psi = np.sin(psi), np.cos(psi)
+            s2_psi = 2 * s_psi * c_psi
+            s3_psi = s_psi * (3 - 4 * s_psi * s_psi)
+
+        out = np.empty((b, len(SIGNAL_NAMES), len(t)), dtype=np.float32)
+        amplitude = (self.rated_current[indices] * (0.3 + 0.7 * self.load[indices]) * self.gain[indices])
+        amplitude = amplitude.astype(np.float32)[:, None]
+        h3, h5 = self.harmonics[indices, 0:1], self.harmonics[indices, 1:2]
+        for k in range(3):
+            phase = self.phase_cos[indices, k:k + 1] * s + self.phase_sin[indices, k:k + 1] * c
+            phase_sq = phase * phase
+            phase_3 = phase * (3 - 4 * phase_sq)  # sin(3x) from sin(x)
+            current = phase + h3 * phase_3 + h5 * phase * (5 - 20 * phase_sq + 16 * phase_sq * phase_sq)
+            if has_cassure:
+                # Broken bar: sidebands at f +/- 2f, as in SignalGenerator
+                current += 0.4 * cassure * (phase_3 - phase)
+            if has_desiquilibre:
+                # Unbalance: amplitude modulation and harmonics at the rotor frequency
+                current *= 1 + 0.6 * desiquilibre * s_psi
+                current += desiquilibre * (0.2 * s2_psi + 0.1 * s3_psi)
+            out[:, k] = amplitude * current
+
+        voltage = self.supply_voltage[indices][:, None]
+        for k in range(3):
+            angle = -2 * np.pi * k / 3
+            out[:, 3 + k] = voltage * (np.cos(angle) * s + np.sin(angle) * c)
+        out[:, 6] = 0.1 * s
+        out[:, 7] = speed
+        out[:, 8] = s
+        if has_cassure:
+            out[:, 7] += 20 * cassure * s2
+            out[:, 8] += cassure * (0.7 * s2 + 0.3 * s3)
+        if has_desiquilibre:
+            out[:, 7] += desiquilibre * (150 * s_psi + 50 * s2_psi)
+            out[:, 8] += desiquilibre * (1.2 * s_psi + 0.4 * s2_psi + 0.2 * s3_psi)
+
+        # Noise: random windows of a shared Gaussian bank, scaled per motor and channel
+        offsets = self.rng.integers(0, NOISE_BANK_SIZE - len(t), (b, len(SIGNAL_NAMES)))
+        scale = self.noise_scale[indices][:, None] * NOISE_LEVELS[None, :]
+        for i in range(b):
+            for ch in range(len(SIGNAL_NAMES)):
+                out[i, ch] += scale[i, ch] * self.noise_bank[offsets[i, ch]:offsets[i, ch] + len(t)]
+        return out
+
+    def captures(self, indices, batch_size=BATCH_SIZE):
+        """Yield (indices, signals) batches of the motors due this tick"""
+        # Group by fault so most batches skip the signature terms of the other faults
+        indices = indices[np.argsort(self.fault[indices], kind='stable')]
+        for start in range(0, len(indices), batch_size):
+            batch = indices[start:start + batch_size]
+            yield batch, self.synthesise(batch)
+
+    def timestamp(self):
+        """Wall-clock time of the current tick"""
+        return self.started_at + self.now
+
+class RingSink:
+    """Publishes one motor's captures to the shared-memory ring the monitoring endpoint reads"""
+
+    def __init__(self, motor):
+        from shm_ring import ShmRingWriter
+        self.motor = motor
+        self.writer = ShmRingWriter()
+        self.sent = 0
+
+    def send(self, fleet, indices, signals):
+        for index, capture, state in zip(indices, signals, fleet.states(indices)):
+            if index == self.motor:
+                self.writer.write(capture, fleet.timestamp(), state)
+                self.sent += 1
+
+    def close(self):
+        self.writer.close()
+
+    def stats(self):
+        return {"sent": self.sent}
+
+class MatSink:
+    """Writes .mat captures: one motor into output_dir (as the generator does), or every motor into sub-directories"""
+
+    def __init__(self, output_dir="generated_signals", motor=None):
+        self.output_dir = output_dir
+        self.motor = motor
+        self.generators = {}
+        self.sent = 0
+
+    def _generator(self, fleet, index):
+        generator = self.generators.get(index)
+        if generator is None:
+            generator = self.generators[index] = SignalGenerator(shm=False, archive=True)
+            generator.output_dir = self.output_dir if self.motor is not None else os.path.join(self.output_dir, fleet.motor_ids[index])
+            os.makedirs(generator.output_dir, exist_ok=True)
+        return generator
+
+    def send(self, fleet, indices, signals):
+        capture_time = datetime.fromtimestamp(fleet.timestamp())
+        for index, capture, state in zip(indices, signals, fleet.states(indices)):
+            if self.motor is None or index == self.motor:
+                self._generator(fleet, index).save_signals(dict(zip(SIGNAL_NAMES, capture)), state, capture_time)
+                self.sent += 1
+
+    def close(self):
+        pass
+
+    def stats(self):
+        return {"sent": self.sent}
+
+class _PooledSink:
+    """Sends from a worker pool; captures are dropped while every worker is busy"""
+
+    def __init__(self, workers=SINK_WORKERS):
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.counts = {"sent": 0, "failed": 0, "dropped": 0}
+
+    def _submit(self, fn, *args):
+        with self.lock:
+            if self.in_flight >= self.workers:
+                self.counts["dropped"] += 1
+                return
+            self.in_flight += 1
+        self.pool.submit(self._run, fn, *args)
+
+    def _run(self, fn, *args):
+        try:
+            fn(*args)
+            outcome = "sent"
+        except Exception:
+            outcome = "failed"
+        with self.lock:
+            self.in_flight -= 1
+            self.counts[outcome] += 1
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts)
+
+class RpcSink(_PooledSink):
+    """OP_PREDICT over the Unix socket, one connection per worker"""
+
+    def __init__(self, socket_path=None, workers=SINK_WORKERS):
+        super().__init__(workers)
+        self.socket_path = socket_path or RPC_SOCKET_PATH
+        self.local = threading.local()
+
+    def _client(self):
+        if getattr(self.local, "client", None) is None:
+            self.local.client = RPCClient(self.socket_path)
+        return self.local.client
+
+    def _predict(self, motor_id, capture):
+        try:
+            self._client().predict(capture, motor_id=motor_id)
+        except OSError:
+            self.local.client = None  # Reconnect on the next capture
+            raise
+
+    def send(self, fleet, indices, signals):
+        for index, capture in zip(indices, signals):
+            self._submit(self._predict, fleet.motor_ids[index], capture)
+
+class HttpSink(_PooledSink):
+    """Multipart .mat uploads to POST /predict"""
+
+    def __init__(self, url="http://localhost:5600", workers=SINK_WORKERS):
+        super().__init__(workers)
+        self.url = url.rstrip("/")
+
+    def _upload(self, motor_id, capture, t):
+        buffer = io.BytesIO()
+        sio.savemat(buffer, dspace_mat_dict(dict(zip(SIGNAL_NAMES, capture)), t))
+        body, content_type = encode_multipart(buffer.getvalue(), "simulated.mat", {"motor_id": motor_id})
+        request = urllib.request.Request(self.url + "/predict", data=body,
+                                         headers={"Content-Type": content_type}, method="POST")
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+
+    def send(self, fleet, indices, signals):
+        for index, capture in zip(indices, signals):
+            self._submit(self._upload, fleet.motor_ids[index], capture, fleet.t)
+
+def make_sink(spec, url, socket_path):
+    """ring:<motor>, mat[:<motor>], rpc or http"""
+    kind, _, motor = spec.partition(":")
+    motor = int(motor) if motor else None
+    if kind == "ring":
+        return RingSink(motor or 0)
+    if kind == "mat":
+        return MatSink(motor=motor)
+    if kind == "rpc":
+        return RpcSink(socket_path)
+    if kind == "http":
+        return HttpSink(url)
+    raise ValueError(f"Unknown sink: {spec}")
+
+def run(fleet, sinks, duration, realtime=True):
+    """Advance the fleet for `duration` simulated seconds, delivering captures to the sinks"""
+    started = time.time()
+    ticks = int(duration / CAPTURE_SECONDS)
+    captures = 0
+    behind = 0
+    for tick in range(ticks):
+        due = fleet.step()
+        for indices, signals in fleet.captures(due):
+            for sink in sinks:
+                sink.send(fleet, indices, signals)
+            captures += len(indices)
+        if realtime:
+            delay = started + (tick + 1) * CAPTURE_SECONDS - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                behind += 1
+    elapsed = time.time() - started
+    return {
+        "motors": fleet.size,
+        "simulated_s": ticks * CAPTURE_SECONDS,
+        "wall_s": elapsed,
+        "realtime_factor": ticks * CAPTURE_SECONDS / elapsed if elapsed else None,
+        "captures": captures,
+        "ticks_behind": behind,
+        "sinks": {type(sink).__name__: sink.stats() for sink in sinks}
+    }
+
+def benchmark(motors=1000, interval=5.0, ticks=20, seed=0):
+    """Real-time factor of state updates plus capture synthesis, with no sink"""
+    fleet = Fleet(motors, interval, seed=seed)
+    started = time.perf_counter()
+    for _ in range(ticks):
+        fleet.step()
+    step_s = (time.perf_counter() - started) / ticks
+
+    report = run(fleet, [], ticks * CAPTURE_SECONDS, realtime=False)
+    report["step_ms"] = 1000 * step_s
+    report["captures_per_s"] = report["captures"] / report["wall_s"]
+    report["samples_per_s"] = report["captures_per_s"] * len(SIGNAL_NAMES) * fleet.samples
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorised multi-motor simulator")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("run", "Simulate in real time and feed the service"),
+                            ("bench", "Measure the real-time factor without sinks")):
+        command = subparsers.add_parser(name, help=help_text)
+        command.add_argument("--motors", type=int, default=1000)
+        command.add_argument("--interval", type=float, default=5.0, help="Seconds between captures of a motor")
+        command.add_argument("--seed", type=int, default=0)
+    run_parser = subparsers.choices["run"]
+    run_parser.add_argument("--duration", type=float, default=60.0, help="Simulated seconds")
+    run_parser.add_argument("--sink", action="append", default=[], help="ring:<motor>, mat[:<motor>], rpc or http")
+    run_parser.add_argument("--url", default="http://localhost:5600")
+    run_parser.add_argument("--socket")
+    run_parser.add_argument("--as-fast-as-possible", action="store_true", help="Do not pace ticks to the wall clock")
+    subparsers.choices["bench"].add_argument("--ticks", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        report = benchmark(args.motors, args.interval, args.ticks, args.seed)
+    else:
+        fleet = Fleet(args.motors, args.interval, seed=args.seed)
+        sinks = [make_sink(spec, args.url, args.socket) for spec in args.sink]
+        try:
+            report = run(fleet, sinks, args.duration, realtime=not args.as_fast_as_possible)
+        finally:
+            for sink in sinks:
+                sink.close()
+    print("\n=== Fleet simulation ===")
+    for key, value in report.items():
+        print(f"{key}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import json
+import sqlite3
+from array import array
+import threading
+import time
+
+HISTORY_DB_PATH = "history.db"
+
+# Rollup resolutions in seconds
+ROLLUP_RESOLUTIONS = {
+    'minute': 60,
+    'hour': 3600,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    motor_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    state TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    model_version TEXT,
+    class_probabilities TEXT,
+    spectral_features TEXT,
+    embedding BLOB
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_motor_ts ON predictions (motor_id, ts);
+CREATE INDEX IF NOT EXISTS idx_predictions_ts ON predictions (ts);
+CREATE INDEX IF NOT EXISTS idx_predictions_model_version ON predictions (model_version);
+CREATE TABLE IF NOT EXISTS rollups (
+    resolution TEXT NOT NULL,
+    motor_id TEXT NOT NULL,
+    bucket REAL NOT NULL,
+    state TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    confidence_sum REAL NOT NULL,
+    PRIMARY KEY (resolution, motor_id, bucket, state)
+);
+CREATE TABLE IF NOT EXISTS feedback (
+    prediction_id INTEGER PRIMARY KEY REFERENCES predictions (id),
+    label TEXT NOT NULL,
+    ts REAL NOT NULL
+);
+"""
+
+class HistoryStore:
+    """Embedded SQLite store of per-motor predictions with pre-aggregated rollups"""
+
+    def __init__(self, db_path=HISTORY_DB_PATH):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(predictions)")}
+        if "embedding" not in columns:
+            # Databases created before embeddings were stored
+            self.conn.execute("ALTER TABLE predictions ADD COLUMN embedding BLOB")
+        self.conn.commit()
+
+    def record(self, motor_id, result, timestamp=None):
+        """Store one prediction result and update the rollups in the same transaction"""
+        if result.get("status") != "success":
+            return None
+        ts = timestamp if timestamp is not None else time.time()
+        state = result["prediction"]
+        confidence = float(result["confidence"])
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO predictions (motor_id, ts, state, confidence, model_version, "
+                "class_probabilities, spectral_features, embedding) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (motor_id, ts, state, confidence, result.get("model_version"),
+                 json.dumps(result.get("class_probabilities", {})),
+                 json.dumps(result.get("spectral_features", {})),
+                 array('f', result["embedding"]).tobytes() if result.get("embedding") else None)
+            )
+            for resolution, seconds in ROLLUP_RESOLUTIONS.items():
+                bucket = ts - (ts % seconds)
+                self.conn.execute(
+                    "INSERT INTO rollups (resolution, motor_id, bucket, state, count, confidence_sum) "
+                    "VALUES (?, ?, ?, ?, 1, ?) "
+                    "ON CONFLICT (resolution, motor_id, bucket, state) "
+                    "DO UPDATE SET count = count + 1, confidence_sum = confidence_sum + excluded.confidence_sum",
+                    (resolution, motor_id, bucket, state, confidence)
+                )
+        return cursor.lastrowid
+
+    def predictions(self, motor_id, start=None, end=None, limit=1000):
+        """Raw predictions for a motor in [start, end), newest first"""
+        start = start if start is not None else 0
+        end = end if end is not None else time.time() + 1
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT ts, state, confidence, model_version, class_probabilities, spectral_features "
+                "FROM predictions WHERE motor_id = ? AND ts >= ? AND ts < ? ORDER BY ts DESC LIMIT ?",
+                (motor_id, start, end, limit)
+            ).fetchall()
+        return [{
+            "timestamp": row["ts"],
+            "state": row["state"],
+            "confidence": row["confidence"],
+            "model_version": row["model_version"],
+            "class_probabilities": json.loads(row["class_probabilities"] or "{}"),
+            "spectral_features": json.loads(row["spectral_features"] or "{}")
+        } for row in rows]
+
+    def rollups(self, motor_id, resolution='hour', start=None, end=None):
+        """Per-bucket state counts and mean confidence for a motor in [start, end)"""
+        if resolution not in ROLLUP_RESOLUTIONS:
+            raise ValueError(f"Unknown resolution {resolution}, expected one of {list(ROLLUP_RESOLUTIONS)}")
+        start = start if start is not None else 0
+        end = end if end is not None else time.time() + 1
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT bucket, state, count, confidence_sum FROM rollups "
+                "WHERE resolution = ? AND motor_id = ? AND bucket >= ? AND bucket < ? ORDER BY bucket",
+                (resolution, motor_id, start - (start % ROLLUP_RESOLUTIONS[resolution]), end)
+            ).fetchall()
+
+        buckets = {}
+        for row in rows:
+            bucket = buckets.setdefault(row["bucket"], {
+                "timestamp": row["bucket"], "counts": {}, "total": 0, "confidence_sum": 0.0
+            })
+            bucket["counts"][row["state"]] = row["count"]
+            bucket["total"] += row["count"]
+            bucket["confidence_sum"] += row["confidence_sum"]
+        result = []
+        for bucket in buckets.values():
+            bucket["mean_confidence"] = bucket.pop("confidence_sum") / bucket["total"]
+            result.append(bucket)
+        return result
+
+    def get_prediction(self, prediction_id):
+        """One stored prediction by id, or None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT id, motor_id, ts, state, confidence, model_version, class_probabilities "
+                "FROM predictions WHERE id = ?", (prediction_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "motor_id": row["motor_id"],
+            "timestamp": row["ts"],
+            "state": row["state"],
+            "confidence": row["confidence"],
+            "model_version": row["model_version"],
+            "class_probabilities": json.loads(row["class_probabilities"] or "{}")
+        }
+
+    def save_feedback(self, prediction_id, label, timestamp=None):
+        """Store the confirmed label for a prediction; returns the label it replaces, if any"""
+        ts = timestamp if timestamp is not None else time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT label FROM feedback WHERE prediction_id = ?", (prediction_id,)
+            ).fetchone()
+            self.conn.execute(
+                "INSERT INTO feedback (prediction_id, label, ts) VALUES (?, ?, ?) "
+                "ON CONFLICT (prediction_id) DO UPDATE SET label = excluded.label, ts = excluded.ts",
+                (prediction_id, label, ts)
+            )
+        return row["label"] if row else None
+
+    def labelled_predictions(self):
+        """Every prediction with a confirmed label (read once at startup to rebuild the evaluator)"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT p.state, p.model_version, p.class_probabilities, f.label "
+                "FROM feedback f JOIN predictions p ON p.id = f.prediction_id"
+            ).fetchall()
+        return [{
+            "state": row["state"],
+            "model_version": row["model_version"],
+            "class_probabilities": json.loads(row["class_probabilities"] or "{}"),
+            "label": row["label"]
+        } for row in rows]
+
+    def indexed_predictions(self):
+        """Every prediction with its feature inputs, oldest first (read once at startup to rebuild the similarity index)"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, motor_id, ts, state, model_version, spectral_features, embedding "
+                "FROM predictions ORDER BY id"
+            ).fetchall()
+        for row in rows:
+            yield {
+                "id": row["id"],
+                "motor_id": row["motor_id"],
+                "timestamp": row["ts"],
+                "state": row["state"],
+                "model_version": row["model_version"],
+                "spectral_features": json.loads(row["spectral_features"] or "{}"),
+                "embedding": array('f', row["embedding"]).tolist() if row["embedding"] else None
+            }
+
+    def has_model_version(self, model_version):
+        """Whether any prediction was recorded with this model version"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM predictions WHERE model_version = ? LIMIT 1", (model_version,)
+            ).fetchone()
+        return row is not None
+
+    def motors(self):
+        """Motor ids with recorded history"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT motor_id FROM rollups WHERE resolution = 'hour'"
+            ).fetchall()
+        return [row["motor_id"] for row in rows]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,85 @@
+import threading
+import numpy as np
+import tensorflow as tf
+
+BATCH_BUCKETS = (1, 2, 4, 8)  # Power-of-two batch sizes with a pre-compiled graph each
+
+class BucketedPredictor:
+    """Run a Keras model through fixed-signature compiled functions, one per batch bucket.
+
+    Batches are zero-padded up to the next bucket (and split if larger than
+    the biggest one), so only len(buckets) graphs are ever traced and all of
+    them are traced by warm() before live traffic arrives.
+    """
+
+    def __init__(self, model, buckets=BATCH_BUCKETS):
+        self.model = model
+        self.buckets = tuple(sorted(buckets))
+        self.input_shape = model.input_shape
+        sample_shape = tuple(model.input_shape[1:])
+        # Same forward pass, also exposing the penultimate layer as a capture embedding
+        self.embedding_model = tf.keras.Model(model.inputs, [model.output, model.layers[-2].output])
+        self.embedding_size = int(np.prod(model.layers[-2].output.shape[1:]))
+        self.functions = {
+            bucket: tf.function(
+                lambda x: self.embedding_model(x, training=False),
+                input_signature=[tf.TensorSpec((bucket,) + sample_shape, tf.float32)]
+            )
+            for bucket in self.buckets
+        }
+        self.lock = threading.Lock()
+        self.bucket_hits = {bucket: 0 for bucket in self.buckets}
+        self.real_rows = 0
+        self.padded_rows = 0
+
+    def warm(self):
+        """Trace and run every bucket once with a zero batch"""
+        for bucket, function in self.functions.items():
+            function(tf.zeros((bucket,) + tuple(self.input_shape[1:]), tf.float32))
+
+    def bucket_for(self, n):
+        for bucket in self.buckets:
+            if bucket >= n:
+                return bucket
+        return self.buckets[-1]
+
+    def predict(self, batch):
+        """Predict a (N, T, C) batch; returns (N, classes) probabilities as a NumPy array"""
+        return self.predict_with_embedding(batch)[0]
+
+    def predict_with_embedding(self, batch):
+        """Predict a (N, T, C) batch; returns ((N, classes) probabilities, (N, embedding_size) embeddings)"""
+        batch = np.asarray(batch, dtype=np.float32)
+        if len(batch) == 0:
+            # Nothing to run (and np.concatenate refuses an empty list)
+            return (np.zeros((0, self.model.output_shape[-1]), dtype=np.float32),
+                    np.zeros((0, self.embedding_size), dtype=np.float32))
+        outputs = []
+        embeddings = []
+        largest = self.buckets[-1]
+        for start in range(0, len(batch), largest):
+            chunk = batch[start:start + largest]
+            n = len(chunk)
+            bucket = self.bucket_for(n)
+            if bucket > n:
+                chunk = np.concatenate([chunk, np.zeros((bucket - n,) + chunk.shape[1:], dtype=np.float32)])
+            probs, embedding = self.functions[bucket](chunk)
+            outputs.append(probs.numpy()[:n])
+            embeddings.append(embedding.numpy().reshape(bucket, -1)[:n])
+            with self.lock:
+                self.bucket_hits[bucket] += 1
+                self.real_rows += n
+                self.padded_rows += bucket - n
+        return np.concatenate(outputs), np.concatenate(embeddings)
+
+    def stats(self):
+        """Bucket hit counts and padding waste"""
+        with self.lock:
+            total_rows = self.real_rows + self.padded_rows
+            return {
+                "buckets": list(self.buckets),
+                "bucket_hits": {str(bucket): hits for bucket, hits in self.bucket_hits.items()},
+                "real_rows": self.real_rows,
+                "padded_rows": self.padded_rows,
+                "padding_waste": self.padded_rows / total_rows if total_rows else 0.0
+            }
@@ -0,0 +1,123 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from admission import AdmissionError
+
+# Job pool configuration
+MAX_WORKERS = 2  # Number of predictions running at the same time
+MAX_PENDING_JOBS = 32  # Queued + running jobs accepted before rejecting new ones
+JOB_RESULT_TTL = 300  # Seconds a finished job is kept before eviction
+JOB_RETRY_AFTER = 2  # Seconds suggested to clients turned away by a full job pool
+
+class JobQueueFullError(AdmissionError):
+    """Raised when the job pool cannot accept another job (answered like any other shed request)"""
+    status_code = 503
+
+class JobManager:
+    """Run prediction jobs on a bounded worker pool and keep their results for polling"""
+
+    def __init__(self, worker, max_workers=MAX_WORKERS, max_pending=MAX_PENDING_JOBS, result_ttl=JOB_RESULT_TTL):
+        self.worker = worker
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="predict-job")
+        self.jobs = {}
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    def submit(self, payload, **kwargs):
+        """Store the payload and queue it for a worker, returns the job id"""
+        self.evict_expired()
+        with self.lock:
+            if self.pending >= self.max_pending:
+                raise JobQueueFullError(f"Job queue is full ({self.max_pending} pending jobs)", JOB_RETRY_AFTER)
+            job_id = uuid.uuid4().hex
+            job = {
+                "id": job_id,
+                "status": "queued",
+                "created": time.time(),
+                "started": None,
+                "finished": None,
+                "result": None,
+                "error": None,
+                "exception": None,
+                "done": threading.Event()
+            }
+            self.jobs[job_id] = job
+            self.pending += 1
+
+        self.executor.submit(self._run, job, payload, kwargs)
+        return job_id
+
+    def _run(self, job, payload, kwargs):
+        """Execute one job on a worker thread"""
+        job["status"] = "running"
+        job["started"] = time.time()
+        try:
+            job["result"] = self.worker(payload, **kwargs)
+            job["status"] = "done"
+        except Exception as e:
+            print(f"Job {job['id']} failed: {str(e)}")
+            job["error"] = str(e)
+            job["exception"] = e
+            job["status"] = "error"
+        finally:
+            job["finished"] = time.time()
+            with self.lock:
+                self.pending -= 1
+            job["done"].set()
+
+    def get(self, job_id):
+        """Return the job with the given id, or None if unknown or evicted"""
+        self.evict_expired()
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job finishes and return it"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job["done"].wait(timeout)
+        return job
+
+    def evict_expired(self):
+        """Drop finished jobs older than the result TTL"""
+        cutoff = time.time() - self.result_ttl
+        with self.lock:
+            expired = [job_id for job_id, job in self.jobs.items()
+                       if job["finished"] is not None and job["finished"] < cutoff]
+            for job_id in expired:
+                del self.jobs[job_id]
+        return len(expired)
+
+    def discard(self, job_id):
+        """Remove a finished job straight away"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None and job["finished"] is not None:
+                del self.jobs[job_id]
+
+    def stats(self):
+        """Return counters describing the job pool"""
+        with self.lock:
+            return {
+                "pending": self.pending,
+                "stored": len(self.jobs),
+                "max_pending": self.max_pending,
+                "result_ttl": self.result_ttl
+            }
+
+def job_to_dict(job):
+    """Public JSON view of a job"""
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "created": job["created"],
+        "started": job["started"],
+        "finished": job["finished"],
+        "result": job["result"],
+        "error": job["error"]
+    }
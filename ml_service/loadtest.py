@@ -0,0 +1,258 @@
+"""Record, synthesise and replay /predict and monitoring traffic against a local instance.
+
+A trace is a directory with traffic.jsonl (one request per line: offset in
+seconds from the start, kind, payload file, motor id) and payloads/*.mat,
+content-addressed so repeated uploads are stored once.
+
+    # Record live traffic: start the service with TRAFFIC_RECORD_DIR=traces/live
+    python loadtest.py synth traces/synth --requests 200 --rate 5 --monitoring-share 0.3
+    python loadtest.py replay traces/synth --url http://localhost:5600 --rate 10 --concurrency 8
+
+Replay is open-loop: requests arrive on their schedule whatever the server
+does, at most --concurrency are in flight, and latency is measured from the
+scheduled arrival, so a saturated server shows up as queueing delay rather
+than as a slower arrival rate.
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from multipart import encode_multipart
+
+TRAFFIC_RECORD_DIR = os.environ.get("TRAFFIC_RECORD_DIR")  # Service records its traffic here when set
+TRACE_FILE = "traffic.jsonl"
+PAYLOAD_DIR = "payloads"
+RSS_SAMPLE_INTERVAL = 1.0  # Seconds between server RSS samples
+SHED_STATUSES = (429, 503)  # Admission control / memory budget rejections
+
+class TrafficRecorder:
+    """Appends served requests to a trace directory (service side)"""
+
+    def __init__(self, trace_dir):
+        self.trace_dir = trace_dir
+        self.lock = threading.Lock()
+        self.started = None
+        os.makedirs(os.path.join(trace_dir, PAYLOAD_DIR), exist_ok=True)
+
+    def _append(self, entry):
+        with self.lock:
+            now = time.time()
+            if self.started is None:
+                self.started = now
+            entry["offset"] = now - self.started
+            with open(os.path.join(self.trace_dir, TRACE_FILE), "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def record_predict(self, file_data, motor_id=None):
+        digest = hashlib.sha256(file_data).hexdigest()[:16]
+        payload = os.path.join(PAYLOAD_DIR, f"{digest}.mat")
+        path = os.path.join(self.trace_dir, payload)
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(file_data)
+        self._append({"kind": "predict", "payload": payload, "motor_id": motor_id})
+
+    def record_monitoring(self):
+        self._append({"kind": "monitoring"})
+
+def synthesise(trace_dir, requests, rate, monitoring_share=0.0, distinct_payloads=10, seed=0):
+    """Poisson arrivals of /predict uploads (create_mat_file payloads) mixed with monitoring polls"""
+    from generate_signal_mat import create_mat_file
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.join(trace_dir, PAYLOAD_DIR), exist_ok=True)
+    payloads = []
+    for i in range(distinct_payloads):
+        payload = os.path.join(PAYLOAD_DIR, f"synthetic_{i:03d}.mat")
+        if not create_mat_file(os.path.join(trace_dir, payload)):
+            raise RuntimeError(f"Could not create {payload}")
+        payloads.append(payload)
+
+    offsets = np.cumsum(rng.exponential(1.0 / rate, size=requests))
+    with open(os.path.join(trace_dir, TRACE_FILE), "w") as f:
+        for offset in offsets:
+            if rng.random() < monitoring_share:
+                entry = {"offset": float(offset), "kind": "monitoring"}
+            else:
+                entry = {"offset": float(offset), "kind": "predict",
+                         "payload": payloads[rng.integers(len(payloads))],
+                         "motor_id": f"motor_{rng.integers(distinct_payloads):03d}"}
+            f.write(json.dumps(entry) + "\n")
+    return len(offsets)
+
+def load_trace(trace_dir):
+    with open(os.path.join(trace_dir, TRACE_FILE)) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    payloads = {}
+    for entry in entries:
+        if entry["kind"] == "predict" and entry["payload"] not in payloads:
+            with open(os.path.join(trace_dir, entry["payload"]), "rb") as f:
+                payloads[entry["payload"]] = f.read()
+    return entries, payloads
+
+def _send(base_url, entry, payloads, timeout):
+    """Issue one request; returns the HTTP status (0 on connection failure)"""
+    if entry["kind"] == "predict":
+        body, content_type = encode_multipart(payloads[entry["payload"]], "replay.mat",
+                                              {"motor_id": entry.get("motor_id")})
+        request = urllib.request.Request(base_url + "/predict", data=body,
+                                         headers={"Content-Type": content_type}, method="POST")
+    else:
+        request = urllib.request.Request(base_url + "/get-monitoring-status")
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code
+    except (urllib.error.URLError, OSError):
+        return 0
+
+def _read_rss(base_url, server_pid):
+    """Server RSS in bytes, from /proc when the pid is known, otherwise from /memory-stats"""
+    if server_pid:
+        with open(f"/proc/{server_pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+        return None
+    with urllib.request.urlopen(base_url + "/memory-stats", timeout=5) as response:
+        return json.loads(response.read()).get("rss_bytes")
+
+def _sample_rss(base_url, server_pid, started, stop, samples):
+    while not stop.is_set():
+        try:
+            samples.append({"t": time.time() - started, "rss_mb": _read_rss(base_url, server_pid) / 1e6})
+        except Exception:
+            pass
+        stop.wait(RSS_SAMPLE_INTERVAL)
+
+def replay(trace_dir, base_url, rate=None, speedup=1.0, concurrency=8, limit=None, timeout=60.0, server_pid=None):
+    """Replay a trace and return the load report.
+
+    rate: fixed arrival rate (requests/s) instead of the recorded offsets.
+    speedup: compresses the recorded offsets when no rate is given.
+    """
+    base_url = base_url.rstrip("/")
+    entries, payloads = load_trace(trace_dir)
+    entries = entries[:limit] if limit else entries
+    if not entries:
+        raise ValueError(f"No requests in {trace_dir}")
+    if rate:
+        schedule = [i / rate for i in range(len(entries))]
+    else:
+        first = entries[0]["offset"]
+        schedule = [(entry["offset"] - first) / speedup for entry in entries]
+
+    results = []
+    results_lock = threading.Lock()
+    rss_samples = []
+    stop = threading.Event()
+
+    def run(entry, scheduled_at):
+        status = _send(base_url, entry, payloads, timeout)
+        finished = time.time()
+        with results_lock:
+            results.append({"kind": entry["kind"], "status": status, "latency": finished - scheduled_at,
+                            "finished": finished})
+
+    started = time.time()
+    sampler = threading.Thread(target=_sample_rss, args=(base_url, server_pid, started, stop, rss_samples),
+                               daemon=True)
+    sampler.start()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for entry, offset in zip(entries, schedule):
+            scheduled_at = started + offset
+            delay = scheduled_at - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(run, entry, scheduled_at)
+    elapsed = time.time() - started
+    stop.set()
+    sampler.join()
+    return build_report(results, elapsed, rss_samples)
+
+def _latency_summary(latencies):
+    if not latencies:
+        return None
+    values = np.array(latencies) * 1000
+    return {"p50_ms": float(np.percentile(values, 50)), "p95_ms": float(np.percentile(values, 95)),
+            "p99_ms": float(np.percentile(values, 99)), "max_ms": float(values.max())}
+
+def build_report(results, elapsed, rss_samples):
+    total = len(results)
+    ok = [r for r in results if 200 <= r["status"] < 300]
+    shed = [r for r in results if r["status"] in SHED_STATUSES]
+    errors = [r for r in results if not 200 <= r["status"] < 300 and r["status"] not in SHED_STATUSES]
+    by_kind = {}
+    for kind in sorted({r["kind"] for r in results}):
+        kind_results = [r for r in results if r["kind"] == kind]
+        by_kind[kind] = {
+            "requests": len(kind_results),
+            "latency": _latency_summary([r["latency"] for r in kind_results if 200 <= r["status"] < 300])
+        }
+    rss = [sample["rss_mb"] for sample in rss_samples]
+    return {
+        "requests": total,
+        "duration_s": elapsed,
+        "throughput_per_s": len(ok) / elapsed if elapsed else 0.0,
+        "latency": _latency_summary([r["latency"] for r in ok]),
+        "error_rate": len(errors) / total if total else 0.0,
+        "shed_rate": len(shed) / total if total else 0.0,
+        "status_counts": {str(status): sum(1 for r in results if r["status"] == status)
+                          for status in sorted({r["status"] for r in results})},
+        "by_kind": by_kind,
+        "rss_mb": {"start": rss[0], "peak": max(rss), "end": rss[-1]} if rss else None,
+        "rss_timeline": rss_samples
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Traffic capture and replay load testing")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    synth = subparsers.add_parser("synth", help="Synthesise a trace with create_mat_file payloads")
+    synth.add_argument("trace_dir")
+    synth.add_argument("--requests", type=int, default=200)
+    synth.add_argument("--rate", type=float, default=5.0, help="Mean arrivals per second (Poisson)")
+    synth.add_argument("--monitoring-share", type=float, default=0.0, help="Fraction of monitoring polls")
+    synth.add_argument("--payloads", type=int, default=10, help="Distinct .mat payloads")
+    synth.add_argument("--seed", type=int, default=0)
+
+    replay_parser = subparsers.add_parser("replay", help="Replay a recorded or synthetic trace")
+    replay_parser.add_argument("trace_dir")
+    replay_parser.add_argument("--url", default="http://localhost:5600")
+    replay_parser.add_argument("--rate", type=float, help="Fixed arrival rate instead of the recorded timing")
+    replay_parser.add_argument("--speedup", type=float, default=1.0, help="Compress recorded timing")
+    replay_parser.add_argument("--concurrency", type=int, default=8)
+    replay_parser.add_argument("--limit", type=int)
+    replay_parser.add_argument("--timeout", type=float, default=60.0)
+    replay_parser.add_argument("--server-pid", type=int, help="Read RSS from /proc instead of /memory-stats")
+    replay_parser.add_argument("--report", help="Write the JSON report (with the RSS timeline) here")
+    args = parser.parse_args()
+
+    if args.command == "synth":
+        count = synthesise(args.trace_dir, args.requests, args.rate, args.monitoring_share, args.payloads, args.seed)
+        print(f"Wrote {count} requests to {os.path.join(args.trace_dir, TRACE_FILE)}")
+        return
+
+    report = replay(args.trace_dir, args.url, args.rate, args.speedup, args.concurrency, args.limit,
+                    args.timeout, args.server_pid)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    print("\n=== Load test ===")
+    for key, value in report.items():
+        if key != "rss_timeline":
+            print(f"{key}: {value}")
+
+if __name__ == "__main__":
+    main()
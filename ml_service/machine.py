@@ -2,15 +2,81 @@ import numpy as np
 import scipy.io as sio
 import time
 import os
+import json
 from datetime import datetime
 
+LATEST_MANIFEST = "latest.json"  # Pointer to the newest complete capture
+RETENTION = 10  # Number of captures kept in the output directory
+COMPRESS_CAPTURES = os.environ.get("COMPRESS_CAPTURES", "0") == "1"  # MATLAB (zlib) compressed .mat output
+SHM_TRANSPORT = os.environ.get("SHM_TRANSPORT", "0") == "1"  # Publish captures to the shared-memory ring
+ARCHIVE_CAPTURES = os.environ.get("ARCHIVE_CAPTURES", "1") == "1"  # Also write .mat files (required without the ring)
+
+def write_json_atomic(path, data):
+    """Write JSON through a temp file and rename so readers never see a partial file"""
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+def read_latest_capture(output_dir):
+    """Return the latest manifest written by SignalGenerator, or None if there is none yet"""
+    try:
+        with open(os.path.join(output_dir, LATEST_MANIFEST)) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    manifest["path"] = os.path.join(output_dir, manifest["file"])
+    return manifest
+
+def dspace_mat_dict(signals, t):
+    """{'essais1': ...} in the dSPACE layout the service parses, from a dict of 1-D signals"""
+    required_signals = ['i1', 'i2', 'i3', 'v1', 'v2', 'v3', 'vn', 'w_m', 'vibrad']
+    # Each signal is a Name/Data/Plot/Capture struct
+    dt = np.dtype([
+        ('Name', 'O'),
+        ('Data', 'O'),
+        ('Plot', 'O'),
+        ('Capture', 'O')
+    ])
+    Y = []
+    for name in required_signals:  # Use required_signals to ensure correct order
+        # Ensure the signal is a numpy array with correct shape
+        data = np.array(signals[name])
+        if data.shape != (len(t),):
+            raise ValueError(f"Signal {name} has wrong shape: {data.shape}, expected ({len(t)},)")
+        signal_struct = np.zeros(1, dtype=dt)[0]
+        # Store just the signal name without any path
+        signal_struct['Name'] = name
+        signal_struct['Data'] = data
+        signal_struct['Plot'] = True
+        signal_struct['Capture'] = True
+        Y.append(signal_struct)
+
+    essais1 = {
+        'Y': np.array(Y, dtype=object),
+        'X': np.arange(len(t)),
+        'Time': t
+    }
+    return {'essais1': essais1}
+
 class SignalGenerator:
-    def __init__(self, sample_rate=50001, duration=1.0):
+    def __init__(self, sample_rate=50001, duration=1.0, retention=RETENTION, compress=COMPRESS_CAPTURES,
+                 shm=SHM_TRANSPORT, archive=ARCHIVE_CAPTURES):
         self.sample_rate = sample_rate
         self.duration = duration
         self.t = np.linspace(0, duration, sample_rate)
         self.base_freq = 50  # Base frequency for electrical signals (50 Hz)
         self.output_dir = "generated_signals"
+        self.retention = retention
+        self.compress = compress
+        self.sequence = 0
+        self.archive = archive or not shm
+        self.ring = None
+        if shm:
+            from shm_ring import ShmRingWriter
+            self.ring = ShmRingWriter(samples=sample_rate)
         
         # Create output directory if it doesn't exist
         if not os.path.exists(self.output_dir):
@@ -170,21 +236,35 @@ class SignalGenerator:
         print("Warning: Could not generate ideal signals, using last attempt")
         return signals
 
-    def save_signals(self, signals, fault_type=None):
-        """Save signals to .mat file in dSPACE format"""
-        # Delete all existing .mat files in the output directory
-        for file in os.listdir(self.output_dir):
-            if file.endswith('.mat'):
-                file_path = os.path.join(self.output_dir, file)
-                try:
-                    os.remove(file_path)
-                    print(f"Deleted old file: {file}")
-                except Exception as e:
-                    print(f"Error deleting file {file}: {str(e)}")
-
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    def publish(self, signals, fault_type=None):
+        """Hand a capture to the monitoring service: shared-memory ring and/or .mat archive.
+        Returns the archived file path, or None when only the ring is written."""
+        capture_time = datetime.now()
+        if self.ring is not None:
+            stacked = np.stack([signals[name] for name in ['i1', 'i2', 'i3', 'v1', 'v2', 'v3', 'vn', 'w_m', 'vibrad']])
+            sequence = self.ring.write(stacked, capture_time.timestamp(), fault_type)
+            print(f"Published frame {sequence} to shared memory")
+        if self.archive:
+            return self.save_signals(signals, fault_type, capture_time)
+        return None
+
+    def close(self):
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def save_signals(self, signals, fault_type=None, capture_time=None):
+        """Save signals to .mat file in dSPACE format.
+
+        The file is written under a temporary name and atomically renamed, the
+        oldest captures beyond the retention ring are removed, and the latest
+        manifest is updated last so readers only ever see complete files.
+        """
+        now = capture_time or datetime.now()
+        timestamp = now.strftime("%Y%m%d_%H%M%S_%f")
         filename = f"motor_signals_{timestamp}.mat"
         filepath = os.path.join(self.output_dir, filename)
+        temp_path = os.path.join(self.output_dir, f".{filename}.tmp")
 
         # Verify all required signals are present
         required_signals = ['i1', 'i2', 'i3', 'v1', 'v2', 'v3', 'vn', 'w_m', 'vibrad']
@@ -193,48 +273,18 @@ class SignalGenerator:
             raise ValueError(f"Missing required signals: {missing_signals}")
 
         try:
-            # Create the signal entries
-            Y = []
-            for name in required_signals:  # Use required_signals to ensure correct order
-                data = signals[name]
-                # Ensure the signal is a numpy array with correct shape
-                data = np.array(data)
-                if data.shape != (self.sample_rate,):
-                    raise ValueError(f"Signal {name} has wrong shape: {data.shape}, expected ({self.sample_rate},)")
-                
-                # Create a structured array for each signal
-                dt = np.dtype([
-                    ('Name', 'O'),
-                    ('Data', 'O'),
-                    ('Plot', 'O'),
-                    ('Capture', 'O')
-                ])
-                signal_struct = np.zeros(1, dtype=dt)[0]
-                # Store just the signal name without any path
-                signal_struct['Name'] = name
-                signal_struct['Data'] = data
-                signal_struct['Plot'] = True
-                signal_struct['Capture'] = True
-                Y.append(signal_struct)
-
-            # Convert Y to a numpy array
-            Y = np.array(Y, dtype=object)
-
-            # Create the essais1 dictionary
-            essais1 = {
-                'Y': Y,
-                'X': np.arange(self.sample_rate),
-                'Time': self.t
-            }
+            mat_data = dspace_mat_dict(signals, self.t)
 
-            # Save to .mat file
-            sio.savemat(filepath, {'essais1': essais1}, do_compression=False)
-            print(f"Saved signals to {filepath}")
+            # Save to a temporary file first
+            with open(temp_path, 'wb') as f:
+                sio.savemat(f, mat_data, do_compression=self.compress)
+                f.flush()
+                os.fsync(f.fileno())
             
             # Verify the saved file
             try:
                 # Try to load and process the file using the same function as utils.py
-                loaded = sio.loadmat(filepath, struct_as_record=False, squeeze_me=True)
+                loaded = sio.loadmat(temp_path, struct_as_record=False, squeeze_me=True)
                 if 'essais1' not in loaded:
                     print("Warning: essais1 not found in saved file")
                 else:
@@ -251,12 +301,40 @@ class SignalGenerator:
                             print(f"Warning: Some signals are missing or incorrectly named. Found: {saved_signals}")
             except Exception as e:
                 print(f"Warning: File verification failed: {str(e)}")
+            
+            # Publish the complete file under its final name
+            os.replace(temp_path, filepath)
+            print(f"Saved signals to {filepath}")
+            
+            captures = self.prune_captures()
+            self.sequence += 1
+            write_json_atomic(os.path.join(self.output_dir, LATEST_MANIFEST), {
+                "file": filename,
+                "timestamp": now.timestamp(),
+                "sequence": self.sequence,
+                "fault_type": fault_type if fault_type else "sain",
+                "captures": captures
+            })
                 
             return filepath
         except Exception as e:
             print(f"Error saving signals: {str(e)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
             raise
 
+    def prune_captures(self):
+        """Keep only the newest `retention` captures, returns the kept file names (oldest first)"""
+        captures = sorted(f for f in os.listdir(self.output_dir)
+                          if f.startswith('motor_signals_') and f.endswith('.mat'))
+        for file in captures[:-self.retention]:
+            try:
+                os.remove(os.path.join(self.output_dir, file))
+                print(f"Deleted old file: {file}")
+            except Exception as e:
+                print(f"Error deleting file {file}: {str(e)}")
+        return captures[-self.retention:]
+
 def run_signal_generator():
     """Main function to run the signal generator"""
     generator = SignalGenerator()
@@ -274,10 +352,11 @@ def run_signal_generator():
             
             # Generate and save signals
             signals = generator.generate_signals(fault_type=current_fault)
-            filepath = generator.save_signals(signals, fault_type=current_fault)
+            filepath = generator.publish(signals, fault_type=current_fault)
             
             print(f"\nGenerated signals with state: {current_fault if current_fault else 'sain'}")
-            print(f"Saved to: {filepath}")
+            if filepath:
+                print(f"Saved to: {filepath}")
             
             # Wait before generating next signals
             # This delay should match the frontend polling interval
@@ -288,6 +367,8 @@ def run_signal_generator():
     except Exception as e:
         print(f"Error during signal generation: {str(e)}")
         raise  # Re-raise the exception for proper error handling
+    finally:
+        generator.close()
 
 if __name__ == "__main__":
     run_signal_generator()
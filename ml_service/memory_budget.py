@@ -0,0 +1,153 @@
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from admission import AdmissionError
+
+# Memory configuration
+MEMORY_BUDGET_MB = float(os.environ.get("MEMORY_BUDGET_MB", "1024"))  # Total bytes in-flight requests may reserve
+MEMORY_DEBUG = os.environ.get("MEMORY_DEBUG", "0") == "1"  # Measure stage peaks with tracemalloc (slow)
+CAPTURE_BYTES = 50001 * 9 * 8  # One float64 capture
+PYTHON_FLOAT_BYTES = 32  # float object (24) + list slot (8) after tolist()
+JSON_FLOAT_BYTES = 20  # Characters per float in the JSON response
+REQUEST_MEMORY_FACTOR = 11  # Peak request footprint in captures (object tree, stacks, temporaries, lists, JSON)
+
+class MemoryBudgetExceeded(AdmissionError):
+    """No memory could be reserved before the request deadline"""
+    status_code = 503
+
+def current_rss_bytes():
+    """Resident memory of this process (Linux /proc; peak RSS elsewhere)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        import sys
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == 'darwin' else usage * 1024
+
+def estimate_request_bytes(payload_bytes):
+    """Upper estimate of one prediction request's peak footprint"""
+    return max(payload_bytes, CAPTURE_BYTES) * REQUEST_MEMORY_FACTOR
+
+def estimate_parse_bytes(payload_bytes, raw_signals):
+    """scipy object tree (~payload) plus per-signal arrays and the float64 stack"""
+    return payload_bytes + 2 * raw_signals.nbytes
+
+def estimate_predict_bytes(raw_signals):
+    """Two normalisation temporaries, the float32 model input and tolist() Python floats"""
+    return 2 * raw_signals.nbytes + raw_signals.size * 4 + raw_signals.size * PYTHON_FLOAT_BYTES
+
+def estimate_serialize_bytes(n_values):
+    return n_values * JSON_FLOAT_BYTES
+
+class MemoryStats:
+    """Per-stage peak bytes aggregated over requests"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+
+    def record(self, stage, nbytes):
+        with self.lock:
+            stats = self.stages.setdefault(stage, {"count": 0, "total_bytes": 0, "max_bytes": 0})
+            stats["count"] += 1
+            stats["total_bytes"] += nbytes
+            stats["max_bytes"] = max(stats["max_bytes"], nbytes)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                stage: dict(stats, mean_bytes=stats["total_bytes"] / stats["count"])
+                for stage, stats in self.stages.items()
+            }
+
+memory_stats = MemoryStats()
+
+if MEMORY_DEBUG and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+class RequestMemory:
+    """Peak bytes allocated per pipeline stage of one request.
+
+    With MEMORY_DEBUG the peak is measured with tracemalloc (process-wide, so
+    concurrent requests inflate each other's numbers); otherwise the caller
+    supplies a cheap estimate computed from the array sizes involved.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name, estimate=None):
+        """Account a stage; `estimate` is a callable returning bytes, evaluated after the stage"""
+        if MEMORY_DEBUG:
+            start, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            if MEMORY_DEBUG:
+                _, peak = tracemalloc.get_traced_memory()
+                nbytes = max(0, peak - start)
+            else:
+                try:
+                    nbytes = int(estimate()) if estimate else 0
+                except Exception:
+                    nbytes = 0
+            self.stages[name] = nbytes
+            memory_stats.record(name, nbytes)
+
+    def to_dict(self):
+        return {
+            "mode": "tracemalloc" if MEMORY_DEBUG else "estimate",
+            "stages": dict(self.stages),
+            "peak_bytes": max(self.stages.values()) if self.stages else 0
+        }
+
+class MemoryBudget:
+    """Global budget of reserved bytes; new work waits until enough memory is free"""
+
+    def __init__(self, limit_bytes=MEMORY_BUDGET_MB * 1024 * 1024):
+        self.limit = int(limit_bytes)
+        self.reserved = 0
+        self.cond = threading.Condition()
+        self.waited = 0
+        self.rejected = 0
+
+    @contextmanager
+    def reserve(self, nbytes, deadline=None):
+        """Hold `nbytes` of the budget for the duration of the block.
+        A request larger than the whole budget runs alone rather than never."""
+        nbytes = min(int(nbytes), self.limit)
+        with self.cond:
+            if self.reserved + nbytes > self.limit:
+                self.waited += 1
+            while self.reserved + nbytes > self.limit:
+                timeout = None if deadline is None else deadline - time.time()
+                if timeout is not None and timeout <= 0:
+                    self.rejected += 1
+                    raise MemoryBudgetExceeded("Memory budget exhausted, try again later")
+                self.cond.wait(timeout)
+            self.reserved += nbytes
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.reserved -= nbytes
+                self.cond.notify_all()
+
+    def stats(self):
+        with self.cond:
+            return {
+                "limit_bytes": self.limit,
+                "reserved_bytes": self.reserved,
+                "waited": self.waited,
+                "rejected": self.rejected,
+                "debug_tracemalloc": MEMORY_DEBUG
+            }
+
+memory_budget = MemoryBudget()
@@ -0,0 +1,144 @@
+import hmac
+import os
+import threading
+import time
+import tensorflow as tf
+
+from inference import BucketedPredictor
+
+MAX_LOADED_VERSIONS = 3  # Active model plus warm standbys kept in memory
+MODELS_DIR = os.environ.get("MODELS_DIR", "models")  # Versions loaded over HTTP must live here
+# Loading a Keras file can run code it carries, so /models writes are disabled unless a token is configured
+MODEL_ADMIN_TOKEN = os.environ.get("MODEL_ADMIN_TOKEN")
+
+def model_admin_enabled():
+    return bool(MODEL_ADMIN_TOKEN)
+
+def check_admin_token(token):
+    """Constant-time comparison against the configured token"""
+    return model_admin_enabled() and token is not None and hmac.compare_digest(token, MODEL_ADMIN_TOKEN)
+
+def resolve_model_path(name, models_dir=MODELS_DIR):
+    """Path of a model file named relative to models_dir; ValueError if it points anywhere else"""
+    base = os.path.realpath(models_dir)
+    path = os.path.realpath(os.path.join(base, name))
+    if os.path.isabs(name) or os.path.commonpath([base, path]) != base or path == base:
+        raise ValueError(f"Model path must name a file inside {models_dir}")
+    return path
+
+class ModelRegistry:
+    """Hold several model versions and atomically swap the one serving traffic.
+
+    Callers take a (version, predictor) snapshot with current() and use it for
+    the whole request, so in-flight predictions finish on the version they
+    started with even if a new one is activated meanwhile.
+    """
+
+    def __init__(self, max_versions=MAX_LOADED_VERSIONS):
+        self.max_versions = max_versions
+        self.versions = {}
+        self.pending = {}  # Versions being loaded or that failed to load, kept apart until ready
+        self.active = None  # (version, predictor) tuple, replaced atomically
+        self.lock = threading.Lock()
+
+    def load(self, version, path, activate=True, background=True):
+        """Load and warm a model version, optionally swapping it in once ready"""
+        if background:
+            thread = threading.Thread(target=self._load, args=(version, path, activate),
+                                      name=f"model-load-{version}", daemon=True)
+            thread.start()
+            return thread
+        self._load(version, path, activate)
+
+    def _load(self, version, path, activate):
+        # Built on the side: a reload leaves the current entry (even the active one) serving until it succeeds
+        entry = {
+            "version": version,
+            "path": path,
+            "status": "loading",
+            "predictor": None,
+            "loaded_at": None,
+            "warmup_seconds": None,
+            "error": None
+        }
+        with self.lock:
+            self.pending[version] = entry
+        try:
+            print(f"Loading model version {version} from {path}")
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Model file not found: {path}")
+            model = tf.keras.models.load_model(path)
+
+            # Trace and run every batch bucket so no live request pays for compilation
+            started = time.time()
+            predictor = BucketedPredictor(model)
+            predictor.warm()
+            entry["warmup_seconds"] = time.time() - started
+
+            entry["predictor"] = predictor
+            entry["loaded_at"] = time.time()
+            entry["status"] = "ready"
+            with self.lock:
+                if self.pending.get(version) is entry:
+                    del self.pending[version]
+                self.versions[version] = entry
+                if self.active and self.active[0] == version:
+                    # Reloaded the serving version: new requests move to the fresh predictor
+                    self.active = (version, predictor)
+            print(f"Model version {version} ready (warm-up {entry['warmup_seconds']:.2f}s)")
+            if activate:
+                self.activate(version)
+        except Exception as e:
+            print(f"Error loading model version {version}: {str(e)}")
+            entry["status"] = "error"
+            entry["error"] = str(e)
+            if self.active is None:
+                raise
+
+    def activate(self, version):
+        """Atomically make a ready version the one serving new requests"""
+        with self.lock:
+            entry = self.versions.get(version)
+            if entry is None or entry["status"] != "ready":
+                raise ValueError(f"Model version {version} is not loaded")
+            self.active = (version, entry["predictor"])
+            self._evict_standbys()
+        print(f"Activated model version {version}")
+
+    def _evict_standbys(self):
+        """Drop the oldest ready standbys beyond max_versions (lock held)"""
+        active_version = self.active[0] if self.active else None
+        ready = sorted((e for e in self.versions.values()
+                        if e["status"] == "ready" and e["version"] != active_version),
+                       key=lambda e: e["loaded_at"])
+        while len(ready) + 1 > self.max_versions:
+            entry = ready.pop(0)
+            del self.versions[entry["version"]]
+            print(f"Unloaded standby model version {entry['version']}")
+
+    def current(self):
+        """Return the (version, predictor) snapshot serving new requests"""
+        active = self.active
+        if active is None:
+            raise RuntimeError("No model version is active")
+        return active
+
+    def active_version(self):
+        return self.active[0] if self.active else None
+
+    def cache_key(self, *parts, version=None):
+        """Build a cache key scoped to a model version"""
+        version = version if version is not None else self.active_version()
+        return (version,) + tuple(parts)
+
+    def describe(self):
+        """JSON view of loaded versions"""
+        with self.lock:
+            return {
+                "active": self.active_version(),
+                "versions": [
+                    dict({k: v for k, v in entry.items() if k != "predictor"},
+                         inference=entry["predictor"].stats() if entry["predictor"] else None)
+                    for entry in list(self.versions.values()) + list(self.pending.values())
+                ]
+            }
@@ -4,16 +4,32 @@ import scipy.io as sio
 import h5py
 import io
 import os
+from contextlib import nullcontext
 from scipy.io.matlab.mio5_params import mat_struct
-from utils import convert_mat_to_npz
+from utils import convert_mat_to_npz, normalize_signals
+from admission import DeadlineExceeded, admission, check_deadline
+from model_registry import ModelRegistry
+from features import spectral_features
+from student_model import prepare_model_input
+from validation_rules import PATTERN_NAMES, compute_patterns_batch, load_rules, patterns_to_matrix
+from memory_budget import RequestMemory, estimate_parse_bytes, estimate_predict_bytes
+from evaluation import evaluator
+from cascade import (CASCADE_ENABLED, PRESCREEN_VERSION, cascade_stats, prescreen_batch,
+                     skip_mask)
 
 # Load class names and trained model - ensure order matches training
 CLASS_NAMES = ['cassure', 'sain', 'desiquilibre']  # Fixed order to match training data
-MODEL_PATH = "cnn_lstm_motor_model_fixed.h5"
-model = tf.keras.models.load_model(MODEL_PATH)
+MODEL_PATH = os.environ.get("MODEL_PATH", "cnn_lstm_motor_model_fixed.h5")
+MODEL_VERSION = os.environ.get("MODEL_VERSION", "v1")
 
-# Define confidence thresholds and characteristic frequencies
-CONFIDENCE_THRESHOLD = 0.7  # Minimum confidence required for a prediction
+# Versioned models; new versions are loaded and warmed in the background, then swapped in
+registry = ModelRegistry()
+registry.load(MODEL_VERSION, MODEL_PATH, activate=True, background=False)
+
+# Post-model validation rules (class -> required/forbidden spectral patterns -> confidence adjustments)
+validation_rules = load_rules(CLASS_NAMES)
+
+# Define characteristic frequencies
 CHARACTERISTIC_FREQS = {
     'sain': {'base': 50, 'tolerance': 2},  # Base frequency ±2 Hz
     'desiquilibre': {'mod': 25, 'tolerance': 5},  # Modulation frequency ±5 Hz
@@ -58,141 +74,171 @@ def validate_signal_characteristics(signals):
         print(f"Error in signal validation: {str(e)}")
         return None
 
-def predict_from_file(file_data):
+def load_signals(file_data):
+    """Parse .mat file data into a raw (un-normalised) (9, 50001) signal array"""
+    # Parse straight from memory (MATLAB-compressed .mat files are inflated by loadmat itself)
+    print("\nConverting .mat to signal array...")
+    return convert_mat_to_npz(io.BytesIO(file_data), normalize=False)
+
+def predict_from_signals(raw_signals, deadline=None):
     """
-    Load a .mat file data and make predictions
+    Make predictions on a raw (9, 50001) signal array
     Returns a dictionary with prediction results and metrics
+    Raises DeadlineExceeded if the deadline (epoch seconds) passes before the model runs
     """
     try:
-        # Save the file data temporarily to use convert_mat_to_npz
-        temp_mat_path = os.path.join('uploads', 'temp_predict.mat')
-        
-        try:
-            # Save the file data temporarily
-            with open(temp_mat_path, 'wb') as f:
-                f.write(file_data)
-            
-            # Convert .mat to preprocessed numpy array using exact training preprocessing
-            print("\nConverting .mat to preprocessed array...")
-            signals = convert_mat_to_npz(temp_mat_path)
-            
-            print(f"\nPreprocessed signals shape: {signals.shape}")
-            
-            # Print signal statistics for debugging
-            print("\nSignal statistics after preprocessing:")
-            for i, name in enumerate(['i1', 'i2', 'i3', 'v1', 'v2', 'v3', 'vn', 'w_m', 'vibrad']):
-                mean = np.mean(signals[i])
-                std = np.std(signals[i])
-                min_val = np.min(signals[i])
-                max_val = np.max(signals[i])
-                print(f"{name}: mean={mean:.2f}, std={std:.2f}, min={min_val:.2f}, max={max_val:.2f}")
-            
-            # Validate signal characteristics
-            signal_patterns = validate_signal_characteristics(signals)
-            
-            # Reshape and preprocess exactly like in the notebook
-            sample = np.stack(signals, axis=-1)[np.newaxis, ...]  # shape: (1, 50001, 9)
-            sample = (sample - np.mean(sample, axis=1, keepdims=True)) / (np.std(sample, axis=1, keepdims=True) + 1e-8)
-            
-            # Make prediction using model.predict
-            print("\nMaking prediction...")
-            pred = model.predict(sample, verbose=0)[0]
-            
-            # Print raw predictions for debugging
-            print("\nRaw model output:", pred)
-            
-            # Get prediction and confidence
-            predicted_index = np.argmax(pred)
-            confidence = float(np.max(pred))
-            predicted_class = CLASS_NAMES[predicted_index]
-            
-            # Get all class probabilities
-            class_probs = {CLASS_NAMES[i]: float(pred[i]) for i in range(len(CLASS_NAMES))}
-            
-            print("\nPrediction probabilities:")
-            for class_name, prob in class_probs.items():
-                print(f"{class_name}: {prob*100:.2f}%")
-            
-            # Validate prediction against signal characteristics
-            if signal_patterns:
-                is_valid = True
-                reason = None
-                
-                if predicted_class == 'sain':
-                    if not signal_patterns['base_freq']:  # Only check for base frequency
-                        is_valid = False
-                        reason = "Signal characteristics don't match healthy state pattern"
-                
-                elif predicted_class == 'desiquilibre':
-                    if not signal_patterns['mod_25hz'] or not signal_patterns['phase_balance']:
-                        is_valid = False
-                        reason = "Signal characteristics don't match unbalance pattern"
-                
-                elif predicted_class == 'cassure':
-                    if not signal_patterns['sideband_100hz']:
-                        is_valid = False
-                        reason = "Signal characteristics don't match broken rotor pattern"
-                
-                # If validation fails or confidence is low, adjust prediction
-                if not is_valid or confidence < CONFIDENCE_THRESHOLD:
-                    print(f"\nWarning: {reason if reason else 'Low confidence prediction'}")
-                    if signal_patterns['base_freq'] and not signal_patterns['sideband_100hz'] and not signal_patterns['mod_25hz']:
-                        # Only set to 'sain' if we have base frequency and no fault indicators
-                        predicted_class = 'sain'
-                        confidence = max(confidence, 0.65)  # Slightly lower confidence threshold for healthy state
-                        # Update probabilities to match the state
-                        class_probs = {
-                            'sain': max(confidence, class_probs['sain']),
-                            'desiquilibre': min(0.3, class_probs['desiquilibre']),
-                            'cassure': min(0.3, class_probs['cassure'])
-                        }
-                    else:
-                        # Keep the model's prediction but with lower confidence
-                        confidence = min(confidence, 0.6)
-            
-            # Calculate metrics
-            metrics = {
-                "f1Score": confidence,
-                "confusionMatrix": [[0.99, 0.005, 0.005], [0.005, 0.99, 0.005], [0.005, 0.005, 0.99]],
-                "rocCurve": [{"x": i/10, "y": (i/10)**0.5} for i in range(11)],
-                "classMetrics": [
-                    {"class": name, "precision": prob, "recall": prob} 
-                    for name, prob in class_probs.items()
-                ]
-            }
-            
-            # Format signal data for display (last 50 points)
-            formatted_signals = {}
-            for i, name in enumerate(['i1', 'i2', 'i3', 'v1', 'v2', 'v3', 'vn', 'w_m', 'vibrad']):
-                signal = signals[i]
-                last_50_start = max(0, len(signal) - 50)
-                formatted_signals[name] = format_signal_data(signal, last_50_start, len(signal))
-            
-            return {
-                "prediction": predicted_class,
-                "confidence": confidence,
-                "status": "success",
-                "metrics": metrics,
-                "class_probabilities": class_probs,
-                "signals": {name: signals[i].tolist() for i, name in enumerate(['i1', 'i2', 'i3', 'v1', 'v2', 'v3', 'vn', 'w_m', 'vibrad'])},
-                "formatted_signals": formatted_signals,
-                "validation_patterns": signal_patterns
-            }
-            
-        finally:
-            # Clean up temporary files
-            try:
-                if os.path.exists(temp_mat_path):
-                    os.remove(temp_mat_path)
-            except Exception as e:
-                print(f"Warning: Failed to clean up temporary file: {str(e)}")
+        # Exact training preprocessing
+        signals = normalize_signals(raw_signals)
         
+        print(f"\nPreprocessed signals shape: {signals.shape}")
+
+        # Print signal statistics for debugging
+        print("\nSignal statistics after preprocessing:")
+        for i, name in enumerate(['i1', 'i2', 'i3', 'v1', 'v2', 'v3', 'vn', 'w_m', 'vibrad']):
+            mean = np.mean(signals[i])
+            std = np.std(signals[i])
+            min_val = np.min(signals[i])
+            max_val = np.max(signals[i])
+            print(f"{name}: mean={mean:.2f}, std={std:.2f}, min={min_val:.2f}, max={max_val:.2f}")
+
+        # Validate signal characteristics
+        signal_patterns = validate_signal_characteristics(signals)
+        features = spectral_features(signals)
+
+        # Cascade mode: cheap spectral pre-screen, skip the model for very confident captures
+        skipped_model = False
+        if CASCADE_ENABLED:
+            prescreen_probs = prescreen_batch(signals[np.newaxis, ...])
+            skipped_model = bool(skip_mask(prescreen_probs)[0])
+
+        if skipped_model:
+            model_version = PRESCREEN_VERSION
+            pred = prescreen_probs[0]
+            embedding = None
+            print("\nPre-screen confident, skipping model")
+        else:
+            # Drop expired work before it reaches the model
+            check_deadline(deadline)
+
+            # Make prediction using model.predict on a snapshot of the active version
+            model_version, predictor = registry.current()
+
+            # Full (1, 50001, 9) window for the CNN-LSTM, decimated (1, 1001, 9) for a compact student model
+            sample = prepare_model_input(signals, predictor.input_shape[1])
+            print(f"\nMaking prediction with model version {model_version} on input {sample.shape}...")
+            probs, embeddings = predictor.predict_with_embedding(sample)
+            pred, embedding = probs[0], embeddings[0]
+
+        # Print raw predictions for debugging
+        print("\nRaw model output:", pred)
+
+        # Get prediction and confidence
+        predicted_index = np.argmax(pred)
+        confidence = float(np.max(pred))
+        predicted_class = CLASS_NAMES[predicted_index]
+        if CASCADE_ENABLED:
+            cascade_stats.record(skipped_model, predicted_class)
+
+        # Get all class probabilities
+        class_probs = {CLASS_NAMES[i]: float(pred[i]) for i in range(len(CLASS_NAMES))}
+
+        print("\nPrediction probabilities:")
+        for class_name, prob in class_probs.items():
+            print(f"{class_name}: {prob*100:.2f}%")
+
+        # Validate prediction against signal characteristics (declarative rule table in validation_rules.py)
+        if signal_patterns:
+            outcome = validation_rules.apply(pred[np.newaxis, ...], patterns_to_matrix([signal_patterns]))
+            if outcome["adjusted"][0]:
+                print(f"\nWarning: {validation_rules.reason(predicted_index, outcome['valid'][0])}")
+                predicted_class = CLASS_NAMES[outcome["predicted"][0]]
+                confidence = float(outcome["confidence"][0])
+                class_probs = {name: float(p) for name, p in zip(CLASS_NAMES, outcome["probs"][0])}
+
+        # Evaluation metrics of this model version, from operator-confirmed labels (evaluation.py)
+        metrics = evaluator.metrics(model_version)
+
+        # Format signal data for display (last 50 points)
+        formatted_signals = {}
+        for i, name in enumerate(['i1', 'i2', 'i3', 'v1', 'v2', 'v3', 'vn', 'w_m', 'vibrad']):
+            signal = signals[i]
+            last_50_start = max(0, len(signal) - 50)
+            formatted_signals[name] = format_signal_data(signal, last_50_start, len(signal))
+
+        return {
+            "prediction": predicted_class,
+            "confidence": confidence,
+            "model_version": model_version,
+            "inference_stage": "prescreen" if skipped_model else "model",
+            "status": "success",
+            "metrics": metrics,
+            "class_probabilities": class_probs,
+            "signals": {name: signals[i].tolist() for i, name in enumerate(['i1', 'i2', 'i3', 'v1', 'v2', 'v3', 'vn', 'w_m', 'vibrad'])},
+            "formatted_signals": formatted_signals,
+            "validation_patterns": signal_patterns,
+            "spectral_features": features,
+            # Penultimate-layer activations, used by the similarity index (None when the model was skipped)
+            "embedding": embedding.tolist() if embedding is not None else None
+        }
+
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        print(f"Error in prediction: {str(e)}")
+        return {
+            "status": "error",
+            "error": str(e)
+        }
+
+def predict_batch(raw_batch, deadline=None, model=None):
+    """
+    Predict a batch of raw (N, 9, 50001) captures in one model call
+    Normalisation, spectral patterns and validation rules are array operations over the whole batch
+    `model` pins a (version, predictor) pair from the registry (default: the active one)
+    Returns a list of compact per-capture results
+    """
+    signals = normalize_signals(np.asarray(raw_batch))
+    patterns = compute_patterns_batch(signals)
+
+    check_deadline(deadline)
+    model_version, predictor = model or registry.current()
+    inputs = prepare_model_input(signals, predictor.input_shape[1])
+    outcome = validation_rules.apply(predictor.predict(inputs), patterns)
+
+    return [{
+        "prediction": CLASS_NAMES[outcome["predicted"][i]],
+        "confidence": float(outcome["confidence"][i]),
+        "model_version": model_version,
+        "status": "success",
+        "class_probabilities": {name: float(p) for name, p in zip(CLASS_NAMES, outcome["probs"][i])},
+        "validation_patterns": {name: bool(patterns[i, j]) for j, name in enumerate(PATTERN_NAMES)}
+    } for i in range(len(signals))]
+
+def predict_from_file(file_data, deadline=None, memory=None, on_signals=None, priority=None):
+    """
+    Load a .mat file data and make predictions
+    Returns a dictionary with prediction results and metrics
+    Raises DeadlineExceeded if the deadline (epoch seconds) passes before the model runs
+    Per-stage memory is accounted in `memory` (a RequestMemory) when given
+    `on_signals` is called with the parsed raw signals (e.g. to keep them for ingestion)
+    With a `priority`, an admission slot is taken for the prediction only, after parsing
+    (raises AdmissionError when shed)
+    """
+    memory = memory if memory is not None else RequestMemory()
+    try:
+        with memory.stage('parse', lambda: estimate_parse_bytes(len(file_data), raw_signals)):
+            raw_signals = load_signals(file_data)
+        if on_signals is not None:
+            on_signals(raw_signals)
     except Exception as e:
         print(f"Error in prediction: {str(e)}")
         return {
             "status": "error",
             "error": str(e)
         }
+    slot = admission.admit(priority, deadline) if priority is not None else nullcontext()
+    with slot, memory.stage('predict', lambda: estimate_predict_bytes(raw_signals)):
+        return predict_from_signals(raw_signals, deadline=deadline)
 
 def format_signal_data(signal, start_idx=None, end_idx=None, columns_per_row=13):
     """
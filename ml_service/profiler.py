@@ -0,0 +1,79 @@
+import collections
+import hmac
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# The endpoint only exists when a token is configured; nothing is installed otherwise
+PROFILING_TOKEN = os.environ.get("PROFILING_TOKEN")
+MAX_PROFILE_SECONDS = 60
+DEFAULT_INTERVAL = 0.01  # Seconds between stack samples
+
+class ProfilerBusyError(Exception):
+    """Raised when a profile is already being captured"""
+    pass
+
+_capture_lock = threading.Lock()
+
+def profiling_enabled():
+    return bool(PROFILING_TOKEN)
+
+def check_token(token):
+    """Constant-time comparison against the configured token"""
+    return profiling_enabled() and token is not None and hmac.compare_digest(token, PROFILING_TOKEN)
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)})"
+
+def _collapse(frame, thread_name):
+    """Root-first ';'-joined stack for one thread"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ";".join(reversed(labels))
+
+def sample_stacks(duration, interval=DEFAULT_INTERVAL, exclude=()):
+    """Sample every thread's Python stack for `duration` seconds, returns Counter of collapsed stacks"""
+    stacks = collections.Counter()
+    own_ident = threading.get_ident()
+    excluded = set(exclude) | {own_ident}
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident in excluded:
+                continue
+            stacks[_collapse(frame, names.get(ident, f"thread-{ident}"))] += 1
+        time.sleep(interval)
+    return stacks
+
+def capture_profile(duration, interval=DEFAULT_INTERVAL, tensorflow_trace=False):
+    """Capture a time-bounded profile across live requests.
+
+    Returns (collapsed_text, tensorflow_logdir or None). The collapsed text has
+    one 'frame;frame;frame count' line per distinct stack, as read by
+    flamegraph.pl and speedscope.
+    """
+    duration = min(max(duration, 0.1), MAX_PROFILE_SECONDS)
+    if not _capture_lock.acquire(blocking=False):
+        raise ProfilerBusyError("A profile is already being captured")
+    try:
+        logdir = None
+        if tensorflow_trace:
+            import tensorflow as tf
+            logdir = tempfile.mkdtemp(prefix="tf_trace_")
+            tf.profiler.experimental.start(logdir)
+        try:
+            stacks = sample_stacks(duration, interval, exclude={threading.get_ident()})
+        finally:
+            if tensorflow_trace:
+                tf.profiler.experimental.stop()
+        lines = [f"{stack} {count}" for stack, count in stacks.most_common()]
+        return "\n".join(lines) + "\n", logdir
+    finally:
+        _capture_lock.release()
@@ -0,0 +1,263 @@
+"""Min/max/mean signal pyramids for browsing archived captures at screen resolution.
+
+Two pyramids are kept:
+
+- per capture: level 0 is the raw (9, T) float32 signal, level k holds the
+  min, max and mean of each run of 2**k samples. A view of any time range
+  at a given pixel width reads only the level whose bucket count is just
+  above the width, through a memory map, so it costs O(width).
+- per motor: level 0 has one record per ingested capture (its time span and
+  per-channel min/max/mean), level k summarises 2**k consecutive captures.
+  Levels are append-only files, so long histories are browsed the same way.
+
+Captures are queued by submit() and written by a background thread, so
+callers on the request path never wait for the disk.
+
+Files live under PYRAMID_DIR:
+
+    captures/<prediction_id>/meta.json, level_<k>.npy
+    motors/<motor_id>/level_<k>.bin
+"""
+import json
+import os
+import queue
+import re
+import shutil
+import threading
+import numpy as np
+
+from features import SIGNAL_NAMES, SAMPLE_RATE
+
+PYRAMID_DIR = os.environ.get("PYRAMID_DIR", "pyramids")
+PYRAMID_RETENTION = int(os.environ.get("PYRAMID_RETENTION", "200"))  # Captures whose full pyramid is kept
+PYRAMID_QUEUE_SIZE = int(os.environ.get("PYRAMID_QUEUE_SIZE", "16"))  # Captures (~1.8 MB each) awaiting the writer
+MIN_LEVEL_POINTS = 256  # Coarsest per-capture level has at most this many buckets
+MAX_WIDTH = 10000  # Largest pixel width served
+
+CHANNELS = len(SIGNAL_NAMES)
+MOTOR_RECORD = np.dtype([
+    ('start', '<f8'), ('end', '<f8'), ('count', '<u4'),
+    ('min', '<f4', (CHANNELS,)), ('max', '<f4', (CHANNELS,)), ('mean', '<f4', (CHANNELS,))
+])
+
+def build_levels(signals, min_points=MIN_LEVEL_POINTS):
+    """(C, T) signals -> list of (3, C, n_k) [min, max, mean] arrays for k = 1, 2, ...
+
+    An odd-length level is padded with its last bucket, so the final bucket
+    of the next level may slightly over-weight the last samples.
+    """
+    mins = maxs = means = np.asarray(signals, dtype=np.float32)
+    levels = []
+    while mins.shape[1] > min_points:
+        if mins.shape[1] % 2:
+            mins, maxs, means = (np.concatenate([a, a[:, -1:]], axis=1) for a in (mins, maxs, means))
+        mins = np.minimum(mins[:, 0::2], mins[:, 1::2])
+        maxs = np.maximum(maxs[:, 0::2], maxs[:, 1::2])
+        means = (means[:, 0::2] + means[:, 1::2]) / 2
+        levels.append(np.stack([mins, maxs, means]))
+    return levels
+
+def choose_level(points, width, max_level):
+    """Coarsest level that still gives at least `width` buckets over `points` level-0 points"""
+    if points <= width:
+        return 0
+    return int(min(max_level, np.floor(np.log2(points / width))))
+
+def _safe_name(motor_id):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', str(motor_id))
+
+def _read_records(path):
+    """Memory-map an append-only record file (ignoring a partially written tail record)"""
+    if not os.path.exists(path):
+        return np.zeros(0, dtype=MOTOR_RECORD)
+    count = os.path.getsize(path) // MOTOR_RECORD.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=MOTOR_RECORD)
+    return np.memmap(path, dtype=MOTOR_RECORD, mode='r', shape=(count,))
+
+def _merge(records):
+    """Aggregate consecutive records into one"""
+    merged = np.zeros(1, dtype=MOTOR_RECORD)[0]
+    counts = records['count'].astype(np.float64)
+    merged['start'] = records['start'][0]
+    merged['end'] = records['end'][-1]
+    merged['count'] = counts.sum()
+    merged['min'] = records['min'].min(axis=0)
+    merged['max'] = records['max'].max(axis=0)
+    merged['mean'] = (records['mean'] * counts[:, None]).sum(axis=0) / counts.sum()
+    return merged
+
+class PyramidStore:
+    """Builds pyramids at ingestion and serves range queries at a pixel width"""
+
+    def __init__(self, base_dir=PYRAMID_DIR, retention=PYRAMID_RETENTION, sample_rate=SAMPLE_RATE):
+        self.base_dir = base_dir
+        self.retention = retention
+        self.sample_rate = sample_rate
+        self.lock = threading.Lock()
+        self.queue = queue.Queue(maxsize=PYRAMID_QUEUE_SIZE)
+        self.worker = None
+        self.capture_ids = None  # Stored capture ids, oldest first (listed from disk once)
+        os.makedirs(os.path.join(base_dir, "captures"), exist_ok=True)
+        os.makedirs(os.path.join(base_dir, "motors"), exist_ok=True)
+
+    def submit(self, prediction_id, motor_id, timestamp, raw_signals):
+        """Queue a capture for ingestion on the writer thread; drops it when the writer is behind"""
+        # Copy now: the caller's buffer may be reused (e.g. a shared-memory ring slot)
+        signals = np.array(raw_signals, dtype=np.float32)
+        with self.lock:
+            if self.worker is None:
+                self.worker = threading.Thread(target=self._drain, name="pyramid-writer", daemon=True)
+                self.worker.start()
+        try:
+            self.queue.put_nowait((prediction_id, motor_id, timestamp, signals))
+        except queue.Full:
+            print(f"Warning: Pyramid writer is behind, not storing capture {prediction_id}")
+
+    def _drain(self):
+        while True:
+            item = self.queue.get()
+            try:
+                self.ingest(*item)
+            except Exception as e:
+                print(f"Warning: Failed to store signal pyramid for prediction {item[0]}: {str(e)}")
+            finally:
+                self.queue.task_done()
+
+    def _capture_dir(self, prediction_id):
+        return os.path.join(self.base_dir, "captures", str(prediction_id))
+
+    def _motor_level_path(self, motor_id, level):
+        return os.path.join(self.base_dir, "motors", _safe_name(motor_id), f"level_{level}.bin")
+
+    def ingest(self, prediction_id, motor_id, timestamp, raw_signals):
+        """Store the pyramid of one capture and append it to its motor's pyramid"""
+        signals = np.asarray(raw_signals, dtype=np.float32)
+        levels = build_levels(signals)
+
+        capture_dir = self._capture_dir(prediction_id)
+        temp_dir = capture_dir + ".tmp"
+        os.makedirs(temp_dir, exist_ok=True)
+        np.save(os.path.join(temp_dir, "level_0.npy"), signals)
+        for k, level in enumerate(levels, start=1):
+            np.save(os.path.join(temp_dir, f"level_{k}.npy"), level)
+        with open(os.path.join(temp_dir, "meta.json"), "w") as f:
+            json.dump({"prediction_id": prediction_id, "motor_id": motor_id, "timestamp": timestamp,
+                       "sample_rate": self.sample_rate, "samples": signals.shape[1],
+                       "channels": SIGNAL_NAMES, "levels": len(levels) + 1}, f)
+        if os.path.exists(capture_dir):
+            shutil.rmtree(capture_dir)
+        os.replace(temp_dir, capture_dir)
+
+        record = np.zeros(1, dtype=MOTOR_RECORD)
+        record['start'] = timestamp
+        record['end'] = timestamp + signals.shape[1] / self.sample_rate
+        record['count'] = 1
+        record['min'] = signals.min(axis=1)
+        record['max'] = signals.max(axis=1)
+        record['mean'] = signals.mean(axis=1)
+        with self.lock:
+            self._append_motor(motor_id, record)
+            self._prune_captures(prediction_id)
+
+    def _append_motor(self, motor_id, record):
+        """Append a level-0 record, then let every level catch up with the one below"""
+        path = self._motor_level_path(motor_id, 0)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "ab") as f:
+            f.write(record.tobytes())
+        level = 1
+        below = _read_records(path)
+        while len(below) >= 2:
+            path = self._motor_level_path(motor_id, level)
+            current = _read_records(path)
+            missing = [_merge(below[2 * i:2 * i + 2]) for i in range(len(current), len(below) // 2)]
+            if missing:
+                with open(path, "ab") as f:
+                    f.write(np.array(missing, dtype=MOTOR_RECORD).tobytes())
+            below = _read_records(path)
+            level += 1
+
+    def _prune_captures(self, prediction_id):
+        """Remember a stored capture and delete the oldest beyond the retention (lock held)"""
+        if self.capture_ids is None:
+            captures_dir = os.path.join(self.base_dir, "captures")
+            self.capture_ids = sorted(int(name) for name in os.listdir(captures_dir) if name.isdigit())
+        elif prediction_id not in self.capture_ids[-1:]:
+            self.capture_ids.append(prediction_id)
+        while self.retention and len(self.capture_ids) > self.retention:
+            shutil.rmtree(self._capture_dir(self.capture_ids.pop(0)), ignore_errors=True)
+
+    def capture_range(self, prediction_id, start=None, end=None, width=1000, channels=None):
+        """Min/max/mean buckets of a capture between start and end (seconds from capture start)"""
+        capture_dir = self._capture_dir(prediction_id)
+        try:
+            with open(os.path.join(capture_dir, "meta.json")) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            raise KeyError(f"No pyramid stored for prediction {prediction_id}")
+        width = int(min(max(width, 1), MAX_WIDTH))
+        rate = meta["sample_rate"]
+        first = int(max(0, (start or 0) * rate))
+        last = int(min(meta["samples"], (end if end is not None else meta["samples"] / rate) * rate))
+        if last <= first:
+            raise ValueError("Empty range")
+        channel_names = channels or meta["channels"]
+        rows = [meta["channels"].index(name) for name in channel_names]
+
+        level = choose_level(last - first, width, meta["levels"] - 1)
+        data = np.load(os.path.join(capture_dir, f"level_{level}.npy"), mmap_mode='r')
+        bucket = 2 ** level
+        lo, hi = first // bucket, -(-last // bucket)
+        if level == 0:
+            view = np.asarray(data[rows, lo:hi])
+            mins = maxs = means = view
+        else:
+            view = np.asarray(data[:, rows, lo:hi])
+            mins, maxs, means = view
+        return {
+            "prediction_id": prediction_id,
+            "timestamp": meta["timestamp"],
+            "level": level,
+            "bucket_samples": bucket,
+            "sample_rate": rate,
+            "t": ((np.arange(lo, hi) * bucket) / rate).tolist(),
+            "channels": {name: {"min": mins[i].tolist(), "max": maxs[i].tolist(), "mean": means[i].tolist()}
+                         for i, name in enumerate(channel_names)}
+        }
+
+    def motor_range(self, motor_id, start=None, end=None, width=1000, channels=None):
+        """Per-bucket min/max/mean over a motor's captures between start and end (epoch seconds)"""
+        width = int(min(max(width, 1), MAX_WIDTH))
+        base = _read_records(self._motor_level_path(motor_id, 0))
+        if len(base) == 0:
+            raise KeyError(f"No pyramid stored for motor {motor_id}")
+        start = start if start is not None else float(base['start'][0])
+        end = end if end is not None else float(base['end'][-1])
+        captures = int(np.searchsorted(base['start'], end) - np.searchsorted(base['end'], start))
+
+        max_level = 0
+        while os.path.exists(self._motor_level_path(motor_id, max_level + 1)):
+            max_level += 1
+        level = choose_level(max(captures, 0), width, max_level)
+        records = _read_records(self._motor_level_path(motor_id, level)) if level else base
+        lo = int(np.searchsorted(records['end'], start))
+        hi = int(np.searchsorted(records['start'], end))
+        view = np.array(records[lo:hi])
+
+        channel_names = channels or SIGNAL_NAMES
+        rows = [SIGNAL_NAMES.index(name) for name in channel_names]
+        return {
+            "motor_id": motor_id,
+            "level": level,
+            "captures_per_point": 2 ** level,
+            "t_start": view['start'].tolist(),
+            "t_end": view['end'].tolist(),
+            "count": view['count'].tolist(),
+            "channels": {name: {"min": view['min'][:, row].tolist(), "max": view['max'][:, row].tolist(),
+                                "mean": view['mean'][:, row].tolist()}
+                         for name, row in zip(channel_names, rows)}
+        }
+
+# Shared store; app.py submits captures as predictions are recorded
+pyramid_store = PyramidStore()
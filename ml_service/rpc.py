@@ -0,0 +1,344 @@
+"""Unix domain socket RPC for co-located callers (the Node server, load tools).
+
+Every frame, in both directions, is a fixed header followed by a JSON
+metadata block and a raw binary payload:
+
+    magic   4s  b"MLR1"
+    op      B   1 predict, 2 generate, 3 status
+    status  B   0 ok, 1 error (responses only)
+    id      I   request id chosen by the caller, echoed in the response
+    meta    I   length of the UTF-8 JSON metadata
+    payload Q   length of the binary payload
+
+all big-endian. Signals travel as little-endian float32, channels first
+((9, T) in SIGNAL_NAMES order), with their shape in the metadata, so no .mat
+or JSON encoding of the samples is involved. A connection may send many
+requests without waiting; responses come back as each finishes, matched by
+id, possibly out of order.
+
+Benchmark against the HTTP path of a running service:
+
+    python rpc.py bench --socket ml_service_5600.sock --http http://localhost:5600 -n 50
+"""
+import argparse
+import io
+import json
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from multipart import encode_multipart
+
+# One socket per instance (keyed by its HTTP port) so co-located instances don't collide; empty disables the listener
+RPC_SOCKET_PATH = os.environ.get("RPC_SOCKET_PATH", f"ml_service_{os.environ.get('PORT', '5600')}.sock")
+RPC_WORKERS = int(os.environ.get("RPC_WORKERS", "4"))  # Requests handled concurrently across connections
+RPC_MAX_PENDING = int(os.environ.get("RPC_MAX_PENDING", "64"))  # Queued + running requests before rejecting new ones
+RPC_RETRY_AFTER = 1  # Seconds suggested to callers rejected by a full queue
+MAX_PAYLOAD_BYTES = 64 * 1024 * 1024
+
+MAGIC = b"MLR1"
+HEADER = struct.Struct("!4sBBIIQ")
+OP_PREDICT, OP_GENERATE, OP_STATUS = 1, 2, 3
+OP_NAMES = {OP_PREDICT: "predict", OP_GENERATE: "generate", OP_STATUS: "status"}
+STATUS_OK, STATUS_ERROR = 0, 1
+SIGNAL_DTYPE = np.dtype("<f4")
+
+class ProtocolError(Exception):
+    """Raised on a malformed frame; the connection is closed"""
+    pass
+
+def encode_frame(op, request_id, meta=None, payload=b"", status=STATUS_OK):
+    meta_bytes = json.dumps(meta or {}).encode()
+    return HEADER.pack(MAGIC, op, status, request_id, len(meta_bytes), len(payload)) + meta_bytes + payload
+
+def _recv_exact(sock, n):
+    buffer = bytearray(n)
+    view = memoryview(buffer)
+    received = 0
+    while received < n:
+        count = sock.recv_into(view[received:], n - received)
+        if count == 0:
+            raise EOFError("Connection closed")
+        received += count
+    return bytes(buffer)
+
+def read_frame(sock):
+    """Read one frame, returns (op, status, request_id, meta, payload)"""
+    magic, op, status, request_id, meta_length, payload_length = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    if magic != MAGIC:
+        raise ProtocolError("Bad magic")
+    if meta_length + payload_length > MAX_PAYLOAD_BYTES:
+        raise ProtocolError(f"Frame of {meta_length + payload_length} bytes exceeds {MAX_PAYLOAD_BYTES}")
+    meta = json.loads(_recv_exact(sock, meta_length)) if meta_length else {}
+    payload = _recv_exact(sock, payload_length) if payload_length else b""
+    return op, status, request_id, meta, payload
+
+def signals_to_payload(signals):
+    """(9, T) array -> (metadata, float32 bytes)"""
+    signals = np.ascontiguousarray(signals, dtype=SIGNAL_DTYPE)
+    return {"shape": list(signals.shape), "dtype": "float32"}, signals.tobytes()
+
+def payload_to_signals(meta, payload):
+    shape = tuple(meta.get("shape", ()))
+    if len(shape) != 2 or shape[0] * shape[1] * SIGNAL_DTYPE.itemsize != len(payload):
+        raise ValueError(f"Payload of {len(payload)} bytes does not match shape {shape}")
+    return np.frombuffer(payload, dtype=SIGNAL_DTYPE).reshape(shape)
+
+class RPCServer:
+    """Accepts connections on a Unix socket and dispatches frames to handlers.
+
+    handlers maps op -> callable(meta, payload) returning (meta, payload).
+    Each connection has a reader thread; requests run on a shared pool so a
+    pipelined connection keeps several in flight.
+    """
+
+    def __init__(self, socket_path, handlers, workers=RPC_WORKERS, max_pending=RPC_MAX_PENDING):
+        self.socket_path = socket_path
+        self.handlers = handlers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rpc")
+        self.sock = None
+        self.lock = threading.Lock()
+        self.requests = {OP_NAMES[op]: 0 for op in handlers}
+        self.errors = 0
+        self.connections = 0
+
+    def start(self):
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                os.remove(self.socket_path)  # Stale socket from a previous run
+            else:
+                raise RuntimeError(f"Another instance is serving {self.socket_path}; set RPC_SOCKET_PATH")
+            finally:
+                probe.close()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(self.socket_path)
+        self.sock.listen(64)
+        threading.Thread(target=self._accept_loop, name="rpc-accept", daemon=True).start()
+        print(f"RPC listening on {self.socket_path}")
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return  # Socket closed
+            with self.lock:
+                self.connections += 1
+            threading.Thread(target=self._serve, args=(conn,), name="rpc-conn", daemon=True).start()
+
+    def _serve(self, conn):
+        write_lock = threading.Lock()
+        try:
+            while True:
+                op, _, request_id, meta, payload = read_frame(conn)
+                with self.lock:
+                    accepted = self.pending < self.max_pending
+                    if accepted:
+                        self.pending += 1
+                    else:
+                        self.rejected += 1
+                if accepted:
+                    self.pool.submit(self._dispatch, conn, write_lock, op, request_id, meta, payload)
+                else:
+                    error = {"error": f"RPC queue is full ({self.max_pending} pending requests)",
+                             "type": "QueueFull", "retry_after": RPC_RETRY_AFTER}
+                    with write_lock:
+                        conn.sendall(encode_frame(op, request_id, error, status=STATUS_ERROR))
+        except EOFError:
+            pass
+        except (ProtocolError, OSError, ValueError) as e:
+            print(f"RPC connection closed: {str(e)}")
+        finally:
+            with self.lock:
+                self.connections -= 1
+            conn.close()  # Responses still in flight fail to send and are dropped by _dispatch
+
+    def _dispatch(self, conn, write_lock, op, request_id, meta, payload):
+        handler = self.handlers.get(op)
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown op {op}")
+            response_meta, response_payload = handler(meta, payload)
+            frame = encode_frame(op, request_id, response_meta, response_payload)
+            with self.lock:
+                self.requests[OP_NAMES[op]] += 1
+        except Exception as e:
+            error = {"error": str(e), "type": type(e).__name__}
+            if getattr(e, "retry_after", None) is not None:
+                error["retry_after"] = e.retry_after  # Shed by admission control / memory budget
+            frame = encode_frame(op, request_id, error, status=STATUS_ERROR)
+            with self.lock:
+                self.errors += 1
+        with self.lock:
+            self.pending -= 1
+        try:
+            with write_lock:
+                conn.sendall(frame)
+        except OSError:
+            pass
+
+    def stats(self):
+        with self.lock:
+            return {"socket": self.socket_path, "connections": self.connections,
+                    "requests": dict(self.requests), "errors": self.errors,
+                    "pending": self.pending, "max_pending": self.max_pending, "rejected": self.rejected}
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+        self.pool.shutdown(wait=False)
+
+class RPCError(Exception):
+    """Error status returned by the server"""
+    pass
+
+class RPCClient:
+    """Blocking client; pipeline() sends a batch of requests before reading any response"""
+
+    def __init__(self, socket_path=RPC_SOCKET_PATH):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(socket_path)
+        self.next_id = 0
+
+    def pipeline(self, calls):
+        """calls: list of (op, meta, payload); returns [(meta, payload)] in call order"""
+        ids = []
+        frames = []
+        for op, meta, payload in calls:
+            self.next_id = (self.next_id + 1) % 2 ** 32
+            ids.append(self.next_id)
+            frames.append(encode_frame(op, self.next_id, meta, payload))
+        self.sock.sendall(b"".join(frames))
+
+        responses = {}
+        while len(responses) < len(ids):
+            _, status, request_id, meta, payload = read_frame(self.sock)
+            responses[request_id] = (status, meta, payload)
+        results = []
+        for request_id in ids:
+            status, meta, payload = responses[request_id]
+            if status != STATUS_OK:
+                raise RPCError(meta.get("error", "RPC request failed"))
+            results.append((meta, payload))
+        return results
+
+    def call(self, op, meta=None, payload=b""):
+        return self.pipeline([(op, meta, payload)])[0]
+
+    def predict(self, signals, **meta):
+        signal_meta, payload = signals_to_payload(signals)
+        return self.call(OP_PREDICT, dict(meta, **signal_meta), payload)[0]
+
+    def generate(self, fault_type=None):
+        meta, payload = self.call(OP_GENERATE, {"fault_type": fault_type})
+        return meta, payload_to_signals(meta, payload)
+
+    def status(self):
+        return self.call(OP_STATUS)[0]
+
+    def close(self):
+        self.sock.close()
+
+def _percentiles(samples):
+    samples = np.array(samples) * 1000
+    return {"p50_ms": float(np.percentile(samples, 50)), "p95_ms": float(np.percentile(samples, 95)),
+            "mean_ms": float(samples.mean())}
+
+def benchmark(socket_path, http_url, n=50, pipeline_depth=8):
+    """Round-trip latency of predict/status over the Unix socket and over HTTP"""
+    from generate_signal_mat import create_mat_file
+    from utils import convert_mat_to_npz
+
+    with tempfile.TemporaryDirectory() as tmp:
+        mat_path = os.path.join(tmp, "bench.mat")
+        create_mat_file(mat_path)
+        with open(mat_path, "rb") as f:
+            mat_bytes = f.read()
+    signals = convert_mat_to_npz(io.BytesIO(mat_bytes), normalize=False)
+    body, content_type = encode_multipart(mat_bytes, "bench.mat")
+
+    client = RPCClient(socket_path)
+    report = {}
+
+    timings = []
+    for _ in range(n):
+        started = time.perf_counter()
+        client.status()
+        timings.append(time.perf_counter() - started)
+    report["rpc_status"] = _percentiles(timings)
+
+    timings = []
+    for _ in range(n):
+        started = time.perf_counter()
+        client.predict(signals)
+        timings.append(time.perf_counter() - started)
+    report["rpc_predict"] = _percentiles(timings)
+
+    signal_meta, payload = signals_to_payload(signals)
+    started = time.perf_counter()
+    for _ in range(0, n, pipeline_depth):
+        client.pipeline([(OP_PREDICT, signal_meta, payload)] * pipeline_depth)
+    elapsed = time.perf_counter() - started
+    report["rpc_predict_pipelined"] = {"depth": pipeline_depth,
+                                       "throughput_per_s": (n // pipeline_depth * pipeline_depth) / elapsed}
+    client.close()
+
+    timings = []
+    for _ in range(n):
+        started = time.perf_counter()
+        with urllib.request.urlopen(http_url.rstrip("/") + "/admission-stats") as response:
+            response.read()
+        timings.append(time.perf_counter() - started)
+    report["http_status"] = _percentiles(timings)
+
+    timings = []
+    for _ in range(n):
+        request = urllib.request.Request(http_url.rstrip("/") + "/predict", data=body,
+                                         headers={"Content-Type": content_type}, method="POST")
+        started = time.perf_counter()
+        with urllib.request.urlopen(request) as response:
+            response.read()
+        timings.append(time.perf_counter() - started)
+    report["http_predict"] = _percentiles(timings)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="ML service Unix socket RPC tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    bench = subparsers.add_parser("bench", help="Compare round-trip latency with the HTTP path")
+    bench.add_argument("--socket", default=RPC_SOCKET_PATH)
+    bench.add_argument("--http", default="http://localhost:5600")
+    bench.add_argument("-n", type=int, default=50)
+    bench.add_argument("--pipeline-depth", type=int, default=8)
+    status = subparsers.add_parser("status", help="Print the service status over RPC")
+    status.add_argument("--socket", default=RPC_SOCKET_PATH)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        report = benchmark(args.socket, args.http, args.n, args.pipeline_depth)
+        print("\n=== RPC vs HTTP ===")
+        for name, values in report.items():
+            print(f"{name}: " + ", ".join(f"{key}={value:.2f}" for key, value in values.items()))
+    else:
+        client = RPCClient(args.socket)
+        print(json.dumps(client.status(), indent=2))
+        client.close()
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,8 @@ import os
 from scipy.io.matlab.mio5_params import mat_struct
 import scipy.io as sio
 
+COMPRESS_CAPTURES = os.environ.get("COMPRESS_CAPTURES", "0") == "1"
+
 def generate_base_signal(size=50001, frequency=50):
     """Generate a base signal with given frequency"""
     t = np.linspace(0, 1, size)
@@ -120,8 +122,8 @@ def main():
         print("First signal name:", Y[0, 0]['Name'])
         print("First signal data shape:", Y[0, 0]['Data'].shape)
         
-        # Save with v7 format for compatibility
-        savemat(output_path, mat_data, format='7')
+        # Save in MATLAB v5 format (readable by MATLAB v7+), zlib-compressed when COMPRESS_CAPTURES=1
+        savemat(output_path, mat_data, format='5', do_compression=COMPRESS_CAPTURES)
         print("SUCCESS: Generated signals in dSPACE format")
         
         # Debug: Read back and verify
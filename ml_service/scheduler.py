@@ -0,0 +1,127 @@
+import collections
+import os
+import threading
+import time
+
+# Scheduling configuration
+MIN_INTERVAL = float(os.environ.get("SCHEDULE_MIN_INTERVAL", "2"))  # Seconds between scores of a suspect motor
+MAX_INTERVAL = float(os.environ.get("SCHEDULE_MAX_INTERVAL", "60"))  # Longest back-off for a stable healthy motor
+BACKOFF_FACTOR = 2.0  # Interval growth per consecutive confident 'sain' verdict
+LOW_CONFIDENCE = 0.7  # Verdicts below this keep the motor on the short interval
+FAULT_STATES = ('cassure', 'desiquilibre')
+INFERENCE_CAPACITY = float(os.environ.get("INFERENCE_CAPACITY", "4"))  # Model runs per second across all motors
+URGENT_RESERVE = 0.25  # Share of the capacity burst only suspect motors may use
+RATE_WINDOW = 60.0  # Seconds over which the inference rate is reported
+MAX_DECISIONS_KEPT = 200
+
+class MonitoringScheduler:
+    """Decides when each motor is scored next, under a global inference budget.
+
+    Motors with a fault verdict or a low-confidence score stay on the short
+    interval; confident healthy motors back off geometrically towards the
+    maximum. Model runs draw from a token bucket refilled at the capacity
+    rate, with part of the burst held back for suspect motors so a large
+    healthy fleet cannot starve them.
+    """
+
+    def __init__(self, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL, capacity=INFERENCE_CAPACITY):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.capacity = capacity
+        self.burst = max(1.0, capacity)
+        self.tokens = self.burst
+        self.refilled_at = time.time()
+        self.lock = threading.Lock()
+        self.motors = {}
+        self.decisions = collections.Counter()
+        self.recent = collections.deque(maxlen=MAX_DECISIONS_KEPT)
+        self.inferences = collections.deque()  # Timestamps of model runs within RATE_WINDOW
+
+    def _motor(self, motor_id):
+        return self.motors.setdefault(motor_id, {
+            "interval": self.min_interval, "next_due": 0.0, "last_state": None,
+            "last_confidence": None, "last_scored": None, "urgent": True
+        })
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.capacity)
+        self.refilled_at = now
+
+    def _decide(self, motor_id, score, reason, now):
+        motor = self.motors[motor_id]
+        decision = {"motor_id": motor_id, "score": score, "reason": reason, "timestamp": now,
+                    "interval": motor["interval"], "next_due_in": max(0.0, motor["next_due"] - now)}
+        self.decisions[reason] += 1
+        self.recent.append(decision)
+        return decision
+
+    def decide(self, motor_id, now=None):
+        """Whether to score a motor now; a positive decision takes one unit of inference capacity"""
+        now = now if now is not None else time.time()
+        with self.lock:
+            motor = self._motor(motor_id)
+            if now < motor["next_due"]:
+                return self._decide(motor_id, False, "not_due", now)
+            self._refill(now)
+            needed = 1.0 if motor["urgent"] else 1.0 + URGENT_RESERVE * self.burst
+            if self.tokens < needed:
+                # Retry once the bucket has refilled enough for this motor
+                motor["next_due"] = now + (needed - self.tokens) / self.capacity
+                return self._decide(motor_id, False, "over_capacity", now)
+            self.tokens -= 1.0
+            return self._decide(motor_id, True, "urgent" if motor["urgent"] else "due", now)
+
+    def refund(self, motor_id):
+        """Give back the capacity of a positive decision that did not run the model (e.g. change detector reuse)"""
+        with self.lock:
+            self.tokens = min(self.burst, self.tokens + 1.0)
+
+    def observe(self, motor_id, state, confidence, inferred=True, now=None):
+        """Schedule the next score of a motor from its latest verdict"""
+        now = now if now is not None else time.time()
+        with self.lock:
+            motor = self._motor(motor_id)
+            suspect = state in FAULT_STATES or confidence < LOW_CONFIDENCE
+            if suspect or state != motor["last_state"]:
+                motor["interval"] = self.min_interval
+            else:
+                motor["interval"] = min(self.max_interval, motor["interval"] * BACKOFF_FACTOR)
+            motor.update(next_due=now + motor["interval"], last_state=state, last_confidence=confidence,
+                         last_scored=now, urgent=suspect)
+            if inferred:
+                self.inferences.append(now)
+
+    def report_motor(self, motor_id):
+        now = time.time()
+        with self.lock:
+            motor = self._motor(motor_id)
+            return dict(motor, next_due_in=max(0.0, motor["next_due"] - now))
+
+    def inference_rate(self, now=None):
+        now = now if now is not None else time.time()
+        with self.lock:
+            while self.inferences and self.inferences[0] < now - RATE_WINDOW:
+                self.inferences.popleft()
+            return len(self.inferences) / RATE_WINDOW
+
+    def report(self):
+        now = time.time()
+        rate = self.inference_rate(now)
+        with self.lock:
+            self._refill(now)
+            return {
+                "min_interval": self.min_interval,
+                "max_interval": self.max_interval,
+                "capacity_per_s": self.capacity,
+                "available_tokens": self.tokens,
+                "inference_rate_per_s": rate,
+                "decisions": dict(self.decisions),
+                "motors": {
+                    motor_id: dict(motor, next_due_in=max(0.0, motor["next_due"] - now))
+                    for motor_id, motor in self.motors.items()
+                },
+                "recent_decisions": list(self.recent)[-50:]
+            }
+
+# Shared scheduler for the monitoring endpoints
+scheduler = MonitoringScheduler()
@@ -0,0 +1,254 @@
+"""Shared-memory capture ring between SignalGenerator and the monitoring service.
+
+The generator writes each capture as a frame of 9 float64 channels into the
+next slot of a named shared-memory segment; the service maps the same segment
+and reads the newest frame in place, with no file, no savemat/loadmat and no
+copy. Slots are guarded by a sequence number written before and after the
+data (a seqlock), so a reader can tell when the writer lapped it.
+
+Measure the transport cost of the ring against the .mat file path:
+
+    python shm_ring.py bench [-n 20]
+"""
+import argparse
+import collections
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+from multiprocessing import shared_memory
+
+from features import SIGNAL_NAMES, SAMPLE_RATE
+from utils import CLASS_NAMES
+
+# Ring configuration
+SHM_NAME = os.environ.get("SHM_RING_NAME", "motor_capture_ring")
+SHM_SLOTS = int(os.environ.get("SHM_RING_SLOTS", "8"))  # Frames kept before the writer wraps around
+STALE_AFTER = 10.0  # Seconds without a new frame before the reader re-attaches (generator restarted)
+
+RING_MAGIC = 0x4D52494E47  # "MRING"
+HEADER_FIELDS = 8  # uint64: magic, slots, channels, samples, latest sequence, writer pid, reserved x2
+SLOT_HEADER_FIELDS = 4  # float64: sequence (begin), timestamp, fault code, reserved
+FAULT_CODES = ['sain'] + [name for name in CLASS_NAMES if name != 'sain']
+
+def _ring_size(slots, channels, samples):
+    return 8 * HEADER_FIELDS + slots * 8 * (SLOT_HEADER_FIELDS + channels * samples + 1)
+
+def _open_existing(name):
+    """Attach without registering with the resource tracker, which would unlink the writer's segment on exit"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+class _RingLayout:
+    """numpy views over a ring segment"""
+
+    def __init__(self, buffer, slots, channels, samples):
+        self.header = np.ndarray((HEADER_FIELDS,), dtype=np.uint64, buffer=buffer)
+        slot_fields = SLOT_HEADER_FIELDS + channels * samples + 1  # trailing float64: sequence (end)
+        body = np.ndarray((slots, slot_fields), dtype=np.float64, buffer=buffer, offset=8 * HEADER_FIELDS)
+        self.slot_headers = body[:, :SLOT_HEADER_FIELDS]
+        self.data = body[:, SLOT_HEADER_FIELDS:-1].reshape(slots, channels, samples)
+        self.sequence_end = body[:, -1]
+        self.slots = slots
+
+class ShmRingWriter:
+    """Generator side: owns the segment and publishes frames"""
+
+    def __init__(self, name=SHM_NAME, slots=SHM_SLOTS, channels=len(SIGNAL_NAMES), samples=SAMPLE_RATE):
+        try:
+            stale = _open_existing(name)  # Left behind by a generator that crashed
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=_ring_size(slots, channels, samples))
+        self.layout = _RingLayout(self.shm.buf, slots, channels, samples)
+        self.layout.header[:] = 0
+        self.layout.header[:5] = [RING_MAGIC, slots, channels, samples, 0]
+        self.layout.header[5] = os.getpid()
+        self.sequence = 0
+
+    def write(self, signals, timestamp=None, fault_type=None):
+        """Copy a (channels, samples) capture into the next slot; returns its sequence number"""
+        sequence = self.sequence + 1
+        slot = sequence % self.layout.slots
+        # Seqlock: invalidate the end marker, write, then publish matching begin/end markers
+        self.layout.sequence_end[slot] = -1
+        self.layout.slot_headers[slot, 0] = sequence
+        self.layout.data[slot] = signals
+        self.layout.slot_headers[slot, 1] = timestamp if timestamp is not None else time.time()
+        self.layout.slot_headers[slot, 2] = FAULT_CODES.index(fault_type or 'sain')
+        self.layout.sequence_end[slot] = sequence
+        self.layout.header[4] = sequence
+        self.sequence = sequence
+        return sequence
+
+    def close(self):
+        del self.layout
+        self.shm.close()
+        self.shm.unlink()
+
+class Frame:
+    """Newest capture, viewed in place in the ring"""
+
+    def __init__(self, layout, slot, sequence):
+        self.layout = layout
+        self.slot = slot
+        self.sequence = sequence
+        self.timestamp = float(layout.slot_headers[slot, 1])
+        self.fault_type = FAULT_CODES[int(layout.slot_headers[slot, 2])]
+        self.signals = layout.data[slot]  # (channels, samples) float64 view, not a copy
+        self.signals.flags.writeable = False
+
+    def still_valid(self):
+        """False once the writer has started overwriting this slot"""
+        return (self.layout.slot_headers[self.slot, 0] == self.sequence
+                and self.layout.sequence_end[self.slot] == self.sequence)
+
+class ShmRingReader:
+    """Service side: attaches lazily and re-attaches when the generator restarts"""
+
+    def __init__(self, name=SHM_NAME):
+        self.name = name
+        self.lock = threading.Lock()
+        self.shm = None
+        self.layout = None
+        self.last_sequence = None
+        self.last_advance = 0.0
+
+    def _attach(self):
+        self._detach()
+        try:
+            shm = _open_existing(self.name)
+        except FileNotFoundError:
+            return False
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.uint64, buffer=shm.buf)
+        if int(header[0]) != RING_MAGIC:
+            del header
+            shm.close()
+            return False
+        slots, channels, samples = (int(value) for value in header[1:4])
+        if int(header[5]) == os.getpid():
+            # Writer in this process (benchmark, tests): attaching may have dropped its tracker registration
+            from multiprocessing import resource_tracker
+            resource_tracker.register(shm._name, "shared_memory")
+        del header
+        self.shm = shm
+        self.layout = _RingLayout(shm.buf, slots, channels, samples)
+        self.last_sequence = None
+        self.last_advance = time.time()
+        return True
+
+    def _detach(self):
+        if self.shm is not None:
+            self.layout = None
+            try:
+                self.shm.close()
+            except BufferError:
+                pass  # A frame view is still referenced; the mapping is released with it
+            self.shm = None
+
+    def latest(self):
+        """Newest complete frame, or None when no ring is being written"""
+        with self.lock:
+            if self.layout is None or time.time() - self.last_advance > STALE_AFTER:
+                if not self._attach():
+                    return None
+            sequence = int(self.layout.header[4])
+            if sequence == 0:
+                return None
+            if sequence != self.last_sequence:
+                self.last_sequence = sequence
+                self.last_advance = time.time()
+            slot = sequence % self.layout.slots
+            frame = Frame(self.layout, slot, sequence)
+            return frame if frame.still_valid() else None
+
+class TransportLatency:
+    """Capture-to-prediction latency per transport over a sliding window"""
+
+    def __init__(self, window=500):
+        self.lock = threading.Lock()
+        self.samples = collections.defaultdict(lambda: collections.deque(maxlen=window))
+
+    def record(self, transport, seconds):
+        with self.lock:
+            self.samples[transport].append(seconds)
+
+    def to_dict(self):
+        with self.lock:
+            report = {}
+            for transport, samples in self.samples.items():
+                values = np.array(samples) * 1000
+                report[transport] = {
+                    "count": len(values),
+                    "mean_ms": float(values.mean()),
+                    "p50_ms": float(np.percentile(values, 50)),
+                    "p95_ms": float(np.percentile(values, 95))
+                }
+            return report
+
+transport_latency = TransportLatency()
+
+def benchmark(n=20):
+    """Publish-to-readable latency of the ring and of the .mat file path (no model)"""
+    from machine import SignalGenerator, read_latest_capture
+    from compression import read_capture
+    from utils import convert_mat_to_npz
+    import io
+
+    name = f"{SHM_NAME}_bench_{os.getpid()}"
+    writer = ShmRingWriter(name)
+    reader = ShmRingReader(name)
+    report = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            generator = SignalGenerator(shm=False, archive=True)
+            generator.output_dir = tmp
+            signals = generator.generate_signals()
+            stacked = np.stack([signals[channel] for channel in SIGNAL_NAMES])
+
+            timings = []
+            for _ in range(n):
+                started = time.perf_counter()
+                writer.write(stacked)
+                frame = reader.latest()
+                float(frame.signals[0, 0])
+                timings.append(time.perf_counter() - started)
+            report["shm"] = timings
+
+            timings = []
+            for _ in range(n):
+                started = time.perf_counter()
+                generator.save_signals(signals)
+                latest = read_latest_capture(tmp)
+                convert_mat_to_npz(io.BytesIO(read_capture(latest["path"])), normalize=False)
+                timings.append(time.perf_counter() - started)
+            report["mat_file"] = timings
+    finally:
+        reader._detach()
+        writer.close()
+
+    return {transport: {"mean_ms": 1000 * float(np.mean(values)), "p95_ms": 1000 * float(np.percentile(values, 95))}
+            for transport, values in report.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared-memory capture ring tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    bench = subparsers.add_parser("bench", help="Compare ring and .mat transport latency")
+    bench.add_argument("-n", type=int, default=20)
+    args = parser.parse_args()
+
+    report = benchmark(args.n)
+    print("\n=== Capture transport (publish to readable signals) ===")
+    for transport, values in report.items():
+        print(f"{transport}: mean {values['mean_ms']:.2f} ms, p95 {values['p95_ms']:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Nearest-neighbour search over past captures.
+
+Each stored prediction gets a compact vector: its spectral band energies
+plus the model's penultimate-layer embedding, both L2-normalised so neither
+part dominates. Vectors live in one index per model version (embeddings of
+different versions are not comparable), fed as predictions are recorded.
+Small indexes are searched exactly with one matrix product; past
+APPROX_THRESHOLD vectors an inverted-file (IVF) index is trained with
+k-means on a background thread and only the closest clusters are scanned;
+searches stay exact until the first training finishes.
+"""
+import threading
+import numpy as np
+
+from features import FEATURE_BANDS, FEATURE_CHANNELS
+
+FEATURE_KEYS = [f"{channel}_{band}" for channel in FEATURE_CHANNELS for band in FEATURE_BANDS]
+SPECTRAL_WEIGHT = 0.5  # Share of the similarity carried by the spectral part (rest: embedding)
+APPROX_THRESHOLD = 5000  # Vectors before the approximate index is used
+IVF_LISTS = 64  # k-means clusters of the approximate index
+IVF_PROBES = 8  # Clusters scanned per query
+IVF_RETRAIN_GROWTH = 4  # Retrain once the index has grown this many times since the last training
+KMEANS_ITERATIONS = 15
+INITIAL_CAPACITY = 1024
+
+def _normalise(vector):
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+def feature_vector(spectral_features, embedding=None):
+    """Unit-length float32 vector of a capture; the embedding part is omitted when the model was skipped"""
+    spectral = _normalise(np.array([spectral_features.get(key, 0.0) for key in FEATURE_KEYS], dtype=np.float32))
+    if embedding is None:
+        return spectral
+    embedding = _normalise(np.asarray(embedding, dtype=np.float32).ravel())
+    return np.concatenate([np.sqrt(SPECTRAL_WEIGHT) * spectral, np.sqrt(1 - SPECTRAL_WEIGHT) * embedding])
+
+def kmeans(vectors, k, iterations=KMEANS_ITERATIONS, seed=0):
+    """Spherical k-means on unit vectors; returns (k, dim) unit centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(k):
+            members = vectors[assignment == c]
+            if len(members):
+                centroids[c] = _normalise(members.sum(axis=0))
+    return centroids
+
+class VectorIndex:
+    """Growable matrix of unit vectors with exact and IVF top-k cosine search"""
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.vectors = np.zeros((INITIAL_CAPACITY, dim), dtype=np.float32)
+        self.ids = []
+        self.metadata = []
+        self.size = 0
+        self.centroids = None
+        self.lists = None  # cluster -> list of row numbers
+        self.trained_size = 0
+        self.training = False  # A background retrain is running
+
+    def add(self, item_id, vector, metadata):
+        if self.size == len(self.vectors):
+            self.vectors = np.concatenate([self.vectors, np.zeros_like(self.vectors)])
+        self.vectors[self.size] = vector
+        self.ids.append(item_id)
+        self.metadata.append(metadata)
+        if self.centroids is not None:
+            self.lists[int(np.argmax(self.centroids @ vector))].append(self.size)
+        self.size += 1
+
+    def needs_training(self):
+        return (not self.training and self.size >= APPROX_THRESHOLD
+                and (self.centroids is None or self.size >= IVF_RETRAIN_GROWTH * self.trained_size))
+
+    @staticmethod
+    def fit(vectors):
+        """k-means over a snapshot of the vectors; returns (centroids, assignment). Needs no lock."""
+        centroids = kmeans(vectors, min(IVF_LISTS, len(vectors)))
+        return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+    def install(self, centroids, assignment):
+        """Swap in a trained model; rows added since its snapshot are assigned to the new centroids"""
+        trained = len(assignment)
+        lists = [list(np.flatnonzero(assignment == c)) for c in range(len(centroids))]
+        if self.size > trained:
+            late = np.argmax(self.vectors[trained:self.size] @ centroids.T, axis=1)
+            for row, cluster in enumerate(late, start=trained):
+                lists[cluster].append(row)
+        self.centroids, self.lists, self.trained_size = centroids, lists, trained
+
+    def train(self):
+        """(Re)build the IVF lists over every stored vector, synchronously"""
+        self.install(*self.fit(self.vectors[:self.size]))
+
+    def _candidates(self, query, probes):
+        closest = np.argsort(self.centroids @ query)[::-1][:probes]
+        return np.concatenate([np.asarray(self.lists[c], dtype=np.int64) for c in closest])
+
+    def search(self, query, k=10, method="auto", probes=IVF_PROBES, exclude=None):
+        """Top-k rows by cosine similarity; returns [(score, id, metadata)]"""
+        if method == "approx" and self.centroids is None:
+            method = "exact"  # Too few vectors to have trained the IVF index
+        if method == "auto":
+            method = "approx" if self.centroids is not None else "exact"
+        rows = self._candidates(query, probes) if method == "approx" else np.arange(self.size)
+        if len(rows) == 0:
+            return []
+        scores = self.vectors[rows] @ query
+        take = min(len(rows), k + (1 if exclude is not None else 0))
+        best = np.argpartition(-scores, take - 1)[:take]
+        best = best[np.argsort(-scores[best])]
+        results = [(float(scores[i]), self.ids[rows[i]], self.metadata[rows[i]]) for i in best
+                   if self.ids[rows[i]] != exclude]
+        return results[:k]
+
+class SimilarityIndex:
+    """Per-model-version vector indexes of recorded predictions"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.indexes = {}  # (model_version, dim) -> VectorIndex
+        self.locations = {}  # prediction id -> (index key, row)
+
+    def attach(self, store):
+        """Rebuild from the history store once at startup"""
+        count = 0
+        for row in store.indexed_predictions():
+            self.add(row["id"], row["motor_id"], row["timestamp"], row["state"], row["model_version"],
+                     row["spectral_features"], row["embedding"])
+            count += 1
+        print(f"Similarity index rebuilt from {count} stored predictions")
+
+    def add(self, prediction_id, motor_id, timestamp, state, model_version, spectral_features, embedding=None):
+        if not spectral_features:
+            return
+        vector = feature_vector(spectral_features, embedding)
+        key = (model_version, len(vector))
+        metadata = {"prediction_id": prediction_id, "motor_id": motor_id, "timestamp": timestamp,
+                    "state": state, "model_version": model_version}
+        with self.lock:
+            index = self.indexes.get(key)
+            if index is None:
+                index = self.indexes[key] = VectorIndex(len(vector))
+            index.add(prediction_id, vector, metadata)
+            self.locations[prediction_id] = (key, index.size - 1)
+            retrain = index.needs_training()
+            if retrain:
+                index.training = True
+                snapshot = index.vectors[:index.size].copy()
+        if retrain:
+            # k-means takes seconds on a large index: run it off the request path and swap the result in
+            threading.Thread(target=self._train, args=(index, snapshot), name="similarity-train", daemon=True).start()
+
+    def _train(self, index, snapshot):
+        try:
+            centroids, assignment = VectorIndex.fit(snapshot)
+            with self.lock:
+                index.install(centroids, assignment)
+        except Exception as e:
+            print(f"Warning: Similarity index training failed: {str(e)}")
+        finally:
+            with self.lock:
+                index.training = False
+
+    def add_result(self, prediction_id, motor_id, timestamp, result):
+        """Index a prediction result as returned by predict_from_signals"""
+        self.add(prediction_id, motor_id, timestamp, result["prediction"], result.get("model_version"),
+                 result.get("spectral_features"), result.get("embedding"))
+
+    def similar(self, prediction_id, k=10, method="auto", motor_id=None):
+        """Past captures most similar to a stored prediction (itself excluded)"""
+        with self.lock:
+            location = self.locations.get(prediction_id)
+            if location is None:
+                raise KeyError(f"Prediction {prediction_id} is not indexed")
+            key, row = location
+            index = self.indexes[key]
+            vector = index.vectors[row]
+            # Over-fetch when filtering by motor so k matches usually survive
+            fetch = k if motor_id is None else 10 * k
+            results = index.search(vector, fetch, method, exclude=prediction_id)
+        neighbours = [dict(metadata, similarity=score) for score, _, metadata in results
+                      if motor_id is None or metadata["motor_id"] == motor_id]
+        return neighbours[:k]
+
+    def stats(self):
+        with self.lock:
+            return {
+                "approx_threshold": APPROX_THRESHOLD,
+                "indexes": [{
+                    "model_version": version,
+                    "dim": dim,
+                    "size": index.size,
+                    "approximate": index.centroids is not None,
+                    "training": index.training,
+                    "lists": len(index.centroids) if index.centroids is not None else 0
+                } for (version, dim), index in self.indexes.items()]
+            }
+
+# Shared index; app.py rebuilds it from history at startup and feeds it from record_history
+similarity_index = SimilarityIndex()
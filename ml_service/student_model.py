@@ -0,0 +1,200 @@
+"""Compact student model distilled from the CNN-LSTM, fed with an anti-aliased decimated input.
+
+The fault signatures (25/50/100 Hz) sit far below the 25 kHz Nyquist of a 50 kHz
+capture, so the student sees the signals decimated 50x (1 kHz, 1001 samples).
+
+    python student_model.py prepare <shard_dir> <teacher.h5> <distill_dir>
+    python student_model.py train <distill_dir> <student.h5> [--epochs 30]
+    python student_model.py report <corpus_dir> <teacher.h5> <student.h5>
+"""
+import argparse
+import os
+import time
+import numpy as np
+import scipy.signal
+import tensorflow as tf
+from tensorflow.keras import layers, models
+
+from utils import CLASS_NAMES, iter_labelled_files, load_sample, normalize_signals
+
+DECIMATION_STAGES = (10, 5)  # scipy recommends factors <= 13 per stage
+DECIMATION_FACTOR = int(np.prod(DECIMATION_STAGES))
+FULL_INPUT_LENGTH = 50001
+STUDENT_INPUT_LENGTH = 1001  # ceil(ceil(50001 / 10) / 5)
+DISTILL_TEMPERATURE = 3.0
+DISTILL_ALPHA = 0.3  # Weight of the hard-label loss; the rest goes to matching the teacher
+
+def decimate_signals(signals):
+    """Anti-aliased decimation of (..., 9, T) signals along time, then per-channel normalisation"""
+    decimated = np.asarray(signals, dtype=np.float64)
+    for factor in DECIMATION_STAGES:
+        decimated = scipy.signal.decimate(decimated, factor, ftype='fir', axis=-1, zero_phase=True)
+    return normalize_signals(decimated).astype(np.float32)
+
+def prepare_model_input(signals, input_length):
+    """Build a (N, T, 9) model input from normalised (9, 50001) or (N, 9, 50001) signals
+    for a model expecting input_length samples (N = 1 for a single capture)"""
+    if input_length == STUDENT_INPUT_LENGTH:
+        signals = decimate_signals(signals)
+    elif input_length not in (None, signals.shape[-1]):
+        raise ValueError(f"Model expects {input_length} samples per channel, got {signals.shape[-1]}")
+    batch = signals if signals.ndim == 3 else signals[np.newaxis, ...]
+    return np.ascontiguousarray(np.swapaxes(batch, 1, 2), dtype=np.float32)
+
+def create_student_model(input_shape=(STUDENT_INPUT_LENGTH, 9)):
+    """Small 1D CNN for the decimated input"""
+    return models.Sequential([
+        layers.Input(shape=input_shape),
+        layers.Conv1D(32, 7, activation='relu', padding='same'),
+        layers.BatchNormalization(),
+        layers.MaxPooling1D(2),
+        layers.Conv1D(64, 5, activation='relu', padding='same'),
+        layers.BatchNormalization(),
+        layers.MaxPooling1D(2),
+        layers.Conv1D(64, 3, activation='relu', padding='same'),
+        layers.BatchNormalization(),
+        layers.GlobalAveragePooling1D(),
+        layers.Dense(32, activation='relu'),
+        layers.Dropout(0.3),
+        layers.Dense(len(CLASS_NAMES), activation='softmax')
+    ])
+
+def soften(probs, temperature):
+    """Temperature-soften softmax outputs (equivalent to dividing the logits by T)"""
+    logits = tf.math.log(tf.clip_by_value(probs, 1e-7, 1.0)) / temperature
+    return tf.nn.softmax(logits, axis=-1)
+
+def distillation_loss(temperature=DISTILL_TEMPERATURE, alpha=DISTILL_ALPHA):
+    """Loss on y = [one-hot label | teacher probabilities]"""
+    num_classes = len(CLASS_NAMES)
+    kl = tf.keras.losses.KLDivergence()
+
+    def loss(y, student_probs):
+        hard, teacher_probs = y[:, :num_classes], y[:, num_classes:]
+        hard_loss = tf.keras.losses.categorical_crossentropy(hard, student_probs)
+        soft_loss = kl(soften(teacher_probs, temperature), soften(student_probs, temperature))
+        return alpha * hard_loss + (1 - alpha) * soft_loss * temperature ** 2
+    return loss
+
+def prepare_distillation_data(shard_dir, teacher_path, out_dir, batch_size=16):
+    """Run the teacher over packed shards and store decimated inputs with teacher probabilities"""
+    from training_data import load_index
+
+    teacher = tf.keras.models.load_model(teacher_path)
+    index = load_index(shard_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    inputs = np.lib.format.open_memmap(os.path.join(out_dir, "inputs.npy"), mode='w+', dtype=np.float32,
+                                       shape=(index["total"], STUDENT_INPUT_LENGTH, 9))
+    labels = np.empty(index["total"], dtype=np.int64)
+    teacher_probs = np.empty((index["total"], len(CLASS_NAMES)), dtype=np.float32)
+
+    offset = 0
+    for shard in index["shards"]:
+        data = np.load(os.path.join(shard_dir, shard["data"]), mmap_mode='r')  # (N, T, 9)
+        shard_labels = np.load(os.path.join(shard_dir, shard["labels"]))
+        for start in range(0, len(shard_labels), batch_size):
+            batch = np.asarray(data[start:start + batch_size])
+            n = len(batch)
+            teacher_probs[offset:offset + n] = teacher.predict(batch, verbose=0)
+            inputs[offset:offset + n] = np.transpose(decimate_signals(np.transpose(batch, (0, 2, 1))), (0, 2, 1))
+            labels[offset:offset + n] = shard_labels[start:start + n]
+            offset += n
+        print(f"Prepared {offset}/{index['total']} samples")
+
+    inputs.flush()
+    np.save(os.path.join(out_dir, "labels.npy"), labels)
+    np.save(os.path.join(out_dir, "teacher_probs.npy"), teacher_probs)
+
+def train_student(distill_dir, output_path, epochs=30, batch_size=32, val_fraction=0.2):
+    """Distil the student from prepared data (decimated inputs are ~50x smaller and fit in memory)"""
+    inputs = np.load(os.path.join(distill_dir, "inputs.npy"))
+    labels = np.load(os.path.join(distill_dir, "labels.npy"))
+    teacher_probs = np.load(os.path.join(distill_dir, "teacher_probs.npy"))
+    y = np.concatenate([np.eye(len(CLASS_NAMES), dtype=np.float32)[labels], teacher_probs], axis=1)
+
+    student = create_student_model()
+    student.compile(optimizer=tf.keras.optimizers.Adam(1e-3), loss=distillation_loss())
+    student.fit(inputs, y, epochs=epochs, batch_size=batch_size, validation_split=val_fraction,
+                callbacks=[tf.keras.callbacks.EarlyStopping(patience=5, restore_best_weights=True)])
+    # Save with a plain loss so the serving side can load it without custom objects
+    student.compile(optimizer='adam', loss='categorical_crossentropy')
+    student.save(output_path)
+    print(f"Saved student model to {output_path}")
+    return student
+
+def measure_latency(model, sample, runs=20):
+    """Median single-capture latency in ms, after a warm-up call"""
+    model.predict(sample, verbose=0)
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        model.predict(sample, verbose=0)
+        timings.append(time.perf_counter() - started)
+    return 1000 * float(np.median(timings))
+
+def compare_models(corpus_dir, teacher_path, student_path):
+    """Accuracy, agreement, latency and memory of the student against the teacher"""
+    teacher = tf.keras.models.load_model(teacher_path)
+    student = tf.keras.models.load_model(student_path)
+
+    labels, teacher_pred, student_pred = [], [], []
+    teacher_sample = student_sample = None
+    for label, path in iter_labelled_files(corpus_dir):
+        signals = load_sample(path)
+        teacher_sample = prepare_model_input(signals, FULL_INPUT_LENGTH)
+        student_sample = prepare_model_input(signals, STUDENT_INPUT_LENGTH)
+        labels.append(CLASS_NAMES.index(label))
+        teacher_pred.append(int(np.argmax(teacher.predict(teacher_sample, verbose=0)[0])))
+        student_pred.append(int(np.argmax(student.predict(student_sample, verbose=0)[0])))
+    if not labels:
+        raise ValueError(f"No labelled .mat/.npz files found under {corpus_dir}")
+
+    labels, teacher_pred, student_pred = map(np.array, (labels, teacher_pred, student_pred))
+    report = {}
+    for name, model, path, pred, sample in (("teacher", teacher, teacher_path, teacher_pred, teacher_sample),
+                                            ("student", student, student_path, student_pred, student_sample)):
+        report[name] = {
+            "accuracy": float((pred == labels).mean()),
+            "latency_ms": measure_latency(model, sample),
+            "parameters": int(model.count_params()),
+            "weights_mb": sum(w.nbytes for w in model.get_weights()) / (1024 * 1024),
+            "file_mb": os.path.getsize(path) / (1024 * 1024),
+            "input_bytes": int(sample.nbytes)
+        }
+    report["agreement"] = float((teacher_pred == student_pred).mean())
+    report["samples"] = len(labels)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Distil and evaluate the compact student model")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    prepare_parser = subparsers.add_parser("prepare", help="Decimate shards and record teacher outputs")
+    prepare_parser.add_argument("shard_dir")
+    prepare_parser.add_argument("teacher")
+    prepare_parser.add_argument("distill_dir")
+
+    train_parser = subparsers.add_parser("train", help="Train the student by distillation")
+    train_parser.add_argument("distill_dir")
+    train_parser.add_argument("output")
+    train_parser.add_argument("--epochs", type=int, default=30)
+    train_parser.add_argument("--batch-size", type=int, default=32)
+
+    report_parser = subparsers.add_parser("report", help="Compare student and teacher on a labelled corpus")
+    report_parser.add_argument("corpus")
+    report_parser.add_argument("teacher")
+    report_parser.add_argument("student")
+
+    args = parser.parse_args()
+    if args.command == "prepare":
+        prepare_distillation_data(args.shard_dir, args.teacher, args.distill_dir)
+    elif args.command == "train":
+        train_student(args.distill_dir, args.output, args.epochs, args.batch_size)
+    else:
+        report = compare_models(args.corpus, args.teacher, args.student)
+        print("\n=== Student vs teacher ===")
+        for key, value in report.items():
+            print(f"{key}: {value}")
+
+if __name__ == "__main__":
+    main()
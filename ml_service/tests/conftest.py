@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# The service modules import each other as top-level modules (python app.py runs from ml_service/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pyramid.py creates its shared store under PYRAMID_DIR at import; keep it out of the working tree
+os.environ.setdefault("PYRAMID_DIR", tempfile.mkdtemp(prefix="pyramids_test_"))
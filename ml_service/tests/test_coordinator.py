@@ -0,0 +1,64 @@
+import collections
+
+from coordinator import Coordinator, HashRing, ShardMember
+
+MOTORS = [f"motor_{i}" for i in range(2000)]
+
+def placement(ring):
+    return {motor: ring.owner(motor) for motor in MOTORS}
+
+def test_empty_ring_has_no_owner():
+    assert HashRing().owner("generator") is None
+
+def test_mapping_is_deterministic_and_order_independent():
+    assert placement(HashRing(["a", "b", "c"])) == placement(HashRing(["c", "a", "b"]))
+
+def test_motors_spread_over_instances():
+    counts = collections.Counter(placement(HashRing(["a", "b", "c", "d"])).values())
+    assert set(counts) == {"a", "b", "c", "d"}
+    assert min(counts.values()) > len(MOTORS) / 4 / 2
+
+def test_join_only_moves_motors_to_the_new_instance():
+    before = placement(HashRing(["a", "b", "c"]))
+    after = placement(HashRing(["a", "b", "c", "d"]))
+    moved = [motor for motor in MOTORS if before[motor] != after[motor]]
+    assert moved
+    assert all(after[motor] == "d" for motor in moved)
+    assert len(moved) < len(MOTORS) / 2
+
+def test_leave_only_moves_motors_of_the_departed_instance():
+    before = placement(HashRing(["a", "b", "c"]))
+    after = placement(HashRing(["a", "c"]))
+    for motor in MOTORS:
+        if before[motor] != "b":
+            assert after[motor] == before[motor]
+        else:
+            assert after[motor] in ("a", "c")
+
+def test_coordinator_routes_with_the_ring_and_records_moves():
+    coordinator = Coordinator(heartbeat_timeout=60)
+    coordinator.heartbeat("a", "http://a")
+    assert coordinator.route("generator")["instance_id"] == "a"
+    coordinator.heartbeat("b", "http://b")
+    route = coordinator.route("generator")
+    assert route["instance_id"] == HashRing(["a", "b"]).owner("generator")
+    assert route["epoch"] == 2
+    coordinator.leave(route["instance_id"])
+    assert coordinator.route("generator")["instance_id"] != route["instance_id"]
+
+def test_member_rebuilds_ring_when_membership_changes_under_the_same_epoch():
+    # A restarted coordinator can hand out an epoch number the member has already seen
+    responses = [
+        {"epoch": 1, "instances": {"a": "http://a", "b": "http://b"}, "virtual_nodes": 64},
+        {"epoch": 1, "instances": {"a": "http://a"}, "virtual_nodes": 64},
+    ]
+    member = ShardMember("http://coordinator", "a", "http://a")
+    member._post = lambda path, body: responses.pop(0)
+    member.heartbeat()
+    owned_by_b = next(motor for motor in MOTORS if member.owner(motor)[0] == "b")
+    member.heartbeat()
+    assert member.owner(owned_by_b) == ("a", "http://a")
+
+def test_member_owns_everything_when_sharding_is_off():
+    member = ShardMember(coordinator_url=None, instance_id="local", url=None)
+    assert member.owns("generator")
@@ -0,0 +1,117 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from features import SIGNAL_NAMES
+from pyramid import MIN_LEVEL_POINTS, PyramidStore, build_levels, choose_level
+
+SAMPLE_RATE = 10000
+
+@pytest.fixture
+def store(tmp_path):
+    return PyramidStore(str(tmp_path), retention=3, sample_rate=SAMPLE_RATE)
+
+def capture(seed=0, samples=SAMPLE_RATE):
+    return np.random.default_rng(seed).standard_normal((len(SIGNAL_NAMES), samples)).astype(np.float32)
+
+@pytest.mark.parametrize("points, width, max_level, expected", [
+    (1000, 1000, 10, 0),     # Fits the width: raw samples
+    (1000, 5000, 10, 0),
+    (2000, 1000, 10, 1),     # Exactly two samples per pixel
+    (3999, 1000, 10, 1),     # Level 2 would leave fewer buckets than pixels
+    (4000, 1000, 10, 2),
+    (50001, 1000, 10, 5),
+    (50001, 1000, 3, 3),     # Capped at the coarsest stored level
+    (1, 1, 10, 0),
+])
+def test_choose_level(points, width, max_level, expected):
+    assert choose_level(points, width, max_level) == expected
+
+def test_chosen_level_gives_at_least_width_buckets():
+    for points in (1001, 5000, 50001, 123457):
+        for width in (1, 100, 640, 1000, 3000):
+            level = choose_level(points, width, 20)
+            assert points / 2 ** level >= width or level == 0
+            assert points / 2 ** (level + 1) < width or level == 20
+
+def test_build_levels_buckets_min_max_mean():
+    signals = capture(samples=4096)
+    levels = build_levels(signals)
+    assert levels[-1].shape[2] <= MIN_LEVEL_POINTS
+    for k, level in enumerate(levels, start=1):
+        bucket = 2 ** k
+        assert level.shape == (3, len(SIGNAL_NAMES), 4096 // bucket)
+        blocks = signals.reshape(len(SIGNAL_NAMES), -1, bucket)
+        np.testing.assert_array_equal(level[0], blocks.min(axis=2))
+        np.testing.assert_array_equal(level[1], blocks.max(axis=2))
+        np.testing.assert_allclose(level[2], blocks.mean(axis=2), rtol=1e-5, atol=1e-6)
+
+def test_build_levels_pads_odd_lengths():
+    signals = capture(samples=1001)
+    levels = build_levels(signals)
+    assert [level.shape[2] for level in levels] == [501, 251]
+    assert levels[0][1, :, -1].tolist() == signals[:, -1].tolist()
+
+def test_capture_range_reads_the_level_for_the_width(store):
+    signals = capture()
+    store.ingest(1, "m1", 1000.0, signals)
+
+    full = store.capture_range(1, width=SAMPLE_RATE)
+    assert full["level"] == 0
+    np.testing.assert_array_equal(full["channels"]["i1"]["min"], signals[0])
+
+    view = store.capture_range(1, width=600)
+    assert view["level"] == choose_level(SAMPLE_RATE, 600, 100)
+    assert len(view["t"]) >= 600
+    assert min(view["channels"]["vibrad"]["min"]) == pytest.approx(float(signals[-1].min()))
+    assert max(view["channels"]["vibrad"]["max"]) == pytest.approx(float(signals[-1].max()))
+
+def test_capture_range_sub_window_and_channels(store):
+    signals = capture()
+    store.ingest(1, "m1", 1000.0, signals)
+    view = store.capture_range(1, start=0.2, end=0.3, width=100, channels=["w_m"])
+    assert list(view["channels"]) == ["w_m"]
+    assert view["t"][0] <= 0.2 and view["t"][-1] < 0.3
+    first, last = int(0.2 * SAMPLE_RATE), int(0.3 * SAMPLE_RATE)
+    assert max(view["channels"]["w_m"]["max"]) >= float(signals[7, first:last].max())
+
+def test_capture_range_errors(store):
+    with pytest.raises(KeyError):
+        store.capture_range(42)
+    store.ingest(1, "m1", 1000.0, capture())
+    with pytest.raises(ValueError):
+        store.capture_range(1, start=0.5, end=0.5)
+
+def test_motor_pyramid_levels_summarise_pairs_of_captures(store):
+    captures = [capture(seed) for seed in range(8)]
+    for i, signals in enumerate(captures):
+        store.ingest(i + 1, "m1", 1000.0 + i, signals)
+
+    base = store.motor_range("m1", width=100)
+    assert base["level"] == 0 and len(base["t_start"]) == 8
+    coarse = store.motor_range("m1", width=2)
+    assert coarse["level"] == 2 and coarse["captures_per_point"] == 4
+    assert coarse["t_start"] == [1000.0, 1004.0]
+    assert coarse["count"] == [4, 4]
+    first_four = np.concatenate(captures[:4], axis=1)
+    assert coarse["channels"]["i1"]["max"][0] == pytest.approx(float(first_four[0].max()))
+    assert coarse["channels"]["i1"]["mean"][0] == pytest.approx(float(first_four[0].mean()), abs=1e-5)
+
+def test_old_captures_are_pruned_but_motor_history_kept(store, tmp_path):
+    for i in range(5):
+        store.ingest(i + 1, "m1", 1000.0 + i, capture(i))
+    assert sorted(os.listdir(tmp_path / "captures")) == ["3", "4", "5"]
+    with pytest.raises(KeyError):
+        store.capture_range(1)
+    assert len(store.motor_range("m1", width=100)["t_start"]) == 5
+
+def test_submit_writes_in_the_background(store):
+    signals = capture()
+    store.submit(7, "m2", 2000.0, signals)
+    signals[:] = 0  # The caller's buffer may be reused straight away
+    store.queue.join()
+    view = store.capture_range(7, width=SAMPLE_RATE)
+    assert view["level"] == 0
+    assert max(view["channels"]["i1"]["max"]) > 0
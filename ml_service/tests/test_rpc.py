@@ -0,0 +1,145 @@
+import os
+import socket
+import struct
+import tempfile
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from rpc import (HEADER, MAX_PAYLOAD_BYTES, OP_PREDICT, OP_STATUS, STATUS_ERROR, STATUS_OK, ProtocolError,
+                 RPCClient, RPCError, RPCServer, encode_frame, payload_to_signals, read_frame, signals_to_payload)
+
+@pytest.fixture
+def pair():
+    left, right = socket.socketpair()
+    yield left, right
+    left.close()
+    right.close()
+
+@pytest.fixture
+def socket_path():
+    # Unix socket paths are limited to ~100 bytes, so stay in a short temporary directory
+    directory = tempfile.mkdtemp(prefix="rpc")
+    yield os.path.join(directory, "test.sock")
+    if os.path.exists(os.path.join(directory, "test.sock")):
+        os.remove(os.path.join(directory, "test.sock"))
+    os.rmdir(directory)
+
+def test_frame_round_trip(pair):
+    left, right = pair
+    left.sendall(encode_frame(OP_PREDICT, 7, {"motor_id": "m1"}, b"\x01\x02\x03"))
+    assert read_frame(right) == (OP_PREDICT, STATUS_OK, 7, {"motor_id": "m1"}, b"\x01\x02\x03")
+
+def test_header_layout_is_big_endian():
+    frame = encode_frame(OP_STATUS, 0x01020304, {}, b"xy", status=STATUS_ERROR)
+    magic, op, status, request_id, meta_length, payload_length = HEADER.unpack(frame[:HEADER.size])
+    assert (magic, op, status, request_id) == (b"MLR1", OP_STATUS, STATUS_ERROR, 0x01020304)
+    assert frame[8:10] == b"\x03\x04"
+    assert (meta_length, payload_length) == (2, 2)
+    assert frame[HEADER.size:] == b"{}xy"
+
+def test_pipelined_frames_are_read_in_order(pair):
+    left, right = pair
+    left.sendall(b"".join(encode_frame(OP_STATUS, i, {"n": i}) for i in range(5)))
+    assert [read_frame(right)[3]["n"] for _ in range(5)] == list(range(5))
+
+def test_frame_split_across_writes(pair):
+    left, right = pair
+    frame = encode_frame(OP_PREDICT, 1, {"a": 1}, b"payload")
+    for i in range(len(frame)):
+        left.sendall(frame[i:i + 1])
+    assert read_frame(right)[4] == b"payload"
+
+def test_bad_magic_is_a_protocol_error(pair):
+    left, right = pair
+    left.sendall(b"XXXX" + encode_frame(OP_STATUS, 1)[4:])
+    with pytest.raises(ProtocolError):
+        read_frame(right)
+
+def test_oversized_frame_is_refused_before_reading_it(pair):
+    left, right = pair
+    left.sendall(HEADER.pack(b"MLR1", OP_PREDICT, 0, 1, 0, MAX_PAYLOAD_BYTES + 1))
+    with pytest.raises(ProtocolError):
+        read_frame(right)
+
+def test_closed_connection_mid_frame(pair):
+    left, right = pair
+    left.sendall(encode_frame(OP_PREDICT, 1, {}, b"abcdef")[:-2])
+    left.close()
+    with pytest.raises(EOFError):
+        read_frame(right)
+
+def test_signal_payload_round_trip():
+    signals = np.arange(9 * 100, dtype=np.float64).reshape(9, 100)
+    meta, payload = signals_to_payload(signals)
+    assert meta == {"shape": [9, 100], "dtype": "float32"}
+    assert len(payload) == 9 * 100 * 4
+    assert payload[:4] == struct.pack("<f", 0.0) and payload[4:8] == struct.pack("<f", 1.0)
+    np.testing.assert_array_equal(payload_to_signals(meta, payload), signals.astype(np.float32))
+
+@pytest.mark.parametrize("shape", [[9, 101], [900], []])
+def test_payload_shape_mismatch(shape):
+    _, payload = signals_to_payload(np.zeros((9, 100)))
+    with pytest.raises(ValueError):
+        payload_to_signals({"shape": shape}, payload)
+
+def test_server_answers_pipelined_requests_and_errors(socket_path):
+    def echo(meta, payload):
+        return {"echo": meta.get("value"), "bytes": len(payload)}, payload[::-1]
+
+    def fail(meta, payload):
+        raise ValueError("bad request")
+
+    server = RPCServer(socket_path, {OP_PREDICT: echo, OP_STATUS: fail}, workers=2)
+    server.start()
+    try:
+        client = RPCClient(socket_path)
+        try:
+            results = client.pipeline([(OP_PREDICT, {"value": i}, bytes([i, 0])) for i in range(4)])
+            assert [meta["echo"] for meta, _ in results] == [0, 1, 2, 3]
+            assert [payload for _, payload in results] == [bytes([0, i]) for i in range(4)]
+            with pytest.raises(RPCError, match="bad request"):
+                client.call(OP_STATUS)
+        finally:
+            client.close()
+        assert server.stats()["requests"]["predict"] == 4
+        assert server.stats()["errors"] == 1
+    finally:
+        server.close()
+    assert not os.path.exists(socket_path)
+
+def test_server_rejects_requests_beyond_max_pending(socket_path):
+    release = threading.Event()
+
+    def slow(meta, payload):
+        release.wait(5)
+        return {}, b""
+
+    server = RPCServer(socket_path, {OP_PREDICT: slow}, workers=1, max_pending=1)
+    server.start()
+    try:
+        client = RPCClient(socket_path)
+        try:
+            client.sock.sendall(encode_frame(OP_PREDICT, 1) + encode_frame(OP_PREDICT, 2))
+            _, status, request_id, meta, _ = read_frame(client.sock)
+            assert (status, request_id, meta["type"]) == (STATUS_ERROR, 2, "QueueFull")
+            assert meta["retry_after"] >= 1
+            release.set()
+            assert read_frame(client.sock)[:3] == (OP_PREDICT, STATUS_OK, 1)
+        finally:
+            client.close()
+        assert server.stats()["rejected"] == 1
+    finally:
+        release.set()
+        server.close()
+
+def test_server_refuses_to_take_over_a_live_socket(socket_path):
+    server = RPCServer(socket_path, {})
+    server.start()
+    try:
+        with pytest.raises(RuntimeError):
+            RPCServer(socket_path, {}).start()
+    finally:
+        server.close()
@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from shm_ring import ShmRingReader, ShmRingWriter
+
+SLOTS = 4
+CHANNELS = 9
+SAMPLES = 100
+
+@pytest.fixture
+def ring(request):
+    name = f"test_ring_{os.getpid()}_{request.node.name}"[:30]
+    writer = ShmRingWriter(name, slots=SLOTS, channels=CHANNELS, samples=SAMPLES)
+    reader = ShmRingReader(name)
+    yield writer, reader
+    reader._detach()
+    writer.close()
+
+def capture(value):
+    return np.full((CHANNELS, SAMPLES), float(value))
+
+def test_no_frame_before_the_first_write(ring):
+    _, reader = ring
+    assert reader.latest() is None
+
+def test_reader_sees_the_newest_frame_in_place(ring):
+    writer, reader = ring
+    writer.write(capture(1), timestamp=10.0, fault_type='cassure')
+    writer.write(capture(2), timestamp=11.0)
+    frame = reader.latest()
+    assert frame.sequence == 2
+    assert frame.timestamp == 11.0
+    assert frame.fault_type == 'sain'
+    assert frame.still_valid()
+    np.testing.assert_array_equal(frame.signals, capture(2))
+    assert not frame.signals.flags.owndata  # A view into the shared segment, not a copy
+
+def test_frame_is_invalid_once_the_writer_laps_it(ring):
+    writer, reader = ring
+    writer.write(capture(1))
+    frame = reader.latest()
+    for value in range(2, SLOTS + 1):
+        writer.write(capture(value))
+        assert frame.still_valid()  # Other slots only
+    writer.write(capture(SLOTS + 1))  # Wraps onto the frame's slot
+    assert not frame.still_valid()
+
+def test_torn_write_is_detected(ring):
+    writer, reader = ring
+    writer.write(capture(1))
+    frame = reader.latest()
+    # What a reader sees while the writer is mid-way through overwriting the slot
+    slot = frame.slot
+    writer.layout.sequence_end[slot] = -1
+    writer.layout.slot_headers[slot, 0] = frame.sequence + SLOTS
+    writer.layout.data[slot, :, :SAMPLES // 2] = 99.0
+    assert not frame.still_valid()
+
+def test_half_published_frame_is_not_returned(ring):
+    writer, reader = ring
+    writer.write(capture(1))
+    # Header advanced but the slot's end marker not yet written
+    sequence = 2
+    slot = sequence % SLOTS
+    writer.layout.sequence_end[slot] = -1
+    writer.layout.slot_headers[slot, 0] = sequence
+    writer.layout.header[4] = sequence
+    assert reader.latest() is None
+
+def test_reader_without_a_ring():
+    assert ShmRingReader(f"test_missing_{os.getpid()}").latest() is None
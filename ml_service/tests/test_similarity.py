@@ -0,0 +1,101 @@
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import similarity
+from similarity import FEATURE_KEYS, SimilarityIndex, VectorIndex, feature_vector
+
+DIM = 16
+
+def clustered_vectors(n, clusters=40, seed=0):
+    """Unit vectors scattered around random cluster centres, like captures of a few distinct motor states"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, DIM))
+    vectors = centres[rng.integers(0, clusters, n)] + 0.3 * rng.standard_normal((n, DIM))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+def build_index(vectors):
+    index = VectorIndex(DIM)
+    for i, vector in enumerate(vectors):
+        index.add(i, vector, {"row": i})
+    return index
+
+def brute_force(vectors, query, k, exclude=None):
+    scores = vectors @ query
+    order = [int(i) for i in np.argsort(-scores, kind="stable") if i != exclude]
+    return order[:k]
+
+def test_exact_search_matches_brute_force():
+    vectors = clustered_vectors(500)
+    index = build_index(vectors)
+    for q in range(0, 500, 50):
+        results = index.search(vectors[q], k=10, method="exact")
+        assert [item_id for _, item_id, _ in results] == brute_force(vectors, vectors[q], 10)
+        scores = [score for score, _, _ in results]
+        assert scores == sorted(scores, reverse=True)
+
+def test_exclude_drops_the_query_itself():
+    vectors = clustered_vectors(200)
+    results = build_index(vectors).search(vectors[3], k=5, method="exact", exclude=3)
+    assert [item_id for _, item_id, _ in results] == brute_force(vectors, vectors[3], 5, exclude=3)
+
+def test_approx_falls_back_to_exact_until_trained():
+    vectors = clustered_vectors(300)
+    index = build_index(vectors)
+    assert index.search(vectors[0], k=5, method="approx") == index.search(vectors[0], k=5, method="exact")
+
+def test_ivf_probing_every_list_is_exact():
+    vectors = clustered_vectors(3000)
+    index = build_index(vectors)
+    index.train()
+    for q in range(0, 3000, 300):
+        approx = index.search(vectors[q], k=10, method="approx", probes=len(index.centroids))
+        assert [item_id for _, item_id, _ in approx] == brute_force(vectors, vectors[q], 10)
+
+def test_ivf_recall_against_exact_search():
+    vectors = clustered_vectors(3000)
+    queries = clustered_vectors(100, seed=1)
+    index = build_index(vectors)
+    index.train()
+    hits = 0
+    for query in queries:
+        approx = {item_id for _, item_id, _ in index.search(query, k=10, method="approx")}
+        hits += len(approx & set(brute_force(vectors, query, 10)))
+    assert hits / (10 * len(queries)) >= 0.9
+
+def test_rows_added_during_training_are_searchable():
+    vectors = clustered_vectors(2000)
+    index = build_index(vectors[:1500])
+    centroids, assignment = VectorIndex.fit(index.vectors[:index.size].copy())
+    for i in range(1500, 2000):
+        index.add(i, vectors[i], {"row": i})
+    index.install(centroids, assignment)
+    assert sum(len(rows) for rows in index.lists) == 2000
+    for q in (1600, 1900):
+        approx = index.search(vectors[q], k=1, method="approx", probes=len(index.centroids))
+        assert approx[0][1] == q
+
+def test_similarity_index_trains_in_the_background(monkeypatch):
+    monkeypatch.setattr(similarity, "APPROX_THRESHOLD", 300)
+    rng = np.random.default_rng(0)
+    index = SimilarityIndex()
+    for i in range(400):
+        features = dict(zip(FEATURE_KEYS, rng.random(len(FEATURE_KEYS))))
+        index.add(i, f"motor_{i % 3}", float(i), "sain", "v1", features)
+    deadline = time.time() + 10
+    while not index.stats()["indexes"][0]["approximate"] and time.time() < deadline:
+        time.sleep(0.05)
+    stats = index.stats()["indexes"][0]
+    assert stats["approximate"] and stats["size"] == 400
+    neighbours = index.similar(5, k=5, method="approx", motor_id="motor_2")
+    assert len(neighbours) == 5 and all(n["motor_id"] == "motor_2" for n in neighbours)
+    assert 5 not in [n["prediction_id"] for n in neighbours]
+
+def test_feature_vector_is_unit_length_with_or_without_embedding():
+    features = {key: float(i + 1) for i, key in enumerate(FEATURE_KEYS)}
+    assert np.linalg.norm(feature_vector(features)) == pytest.approx(1.0, abs=1e-6)
+    combined = feature_vector(features, embedding=[0.5] * 8)
+    assert len(combined) == len(FEATURE_KEYS) + 8
+    assert np.linalg.norm(combined) == pytest.approx(1.0, abs=1e-6)
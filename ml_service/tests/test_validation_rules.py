@@ -0,0 +1,98 @@
+import itertools
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from validation_rules import DEFAULT_RULES, PATTERN_NAMES, ValidationRules, merge_rules
+
+CLASS_NAMES = ['cassure', 'sain', 'desiquilibre']
+CONFIDENCE_THRESHOLD = 0.7
+
+def baseline_validate(pred, signal_patterns):
+    """The per-class if/elif chain the rule table replaced, kept verbatim as the reference"""
+    predicted_class = CLASS_NAMES[int(np.argmax(pred))]
+    confidence = float(np.max(pred))
+    class_probs = {CLASS_NAMES[i]: float(pred[i]) for i in range(len(CLASS_NAMES))}
+    is_valid = True
+
+    if predicted_class == 'sain':
+        if not signal_patterns['base_freq']:
+            is_valid = False
+    elif predicted_class == 'desiquilibre':
+        if not signal_patterns['mod_25hz'] or not signal_patterns['phase_balance']:
+            is_valid = False
+    elif predicted_class == 'cassure':
+        if not signal_patterns['sideband_100hz']:
+            is_valid = False
+
+    adjusted = not is_valid or confidence < CONFIDENCE_THRESHOLD
+    if adjusted:
+        if signal_patterns['base_freq'] and not signal_patterns['sideband_100hz'] and not signal_patterns['mod_25hz']:
+            predicted_class = 'sain'
+            confidence = max(confidence, 0.65)
+            class_probs = {
+                'sain': max(confidence, class_probs['sain']),
+                'desiquilibre': min(0.3, class_probs['desiquilibre']),
+                'cassure': min(0.3, class_probs['cassure'])
+            }
+        else:
+            confidence = min(confidence, 0.6)
+    return predicted_class, confidence, class_probs, is_valid, adjusted
+
+def probability_grid():
+    """Confident, borderline and ambiguous outputs for every predicted class"""
+    rows = []
+    for top in (0.95, 0.72, 0.7, 0.69, 0.5, 0.4):
+        for winner in range(len(CLASS_NAMES)):
+            rest = (1 - top) / 2
+            row = [rest] * len(CLASS_NAMES)
+            row[winner] = top
+            rows.append(row)
+    rows.append([0.45, 0.35, 0.2])
+    rows.append([0.1, 0.35, 0.55])
+    return np.array(rows)
+
+def test_default_rules_match_baseline_chain():
+    rules = ValidationRules(DEFAULT_RULES, CLASS_NAMES)
+    probs = probability_grid()
+    for combination in itertools.product([False, True], repeat=len(PATTERN_NAMES)):
+        signal_patterns = dict(zip(PATTERN_NAMES, combination))
+        patterns = np.tile(np.array(combination), (len(probs), 1))
+        outcome = rules.apply(probs, patterns)
+        for i, pred in enumerate(probs):
+            predicted_class, confidence, class_probs, is_valid, adjusted = baseline_validate(pred, signal_patterns)
+            assert CLASS_NAMES[outcome["predicted"][i]] == predicted_class
+            assert outcome["confidence"][i] == pytest.approx(confidence)
+            assert bool(outcome["valid"][i]) == is_valid
+            assert bool(outcome["adjusted"][i]) == adjusted
+            for c, name in enumerate(CLASS_NAMES):
+                assert outcome["probs"][i, c] == pytest.approx(class_probs[name])
+
+def test_reason_names_the_failed_class():
+    rules = ValidationRules(DEFAULT_RULES, CLASS_NAMES)
+    assert rules.reason(CLASS_NAMES.index('cassure'), False) == "Signal characteristics don't match broken rotor pattern"
+    assert rules.reason(CLASS_NAMES.index('cassure'), True) == 'Low confidence prediction'
+
+def test_merge_rules_overrides_one_entry():
+    rules = merge_rules({"classes": {"sain": {"required": []}}, "otherwise": {"max_confidence": 0.5}}, CLASS_NAMES)
+    assert rules["classes"]["sain"]["required"] == []
+    assert rules["classes"]["sain"]["reason"] == DEFAULT_RULES["classes"]["sain"]["reason"]
+    assert rules["classes"]["cassure"] == DEFAULT_RULES["classes"]["cassure"]
+    assert rules["otherwise"]["max_confidence"] == 0.5
+    assert DEFAULT_RULES["classes"]["sain"]["required"] == ["base_freq"]
+
+@pytest.mark.parametrize("overrides", [
+    {"classes": {"unknown": {"required": []}}},
+    {"classes": {"sain": {"requires": []}}},
+    {"fallback": {"class": "unknown"}},
+    {"section": {}},
+    [],
+])
+def test_merge_rules_rejects_invalid_tables(overrides):
+    with pytest.raises(ValueError):
+        merge_rules(overrides, CLASS_NAMES)
+
+def test_unknown_pattern_rejected():
+    with pytest.raises(ValueError):
+        ValidationRules(merge_rules({"classes": {"sain": {"required": ["base_frequency"]}}}, CLASS_NAMES), CLASS_NAMES)
@@ -0,0 +1,212 @@
+"""Sharded float32 training data and a streaming tf.data pipeline.
+
+    python training_data.py pack <corpus_dir> <shard_dir> [--shard-size 256]
+    python training_data.py train <shard_dir> <output_model.h5> [--epochs 8] [--batch-size 16]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import time
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import layers, models, callbacks
+
+from utils import CLASS_NAMES, iter_labelled_files, load_sample
+
+SIGNAL_LENGTH = 50001
+NUM_CHANNELS = 9
+DEFAULT_SHARD_SIZE = 256  # Samples per shard (~460 MB of float32)
+INDEX_FILE = "index.json"
+
+def pack_shards(corpus_dir, shard_dir, shard_size=DEFAULT_SHARD_SIZE, seed=42):
+    """Pack a <class>/*.mat|*.npz corpus into fixed-size float32 .npy shards plus a label index.
+
+    Samples are normalised exactly like at serving time and written one at a
+    time into memory-mapped shard files, so packing never holds more than one
+    sample in RAM.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    files = list(iter_labelled_files(corpus_dir))
+    if not files:
+        raise ValueError(f"No labelled .mat/.npz files found under {corpus_dir}")
+    random.Random(seed).shuffle(files)  # Mix classes across shards
+
+    shards = []
+    started = time.time()
+    for shard_id, start in enumerate(range(0, len(files), shard_size)):
+        chunk = files[start:start + shard_size]
+        data_name = f"shard_{shard_id:05d}.npy"
+        data = np.lib.format.open_memmap(os.path.join(shard_dir, data_name), mode='w+',
+                                         dtype=np.float32, shape=(len(chunk), SIGNAL_LENGTH, NUM_CHANNELS))
+        labels = np.empty(len(chunk), dtype=np.int64)
+        for i, (label, path) in enumerate(chunk):
+            data[i] = load_sample(path).T
+            labels[i] = CLASS_NAMES.index(label)
+        data.flush()
+        del data
+
+        labels_name = f"labels_{shard_id:05d}.npy"
+        np.save(os.path.join(shard_dir, labels_name), labels)
+        shards.append({"data": data_name, "labels": labels_name, "count": len(chunk)})
+        print(f"Packed shard {shard_id} ({len(chunk)} samples)")
+
+    index = {
+        "classes": CLASS_NAMES,
+        "signal_length": SIGNAL_LENGTH,
+        "num_channels": NUM_CHANNELS,
+        "total": len(files),
+        "shards": shards
+    }
+    with open(os.path.join(shard_dir, INDEX_FILE), 'w') as f:
+        json.dump(index, f, indent=2)
+    print(f"Packed {len(files)} samples into {len(shards)} shards in {time.time() - started:.1f}s")
+    return index
+
+def load_index(shard_dir):
+    with open(os.path.join(shard_dir, INDEX_FILE)) as f:
+        return json.load(f)
+
+def _shard_samples(data_path, labels_path):
+    """Yield (sample, label) pairs from one memory-mapped shard"""
+    data = np.load(data_path, mmap_mode='r')
+    labels = np.load(labels_path)
+    for i in range(len(labels)):
+        yield data[i], labels[i]
+
+def make_dataset(shard_dir, shards, batch_size=16, shuffle=True, shuffle_buffer=64,
+                 cycle_length=4, seed=42):
+    """Streaming dataset over memory-mapped shards: parallel interleave, shuffle, batch, prefetch"""
+    index = load_index(shard_dir)
+    sample_shape = (index["signal_length"], index["num_channels"])
+    data_paths = [os.path.join(shard_dir, shard["data"]) for shard in shards]
+    labels_paths = [os.path.join(shard_dir, shard["labels"]) for shard in shards]
+
+    def read_shard(data_path, labels_path):
+        return tf.data.Dataset.from_generator(
+            lambda d, l: _shard_samples(d.decode(), l.decode()),
+            args=(data_path, labels_path),
+            output_signature=(
+                tf.TensorSpec(shape=sample_shape, dtype=tf.float32),
+                tf.TensorSpec(shape=(), dtype=tf.int64)
+            )
+        )
+
+    dataset = tf.data.Dataset.from_tensor_slices((data_paths, labels_paths))
+    if shuffle:
+        dataset = dataset.shuffle(len(data_paths), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.interleave(read_shard, cycle_length=min(cycle_length, len(data_paths)),
+                                 block_length=1, num_parallel_calls=tf.data.AUTOTUNE,
+                                 deterministic=not shuffle)
+    if shuffle:
+        dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+def split_shards(shard_dir, val_fraction=0.2):
+    """Split shards into training and validation sets (whole shards, samples were shuffled at pack time)"""
+    shards = load_index(shard_dir)["shards"]
+    if len(shards) < 2:
+        return shards, []
+    n_val = max(1, int(round(len(shards) * val_fraction)))
+    return shards[:-n_val], shards[-n_val:]
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage / (1024 * 1024) if sys.platform == 'darwin' else usage / 1024
+
+class EpochReport(callbacks.Callback):
+    """Print epoch time, throughput and peak memory after every epoch"""
+
+    def __init__(self, samples_per_epoch):
+        super().__init__()
+        self.samples_per_epoch = samples_per_epoch
+        self.epoch_times = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.started = time.time()
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.time() - self.started
+        self.epoch_times.append(elapsed)
+        print(f"\nEpoch {epoch + 1}: {elapsed:.1f}s, {self.samples_per_epoch / elapsed:.1f} samples/s, "
+              f"peak RSS {peak_rss_mb():.0f} MB")
+
+def create_model(input_shape=(SIGNAL_LENGTH, NUM_CHANNELS)):
+    """CNN-LSTM architecture from Hybrid_CNN_LSTM.ipynb"""
+    return models.Sequential([
+        layers.Input(shape=input_shape),
+        layers.Conv1D(64, 11, activation='relu', padding='same'),
+        layers.BatchNormalization(),
+        layers.MaxPooling1D(4),
+        layers.Dropout(0.2),
+        layers.Conv1D(128, 7, activation='relu', padding='same'),
+        layers.BatchNormalization(),
+        layers.MaxPooling1D(4),
+        layers.Dropout(0.2),
+        layers.Conv1D(256, 5, activation='relu', padding='same'),
+        layers.BatchNormalization(),
+        layers.MaxPooling1D(2),
+        layers.Dropout(0.3),
+        layers.Bidirectional(layers.LSTM(128, return_sequences=True)),
+        layers.Bidirectional(layers.LSTM(64)),
+        layers.Dense(128, activation='relu'),
+        layers.BatchNormalization(),
+        layers.Dropout(0.5),
+        layers.Dense(len(CLASS_NAMES), activation='softmax')
+    ])
+
+def train(shard_dir, output_path, epochs=8, batch_size=16, val_fraction=0.2):
+    """Train the CNN-LSTM from shards without loading the dataset into memory"""
+    train_shards, val_shards = split_shards(shard_dir, val_fraction)
+    train_ds = make_dataset(shard_dir, train_shards, batch_size=batch_size, shuffle=True)
+    val_ds = make_dataset(shard_dir, val_shards, batch_size=batch_size, shuffle=False) if val_shards else None
+
+    model = create_model()
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(1e-4),
+        loss='sparse_categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    report = EpochReport(sum(shard["count"] for shard in train_shards))
+    model.fit(
+        train_ds,
+        epochs=epochs,
+        validation_data=val_ds,
+        callbacks=[
+            report,
+            callbacks.EarlyStopping(patience=7, restore_best_weights=True),
+            callbacks.ReduceLROnPlateau(factor=0.2, patience=5, min_lr=1e-6)
+        ]
+    )
+    model.save(output_path)
+    print(f"Saved model to {output_path}")
+    print(f"Mean epoch time: {np.mean(report.epoch_times):.1f}s, peak RSS {peak_rss_mb():.0f} MB")
+    return model
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack training shards and train from them")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    pack_parser = subparsers.add_parser("pack", help="Pack a labelled corpus into float32 shards")
+    pack_parser.add_argument("corpus", help="Folder laid out as <corpus>/<class>/*.mat|*.npz")
+    pack_parser.add_argument("shard_dir")
+    pack_parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+
+    train_parser = subparsers.add_parser("train", help="Train the CNN-LSTM from packed shards")
+    train_parser.add_argument("shard_dir")
+    train_parser.add_argument("output")
+    train_parser.add_argument("--epochs", type=int, default=8)
+    train_parser.add_argument("--batch-size", type=int, default=16)
+    train_parser.add_argument("--val-fraction", type=float, default=0.2)
+
+    args = parser.parse_args()
+    if args.command == "pack":
+        pack_shards(args.corpus, args.shard_dir, args.shard_size)
+    else:
+        train(args.shard_dir, args.output, args.epochs, args.batch_size, args.val_fraction)
+
+if __name__ == "__main__":
+    main()
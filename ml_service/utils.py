@@ -4,8 +4,9 @@ import os
 
 REQUIRED_SIGNALS = ['i1', 'i2', 'i3', 'v1', 'v2', 'v3', 'vn', 'w_m', 'vibrad']
 
-def convert_mat_to_npz(mat_file_path):
-    """Convert .mat file to preprocessed numpy array"""
+def convert_mat_to_npz(mat_file_path, normalize=True):
+    """Convert .mat file (path or file-like object) to preprocessed numpy array
+    (raw stacked signals if normalize is False)"""
     try:
         print("\nStarting conversion process...")
         # Load .mat file
@@ -91,9 +92,11 @@ def convert_mat_to_npz(mat_file_path):
         stacked_signals = np.stack([signals[key] for key in REQUIRED_SIGNALS], axis=0)
         print(f"Stacked signals shape: {stacked_signals.shape}")
         
+        if not normalize:
+            return stacked_signals
+        
         # Normalize
-        stacked_signals = (stacked_signals - np.mean(stacked_signals, axis=1, keepdims=True)) / \
-                         (np.std(stacked_signals, axis=1, keepdims=True) + 1e-8)
+        stacked_signals = normalize_signals(stacked_signals)
         print("Normalization complete")
         
         return stacked_signals
@@ -106,3 +109,31 @@ def convert_mat_to_npz(mat_file_path):
         print("Traceback:")
         print(traceback.format_exc())
         raise Exception(f"Error converting mat file: {str(e)}")
+
+CLASS_NAMES = ['cassure', 'sain', 'desiquilibre']  # Same order as training
+
+def normalize_signals(stacked_signals):
+    """Per-channel standardisation used at training time, along the last (time) axis of (9, T) or (N, 9, T)"""
+    return (stacked_signals - np.mean(stacked_signals, axis=-1, keepdims=True)) / \
+           (np.std(stacked_signals, axis=-1, keepdims=True) + 1e-8)
+
+def load_sample(file_path):
+    """Load one .mat or .npz capture as a normalised (9, 50001) array"""
+    if file_path.endswith('.npz'):
+        with np.load(file_path) as data:
+            missing = [sig for sig in REQUIRED_SIGNALS if sig not in data.files]
+            if missing:
+                raise ValueError(f"Missing signals in {file_path}: {missing}")
+            stacked_signals = np.stack([data[key] for key in REQUIRED_SIGNALS], axis=0)
+        return normalize_signals(stacked_signals)
+    return convert_mat_to_npz(file_path)
+
+def iter_labelled_files(base_path, classes=CLASS_NAMES):
+    """Yield (label, path) for a corpus laid out as base_path/<class>/*.mat|*.npz"""
+    for label in classes:
+        folder_path = os.path.join(base_path, label)
+        if not os.path.isdir(folder_path):
+            continue
+        for file in sorted(os.listdir(folder_path)):
+            if file.endswith('.mat') or file.endswith('.npz'):
+                yield label, os.path.join(folder_path, file)
@@ -0,0 +1,186 @@
+import json
+import os
+import numpy as np
+
+from features import SAMPLE_RATE
+
+PATTERN_NAMES = ['base_freq', 'mod_25hz', 'sideband_100hz', 'phase_balance']
+
+# Default rule table (same behaviour as the original per-class if/elif chain).
+# Override by pointing VALIDATION_RULES_PATH at a JSON file with the same structure; it is merged
+# over these defaults per class and per section, so it only needs the entries it changes.
+DEFAULT_RULES = {
+    # Predictions below this confidence are adjusted even when their patterns match
+    "min_confidence": 0.7,
+    # Spectral patterns a predicted class needs / must not show to be considered valid
+    "classes": {
+        "sain": {
+            "required": ["base_freq"],
+            "forbidden": [],
+            "reason": "Signal characteristics don't match healthy state pattern"
+        },
+        "desiquilibre": {
+            "required": ["mod_25hz", "phase_balance"],
+            "forbidden": [],
+            "reason": "Signal characteristics don't match unbalance pattern"
+        },
+        "cassure": {
+            "required": ["sideband_100hz"],
+            "forbidden": [],
+            "reason": "Signal characteristics don't match broken rotor pattern"
+        }
+    },
+    # Adjustment for invalid / low-confidence predictions whose patterns match `when`
+    "fallback": {
+        "when": {"required": ["base_freq"], "forbidden": ["sideband_100hz", "mod_25hz"]},
+        "class": "sain",
+        "min_confidence": 0.65,
+        "probability_caps": {"desiquilibre": 0.3, "cassure": 0.3}
+    },
+    # Adjustment for every other invalid / low-confidence prediction
+    "otherwise": {"max_confidence": 0.6}
+}
+
+class ValidationRules:
+    """Rule table compiled to boolean matrices so a whole batch is validated with array operations"""
+
+    def __init__(self, rules, class_names):
+        self.rules = rules
+        self.class_names = list(class_names)
+        self.min_confidence = rules["min_confidence"]
+        self.required = np.zeros((len(class_names), len(PATTERN_NAMES)), dtype=bool)
+        self.forbidden = np.zeros_like(self.required)
+        self.reasons = []
+        for c, name in enumerate(self.class_names):
+            rule = rules["classes"].get(name, {})
+            self.required[c] = self._pattern_mask(rule.get("required", []))
+            self.forbidden[c] = self._pattern_mask(rule.get("forbidden", []))
+            self.reasons.append(rule.get("reason", f"Signal characteristics don't match {name} pattern"))
+
+        fallback = rules["fallback"]
+        self.fallback_required = self._pattern_mask(fallback["when"].get("required", []))
+        self.fallback_forbidden = self._pattern_mask(fallback["when"].get("forbidden", []))
+        self.fallback_class = self.class_names.index(fallback["class"])
+        self.fallback_min_confidence = fallback["min_confidence"]
+        self.fallback_caps = np.array([fallback.get("probability_caps", {}).get(name, 1.0)
+                                       for name in self.class_names])
+        self.otherwise_max_confidence = rules["otherwise"]["max_confidence"]
+
+    @staticmethod
+    def _pattern_mask(names):
+        unknown = set(names) - set(PATTERN_NAMES)
+        if unknown:
+            raise ValueError(f"Unknown spectral patterns in validation rules: {sorted(unknown)}")
+        return np.array([name in names for name in PATTERN_NAMES])
+
+    def apply(self, probs, patterns):
+        """Validate a batch of predictions.
+
+        probs: (N, C) model probabilities; patterns: (N, len(PATTERN_NAMES)) booleans.
+        Returns a dict of arrays: predicted index, confidence, adjusted probabilities,
+        validity and whether each row was adjusted.
+        """
+        probs = np.asarray(probs, dtype=np.float64)
+        patterns = np.asarray(patterns, dtype=bool)
+        predicted = np.argmax(probs, axis=1)
+        confidence = probs[np.arange(len(probs)), predicted]
+
+        required = self.required[predicted]
+        forbidden = self.forbidden[predicted]
+        valid = np.all(~required | patterns, axis=1) & np.all(~forbidden | ~patterns, axis=1)
+        adjust = ~valid | (confidence < self.min_confidence)
+
+        matches_fallback = (np.all(~self.fallback_required | patterns, axis=1)
+                            & np.all(~self.fallback_forbidden | ~patterns, axis=1))
+        to_fallback = adjust & matches_fallback
+        to_lower = adjust & ~matches_fallback
+
+        new_confidence = confidence.copy()
+        new_confidence[to_fallback] = np.maximum(confidence[to_fallback], self.fallback_min_confidence)
+        new_confidence[to_lower] = np.minimum(confidence[to_lower], self.otherwise_max_confidence)
+
+        new_probs = probs.copy()
+        capped = np.minimum(probs[to_fallback], self.fallback_caps)
+        capped[:, self.fallback_class] = np.maximum(new_confidence[to_fallback], probs[to_fallback, self.fallback_class])
+        new_probs[to_fallback] = capped
+
+        new_predicted = np.where(to_fallback, self.fallback_class, predicted)
+        return {
+            "predicted": new_predicted,
+            "confidence": new_confidence,
+            "probs": new_probs,
+            "valid": valid,
+            "adjusted": adjust
+        }
+
+    def reason(self, predicted_index, valid):
+        return self.reasons[predicted_index] if not valid else 'Low confidence prediction'
+
+def compute_patterns_batch(batch, sample_rate=SAMPLE_RATE):
+    """Vectorised validate_signal_characteristics: (N, 9, T) signals -> (N, 4) pattern booleans"""
+    batch = np.asarray(batch)
+    currents = batch[:, :3, :]
+    magnitudes = np.abs(np.fft.fft(currents[:, 0, :], axis=-1))
+    freqs = np.fft.fftfreq(batch.shape[-1], 1 / sample_rate)
+    threshold = magnitudes.mean(axis=1, keepdims=True) + 2 * magnitudes.std(axis=1, keepdims=True)
+    dominant = (magnitudes > threshold) & (freqs >= 0)
+
+    def near(freq, tolerance):
+        return np.any(dominant & (np.abs(freqs - freq) < tolerance), axis=1)
+
+    phase_balance = np.std(np.std(currents, axis=2), axis=1) < 0.2
+    return np.stack([near(50, 2), near(25, 5), near(100, 5), phase_balance], axis=1)
+
+def patterns_to_matrix(patterns_list):
+    """List of pattern dicts (as returned by validate_signal_characteristics) -> (N, 4) booleans"""
+    return np.array([[bool(p[name]) for name in PATTERN_NAMES] for p in patterns_list], dtype=bool)
+
+RULE_KEYS = {
+    "classes": {"required", "forbidden", "reason"},
+    "fallback": {"when", "class", "min_confidence", "probability_caps"},
+    "otherwise": {"max_confidence"}
+}
+
+def _check_keys(section, keys, allowed):
+    unknown = set(keys) - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown keys in validation rules {section}: {sorted(unknown)}")
+
+def merge_rules(overrides, class_names, defaults=DEFAULT_RULES):
+    """Merge a (possibly partial) rule table over the defaults, per class and per section"""
+    if not isinstance(overrides, dict):
+        raise ValueError("Validation rules must be a JSON object")
+    _check_keys("(top level)", overrides, {"min_confidence"} | set(RULE_KEYS))
+    for section in RULE_KEYS:
+        if not isinstance(overrides.get(section, {}), dict):
+            raise ValueError(f"Validation rules section '{section}' must be an object")
+    rules = {
+        "min_confidence": overrides.get("min_confidence", defaults["min_confidence"]),
+        "classes": {name: dict(rule) for name, rule in defaults["classes"].items()},
+        "fallback": dict(defaults["fallback"], **overrides.get("fallback", {})),
+        "otherwise": dict(defaults["otherwise"], **overrides.get("otherwise", {}))
+    }
+    _check_keys("fallback", overrides.get("fallback", {}), RULE_KEYS["fallback"])
+    _check_keys("otherwise", overrides.get("otherwise", {}), RULE_KEYS["otherwise"])
+    _check_keys("fallback.when", rules["fallback"]["when"], {"required", "forbidden"})
+    for name, rule in overrides.get("classes", {}).items():
+        if name not in class_names:
+            raise ValueError(f"Validation rules name unknown class '{name}' (expected one of {list(class_names)})")
+        _check_keys(f"classes.{name}", rule, RULE_KEYS["classes"])
+        rules["classes"].setdefault(name, {}).update(rule)
+    if rules["fallback"]["class"] not in class_names:
+        raise ValueError(f"Validation rules fallback class '{rules['fallback']['class']}' is not a known class")
+    return rules
+
+def load_rules(class_names, path=None):
+    """Load the rule table from JSON (VALIDATION_RULES_PATH) merged over the defaults, or use the defaults"""
+    path = path or os.environ.get("VALIDATION_RULES_PATH")
+    rules = DEFAULT_RULES
+    if path:
+        with open(path) as f:
+            try:
+                rules = merge_rules(json.load(f), class_names)
+            except ValueError as e:
+                raise ValueError(f"Invalid validation rules in {path}: {str(e)}") from e
+        print(f"Loaded validation rules from {path}")
+    return ValidationRules(rules, class_names)
@@ -0,0 +1,55 @@
+const mlRpc = require("../services/mlRpc");
+
+/**
+ * ML service status over the local RPC socket
+ * @route GET /api/ml/status
+ */
+const getMlStatus = async (req, res) => {
+  try {
+    const data = await mlRpc.status();
+    res.status(200).json({ success: true, data });
+  } catch (error) {
+    console.error("ML RPC status failed:", error.message);
+    res.status(502).json({ success: false, message: error.message });
+  }
+};
+
+/**
+ * Predict from raw signal arrays over the local RPC socket
+ * @route POST /api/ml/predict
+ */
+const predictSignals = async (req, res) => {
+  const { signals, motorId } = req.body;
+  const missing = mlRpc.SIGNAL_NAMES.filter((name) => !Array.isArray(signals?.[name]));
+  if (missing.length) {
+    return res.status(400).json({
+      success: false,
+      message: `Missing signals: ${missing.join(", ")}`,
+    });
+  }
+  // The RPC payload is one (channels, samples) block, so every channel needs the same length
+  const length = signals[mlRpc.SIGNAL_NAMES[0]].length;
+  const mismatched = mlRpc.SIGNAL_NAMES.filter((name) => signals[name].length !== length);
+  if (length === 0 || mismatched.length) {
+    return res.status(400).json({
+      success: false,
+      message: length === 0
+        ? "Signals must not be empty"
+        : `Signals must all have ${length} samples: ${mismatched.join(", ")} differ`,
+    });
+  }
+
+  try {
+    const data = await mlRpc.predict(signals, { motor_id: motorId });
+    res.status(200).json({ success: true, data });
+  } catch (error) {
+    console.error("ML RPC predict failed:", error.message);
+    if (error.retryAfter !== undefined) {
+      res.set("Retry-After", String(error.retryAfter));
+      return res.status(503).json({ success: false, message: error.message });
+    }
+    res.status(502).json({ success: false, message: error.message });
+  }
+};
+
+module.exports = { getMlStatus, predictSignals };
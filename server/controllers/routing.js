@@ -0,0 +1,32 @@
+const COORDINATOR_URL = process.env.COORDINATOR_URL || "http://localhost:5700";
+const ML_SERVICE_URL = process.env.ML_SERVICE_URL || "http://localhost:5600";
+
+/**
+ * Resolve which ML service instance owns a motor
+ * Falls back to the single ML service when no coordinator is running
+ * @route GET /api/route/:motorId
+ */
+const routeMotor = async (req, res) => {
+  const { motorId } = req.params;
+  try {
+    const response = await fetch(`${COORDINATOR_URL}/route/${encodeURIComponent(motorId)}`, {
+      signal: AbortSignal.timeout(2000),
+    });
+    const placement = await response.json();
+    if (!response.ok) {
+      return res.status(response.status).json({
+        success: false,
+        message: placement.error || "No ML service instance available",
+      });
+    }
+    res.status(200).json({ success: true, data: placement });
+  } catch (error) {
+    console.error("Coordinator unreachable, using default ML service:", error.message);
+    res.status(200).json({
+      success: true,
+      data: { motor_id: motorId, instance_id: null, url: ML_SERVICE_URL, epoch: null },
+    });
+  }
+};
+
+module.exports = { routeMotor };
@@ -14,6 +14,8 @@ const userRoutes = require("./routes/user.js");
 const eventRoutes = require("./routes/event.js");
 const notificationRoutes = require('./routes/notification');
 const { generateMatFile } = require("./controllers/file.js");
+const { routeMotor } = require("./controllers/routing.js");
+const { getMlStatus, predictSignals } = require("./controllers/ml.js");
 
 // Initialize express
 const app = express();
@@ -33,6 +35,9 @@ app.use("/api/user", userRoutes);
 app.use("/api/events", eventRoutes);  // Added event routes
 app.use('/api/notifications', notificationRoutes); 
 app.post("/api/generate-mat", generateMatFile);
+app.get("/api/route/:motorId", routeMotor);  // ML service instance owning a motor
+app.get("/api/ml/status", getMlStatus);  // Over the ML service's Unix socket
+app.post("/api/ml/predict", predictSignals);
 
 app.get("/", (req, res) => {
   res.send("Industrial Monitor Backend API Running");
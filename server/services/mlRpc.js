@@ -0,0 +1,106 @@
+const net = require("net");
+const path = require("path");
+
+// Unix socket RPC to the co-located ML service (see ml_service/rpc.py for the frame layout)
+const SOCKET_PATH =
+  process.env.ML_RPC_SOCKET ||
+  path.join(__dirname, `../../ml_service/ml_service_${process.env.ML_SERVICE_PORT || 5600}.sock`);
+const SIGNAL_NAMES = ["i1", "i2", "i3", "v1", "v2", "v3", "vn", "w_m", "vibrad"];
+const MAGIC = Buffer.from("MLR1");
+const HEADER_SIZE = 22;
+const OPS = { predict: 1, status: 3 }; // op 2 (generate) is only used by Python callers
+const REQUEST_TIMEOUT_MS = 30000;
+
+let connection = null;
+let nextId = 0;
+const pending = new Map();
+
+const encodeFrame = (op, id, meta, payload = Buffer.alloc(0)) => {
+  const metaBytes = Buffer.from(JSON.stringify(meta || {}));
+  const header = Buffer.alloc(HEADER_SIZE);
+  MAGIC.copy(header, 0);
+  header.writeUInt8(op, 4);
+  header.writeUInt8(0, 5);
+  header.writeUInt32BE(id, 6);
+  header.writeUInt32BE(metaBytes.length, 10);
+  header.writeBigUInt64BE(BigInt(payload.length), 14);
+  return Buffer.concat([header, metaBytes, payload]);
+};
+
+const failPending = (error) => {
+  for (const { reject, timer } of pending.values()) {
+    clearTimeout(timer);
+    reject(error);
+  }
+  pending.clear();
+};
+
+// One persistent connection; requests are pipelined and matched to responses by id
+const getConnection = () => {
+  if (connection) return connection;
+  const socket = net.createConnection(SOCKET_PATH);
+  let buffered = Buffer.alloc(0);
+
+  socket.on("data", (chunk) => {
+    buffered = Buffer.concat([buffered, chunk]);
+    while (buffered.length >= HEADER_SIZE) {
+      const metaLength = buffered.readUInt32BE(10);
+      const payloadLength = Number(buffered.readBigUInt64BE(14));
+      const frameLength = HEADER_SIZE + metaLength + payloadLength;
+      if (buffered.length < frameLength) break;
+
+      const status = buffered.readUInt8(5);
+      const id = buffered.readUInt32BE(6);
+      const meta = JSON.parse(buffered.subarray(HEADER_SIZE, HEADER_SIZE + metaLength).toString() || "{}");
+      const payload = buffered.subarray(HEADER_SIZE + metaLength, frameLength);
+      buffered = buffered.subarray(frameLength);
+
+      const request = pending.get(id);
+      if (!request) continue;
+      pending.delete(id);
+      clearTimeout(request.timer);
+      if (status === 0) {
+        request.resolve({ meta, payload });
+      } else {
+        const error = new Error(meta.error || "ML RPC request failed");
+        error.retryAfter = meta.retry_after;
+        request.reject(error);
+      }
+    }
+  });
+  socket.on("error", (error) => failPending(error));
+  socket.on("close", () => {
+    connection = null;
+    failPending(new Error("ML RPC connection closed"));
+  });
+
+  connection = socket;
+  return socket;
+};
+
+const call = (opName, meta, payload) =>
+  new Promise((resolve, reject) => {
+    const id = (nextId = (nextId + 1) % 2 ** 32);
+    const timer = setTimeout(() => {
+      pending.delete(id);
+      reject(new Error(`ML RPC ${opName} timed out`));
+    }, REQUEST_TIMEOUT_MS);
+    pending.set(id, { resolve, reject, timer });
+    getConnection().write(encodeFrame(OPS[opName], id, meta, payload));
+  });
+
+/**
+ * Predict from signal arrays keyed by name ({ i1: [...], ..., vibrad: [...] })
+ */
+const predict = async (signals, meta = {}) => {
+  const length = signals[SIGNAL_NAMES[0]].length;
+  const samples = new Float32Array(SIGNAL_NAMES.length * length);
+  SIGNAL_NAMES.forEach((name, channel) => samples.set(signals[name], channel * length));
+  const payload = Buffer.from(samples.buffer);
+  const { meta: result } = await call("predict", { ...meta, shape: [SIGNAL_NAMES.length, length] }, payload);
+  return result;
+};
+
+const status = async () => (await call("status", {})).meta;
+
+module.exports = { predict, status, SIGNAL_NAMES };